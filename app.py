@@ -1,6 +1,12 @@
+import os
+import threading
 import streamlit as st
 import json
-from scheduler_graph import parse_patient_request, create_scheduler_graph
+from scheduler_graph import stream_patient_request, get_scheduler_graph
+from tools import outbox
+from tools.calendar_tool import CalendarTool
+from tools.config import get_tool
+from tools.intake_rules import CORE_FIELDS
 
 st.set_page_config(page_title="AI Scheduler", page_icon="🩺", layout="centered")
 
@@ -18,11 +24,41 @@ st.markdown(
     """
 )
 
+@st.cache_resource
+def load_scheduler():
+    """
+    Compiled graph shared by every session; built on the first booking.
+    Also starts an in-process outbox worker so confirmations are delivered
+    without a separate scripts/outbox_worker.py; set OUTBOX_IN_APP=0 when
+    dedicated workers run instead.
+
+    In Calendly mode the event-type index is refreshed here on a timer:
+    the webhook's refresh runs in the webhook process and never reaches
+    this one.
+    """
+    if os.getenv("OUTBOX_IN_APP", "1") != "0":
+        worker = outbox.OutboxWorker()
+        threading.Thread(target=worker.run_forever, name="outbox-drain", daemon=True).start()
+    cal = get_tool(CalendarTool)
+    if not cal.use_fallback:
+        cal.start_event_type_refresher(float(os.getenv("CALENDLY_EVENT_TYPE_REFRESH", 300)))
+    return get_scheduler_graph()
+
+
 # Session state initialization
 if "messages" not in st.session_state:
     st.session_state["messages"] = []
 if "patient_data" not in st.session_state:
-    st.session_state["patient_data"] = None
+    st.session_state["patient_data"] = None  # only ever a fully parsed request
+if "intake_partial" not in st.session_state:
+    st.session_state["intake_partial"] = None  # what the current parse has so far
+if "intake_cancel" not in st.session_state:
+    st.session_state["intake_cancel"] = threading.Event()
+
+
+def stop_intake():
+    st.session_state["intake_cancel"].set()
+
 
 # Chat input for patient request
 user_input = st.chat_input("Describe your appointment request...")
@@ -32,19 +68,35 @@ if user_input:
     st.session_state["messages"].append({"role": "user", "content": user_input})
     st.chat_message("user").write(user_input)
 
-    # --- Step 1: Intake only (parse patient request) ---
-    patient_data = parse_patient_request(user_input)
+    # --- Step 1: Intake only (parse patient request, streamed) ---
+    # The message is stored up front and updated as fields arrive, so a
+    # stopped parse still leaves its partial result in the history.
+    assistant_msg = {"role": "assistant", "content": "⏳ Reading your request..."}
+    st.session_state["messages"].append(assistant_msg)
+
+    cancel = st.session_state["intake_cancel"] = threading.Event()
+    st.session_state["patient_data"] = st.session_state["intake_partial"] = None
+    with st.chat_message("assistant"):
+        # Stop cancels the generation; the rerun it triggers also ends this loop
+        st.button("⏹️ Stop", key="stop_intake", on_click=stop_intake)
+        placeholder = st.empty()
+        placeholder.write(assistant_msg["content"])
 
-    # Show extracted patient data
-    assistant_msg = (
-        f"Here’s what I understood from your request:\n"
-        f"```json\n{json.dumps(patient_data, indent=2)}\n```"
-    )
-    st.session_state["messages"].append({"role": "assistant", "content": assistant_msg})
-    st.chat_message("assistant").write(assistant_msg)
+        for patient_data in stream_patient_request(user_input, cancel=cancel):
+            assistant_msg["content"] = (
+                f"Here’s what I understood from your request:\n"
+                f"```json\n{json.dumps(patient_data, indent=2)}\n```"
+            )
+            placeholder.write(assistant_msg["content"])
+            st.session_state["intake_partial"] = patient_data
 
-    # Save patient data for later use
-    st.session_state["patient_data"] = patient_data
+    # only a finished parse with the core fields can be booked
+    partial = st.session_state["intake_partial"] or {}
+    missing = [f for f in CORE_FIELDS if not partial.get(f)]
+    if not cancel.is_set() and not missing:
+        st.session_state["patient_data"] = partial
+    elif not cancel.is_set():
+        assistant_msg["content"] += f"\n\n⚠️ Please also give your {' and '.join(missing)} before booking."
 
 # Display chat history
 for msg in st.session_state["messages"]:
@@ -55,7 +107,7 @@ if st.session_state["patient_data"]:
     st.subheader("✅ Confirm Appointment")
 
     if st.button("Book Appointment"):
-        scheduler = create_scheduler_graph()
+        scheduler = load_scheduler()
         final_state = scheduler.invoke({
             "patient": st.session_state["patient_data"],
             "lookup_result": None,
@@ -1,12 +1,23 @@
-from langgraph.graph import StateGraph, END
-from typing import TypedDict, Optional, Dict, cast
-from tools.patient_lookup import lookup_patient
+import asyncio
+import operator
+import time
+from functools import lru_cache
+from typing import Annotated, TypedDict, Optional, Dict, cast
+from tools.patient_lookup import alookup_patient, lookup_patient
 from tools.calendar_tool import CalendarTool
-from tools.email_tool import EmailTool
-from tools.sms_tool import SMSTool
-from langchain_community.llms import Ollama
-from langchain.prompts import PromptTemplate
-import json
+from tools.intake_parser import intake_parser
+from tools import outbox
+from tools.config import get_tool
+
+
+# langgraph / langchain_core are imported inside create_scheduler_graph:
+# they account for most of the import time, and the intake path
+# (app.py streaming) does not need them.
+
+
+def merge_dicts(left: Dict, right: Dict) -> Dict:
+    """Reducer for keys written by parallel branches."""
+    return {**(left or {}), **(right or {})}
 
 
 # ---- Define State ----
@@ -14,7 +25,9 @@ class SchedulerState(TypedDict):
     patient: Dict
     lookup_result: Optional[Dict]
     booking: Optional[Dict]
-    notified: bool
+    notified: Annotated[bool, operator.or_]
+    notifications: Annotated[Dict, merge_dicts]  # channel -> queued / skipped
+    timings: Annotated[Dict, merge_dicts]        # node -> milliseconds
 
 
 # ---- Define Nodes ----
@@ -22,20 +35,21 @@ def parse_patient_request(request: str) -> dict:
     """
     Use Ollama to parse free-text patient request into structured JSON.
     """
-    llm = Ollama(model="mistral", temperature=0)
-    prompt = PromptTemplate.from_template("""
-    You are a medical intake assistant. Extract structured patient data 
-    from the request below. Always return valid JSON with keys:
-    name, dob, mrn, email, phone, doctor, location, insurance_carrier,
-    insurance_member_id, insurance_group.
-
-    Request: {request}
-    """)
-    response = llm.invoke(prompt.format(request=request))
-    try:
-        return json.loads(response)
-    except Exception:
-        return {"raw_text": request}
+    return intake_parser.parse(request)
+
+def stream_patient_request(request: str, cancel=None):
+    """
+    Streaming variant of `parse_patient_request`: yields the fields parsed
+    so far as the Ollama generation progresses.
+    """
+    return intake_parser.stream(request, cancel=cancel)
+
+def _merge_intake(patient: Dict, parsed: Dict) -> Dict:
+    # fields the request did not mention must not wipe submitted values
+    patient.update({k: v for k, v in parsed.items() if v is not None})
+    print("🟢 Intake:", patient)
+    return patient
+
 
 def intake_node(state: SchedulerState) -> SchedulerState:
     """
@@ -45,124 +59,258 @@ def intake_node(state: SchedulerState) -> SchedulerState:
 
     # Only parse if there's a free-text request
     if "request" in patient:
-        parsed = parse_patient_request(patient["request"])
-        patient.update(parsed)
+        patient = _merge_intake(patient, parse_patient_request(patient["request"]))
+    state["patient"] = patient
+    return state
 
-    print("🟢 Intake:", patient)
+
+async def aintake_node(state: SchedulerState) -> SchedulerState:
+    patient = state["patient"]
+    if "request" in patient:
+        parsed = await asyncio.to_thread(parse_patient_request, patient["request"])
+        patient = _merge_intake(patient, parsed)
     state["patient"] = patient
     return state
 
 
+def _lookup_args(patient: Dict) -> Dict:
+    return {
+        "name": patient.get("name", "John Doe"),
+        "dob": patient.get("dob", "1970-01-01"),
+        "mrn": patient.get("mrn"),
+    }
+
+
 def lookup_node(state: SchedulerState):
-    patient = state["patient"]
-    lookup_res = lookup_patient(
-        name=patient.get("name","John Doe"),
-        dob=patient.get("dob","1970-01-01"),
-        mrn=patient.get("mrn"),
-    )
+    lookup_res = lookup_patient(**_lookup_args(state["patient"]))
     print("📋 Lookup:", lookup_res)
     state["lookup_result"] = lookup_res
     return state
 
 
-def booking_node(state: SchedulerState):
+async def alookup_node(state: SchedulerState):
+    lookup_res = await alookup_patient(**_lookup_args(state["patient"]))
+    print("📋 Lookup:", lookup_res)
+    state["lookup_result"] = lookup_res
+    return state
+
+
+def _booking_plan(state: SchedulerState):
+    """(duration, mrn, preferred doctor, preferred location, visit type) for the booking nodes."""
     patient = state["patient"]
     lookup_res = state["lookup_result"] or {}
-    duration = 30 if lookup_res.get("classification") == "returning" else 60
+    visit_type = lookup_res.get("classification") or "new"
+    duration = 30 if visit_type == "returning" else 60
+    mrn = patient.get("mrn") or lookup_res.get("mrn") or "TEMP-MRN"
+    # lookup_patient fills in "General Physician" when the record names nobody
+    doctor = patient.get("doctor") or lookup_res.get("doctor")
+    if doctor == "General Physician":
+        doctor = None
+    location = lookup_res.get("preferred_location") or patient.get("location")
+    return duration, mrn, doctor, location, visit_type
+
 
-    cal = CalendarTool()
+def _reserve_attempts(doctor: Optional[str], location: Optional[str]) -> list:
+    """(doctor_id, location) criteria to try in turn, most specific first."""
+    return list(dict.fromkeys([(doctor, location), (doctor, None), (None, location), (None, None)]))
+
+
+# notification channel -> patient field holding its address
+CONTACT_FIELDS = {"email": "email", "sms": "phone"}
+
+
+def _confirmations(patient: Dict) -> list:
+    """Outbox confirmations written in the booking transaction, one per contact given."""
+    context = {"patient_name": patient.get("name", "patient")}
+    return [
+        {"channel": channel, "address": patient[field], "template": "booking_confirmation", "context": context}
+        for channel, field in CONTACT_FIELDS.items() if patient.get(field)
+    ]
+
+
+def _contact(patient: Dict, lookup_res: Dict) -> Dict:
+    """Name and addresses stored on the appointment for its reminders."""
+    return {
+        "name": patient.get("name") or lookup_res.get("name"),
+        "email": patient.get("email") or lookup_res.get("email"),
+        "phone": patient.get("phone") or lookup_res.get("phone"),
+    }
+
+
+def _slot_booking(slot: Optional[Dict], duration: int) -> Dict:
+    if slot is None:
+        raise ValueError("❌ No slots available in fallback DB")
+    return {
+        "slot_id": slot["slot_id"],
+        "slot_ids": slot["slot_ids"],
+        "appointment_id": slot["appointment_id"],
+        "doctor_id": slot["doctor_id"],
+        "location": slot["location"],
+        "start_time": slot["start"],
+        "end_time": slot["end"],
+        "duration_minutes": duration,
+        "status": "booked",
+        "booking_url": None,
+    }
+
+
+def _link_booking(matched_event: Dict, booking_url: str, duration: int) -> Dict:
+    return {
+        "event_type": matched_event,
+        "duration_minutes": duration,
+        "booking_url": booking_url,
+        "start_time": "TBD",  # actual slot comes via webhook
+        "status": "pending",
+    }
+
+
+def booking_node(state: SchedulerState):
+    duration, mrn, doctor, location, visit_type = _booking_plan(state)
+    cal = get_tool(CalendarTool)
 
     if cal.use_fallback:
-        # fallback booking using slot_id (for demo we pick first available)
-        slots = cal.get_available_slots_fallback(limit=1)
-        if not slots:
-            raise ValueError("❌ No slots available in fallback DB")
-        slot = slots[0]
-        success = cal.book_slot_fallback(slot["id"], patient.get("mrn") or "TEMP-MRN")
-        booking = {
-            "slot_id": slot["id"],
-            "start_time": slot["start"],
-            "end_time": slot["end"],
-            "duration_minutes": duration,
-            "status": "booked" if success else "failed",
-            "booking_url": None,
-        }
+        notify = _confirmations(state["patient"])
+        contact = _contact(state["patient"], state["lookup_result"] or {})
+        # atomically claim the earliest window long enough for this visit,
+        # preferring the patient's doctor and clinic before falling back
+        slot = None
+        for doctor_id, loc in _reserve_attempts(doctor, location):
+            slot = cal.reserve_slot(
+                mrn, doctor_id=doctor_id, location=loc, duration_minutes=duration,
+                visit_type=visit_type, notify=notify, contact=contact,
+            )
+            if slot is not None:
+                break
+        booking = _slot_booking(slot, duration)
     else:
         # Calendly mode – just generate a scheduling link for the right event type
-       # pick the event type that matches duration
-        target_duration = duration
-        event_types = cal.list_event_types()
-
-        matched_event = None
-        for et in event_types:
-            if str(target_duration) in et["name"]:  # e.g. "30 Minute Meeting"
-                matched_event = et
-                break
-
+        matched_event = cal.event_type_for_duration(duration)
         if not matched_event:
-            raise ValueError(f"❌ No Calendly event type found for {target_duration} minutes")
+            raise ValueError(f"❌ No Calendly event type found for {duration} minutes")
+        booking = _link_booking(matched_event, cal.get_scheduling_link(matched_event["uri"]), duration)
+
+    print("📅 Booking:", booking)
+    state["booking"] = booking
+    return state
 
-        booking_url = cal.create_scheduling_link(matched_event["uri"])
 
-        booking = {
-            "event_type": matched_event,
-            "duration_minutes": duration,
-            "booking_url": booking_url,
-            "start_time": "TBD",  # actual slot comes via webhook
-            "status": "pending",
-        }
+async def abooking_node(state: SchedulerState):
+    duration, mrn, doctor, location, visit_type = _booking_plan(state)
+    cal = get_tool(CalendarTool)
+
+    if cal.use_fallback:
+        notify = _confirmations(state["patient"])
+        contact = _contact(state["patient"], state["lookup_result"] or {})
+        slot = None
+        for doctor_id, loc in _reserve_attempts(doctor, location):
+            slot = await cal.areserve_slot(
+                mrn, doctor_id=doctor_id, location=loc, duration_minutes=duration,
+                visit_type=visit_type, notify=notify, contact=contact,
+            )
+            if slot is not None:
+                break
+        booking = _slot_booking(slot, duration)
+    else:
+        matched_event = await cal.aevent_type_for_duration(duration)
+        if not matched_event:
+            raise ValueError(f"❌ No Calendly event type found for {duration} minutes")
+        url = await cal.aget_scheduling_link(matched_event["uri"])
+        booking = _link_booking(matched_event, url, duration)
 
     print("📅 Booking:", booking)
     state["booking"] = booking
     return state
 
 
-
-def notify_node(state: SchedulerState):
+def _notify(channel: str, state: SchedulerState):
+    """
+    Report the notification for one channel. Slot bookings already wrote it
+    to the outbox in the booking transaction; scheduling-link bookings have
+    no transaction, so theirs is written here. Delivery is left to the
+    outbox worker (scripts/outbox_worker.py), so a provider outage can no
+    longer fail the graph once the slot is booked.
+    """
     patient = state["patient"]
     booking = state["booking"] or {}
+    address = patient.get(CONTACT_FIELDS[channel])
+    if not address:
+        return {"notifications": {channel: "skipped"}}
+    if booking.get("appointment_id") is None:
+        outbox.submit(
+            f"link:{booking.get('booking_url')}:{channel}", channel, address, "booking_link",
+            {
+                "patient_name": patient.get("name", "patient"),
+                "doctor": patient.get("doctor", "your doctor"),
+                "clinic_location": patient.get("location"),
+                "duration_minutes": booking.get("duration_minutes", 30),
+                "booking_url": booking.get("booking_url") or "N/A",
+            },
+        )
+    return {"notifications": {channel: "queued"}, "notified": True}
+
+
+def notify_email_node(state: SchedulerState):
+    return _notify("email", state)
+
+
+def notify_sms_node(state: SchedulerState):
+    return _notify("sms", state)
 
-    email_tool = EmailTool()
-    email_tool.send_booking_link_email(
-        to_email=patient["email"],
-        patient_name=patient["name"],
-        doctor=patient.get("doctor", "your doctor"),
-        booking_url=booking.get("booking_url", "N/A"),
-        clinic_location=patient["location"],
-        duration_minutes=booking.get("duration_minutes", 30),
-    )
-
-    sms_tool = SMSTool(use_twilio=True)
-    sms_tool.send_sms(
-        patient["phone"],
-        f"Hello {patient['name']}, please book your {booking.get('duration_minutes', 'TBD')}-minute "
-        f"appointment using this link: {booking.get('booking_url', 'N/A')}"
-    )
-
-    state["notified"] = True
-    return state
+
+def timed(name: str, node, anode=None):
+    """
+    Wrap a node so its wall time lands in state["timings"]. `anode` is the
+    coroutine used under `ainvoke`; without one the sync node is used.
+    """
+    def run(state: SchedulerState):
+        t0 = time.perf_counter()
+        update = dict(node(state))
+        update["timings"] = {name: round((time.perf_counter() - t0) * 1000, 2)}
+        return update
+
+    async def arun(state: SchedulerState):
+        t0 = time.perf_counter()
+        update = dict(await anode(state) if anode else node(state))
+        update["timings"] = {name: round((time.perf_counter() - t0) * 1000, 2)}
+        return update
+
+    from langchain_core.runnables import RunnableLambda
+    return RunnableLambda(run, afunc=arun, name=name)
 
 # ---- Build Graph ----
 def create_scheduler_graph():
-    llm = Ollama(model="llama3:8b", temperature=0)  # strictly Ollama
+    """Compiled scheduler; supports both `invoke` and `ainvoke`."""
+    from langgraph.graph import StateGraph, END
+
     graph = StateGraph(SchedulerState)
 
-    graph.add_node("intake", intake_node)
-    graph.add_node("lookup", lookup_node)
-    graph.add_node("booking", booking_node)
-    graph.add_node("notify", notify_node)
+    graph.add_node("intake", timed("intake", intake_node, aintake_node))
+    graph.add_node("lookup", timed("lookup", lookup_node, alookup_node))
+    graph.add_node("booking", timed("booking", booking_node, abooking_node))
+    # fan out: notifications only go to the outbox, so the graph returns as
+    # soon as the slot is committed
+    graph.add_node("notify_email", timed("notify_email", notify_email_node))
+    graph.add_node("notify_sms", timed("notify_sms", notify_sms_node))
 
     graph.set_entry_point("intake")
     graph.add_edge("intake", "lookup")
     graph.add_edge("lookup", "booking")
-    graph.add_edge("booking", "notify")
-    graph.add_edge("notify", END)
+    graph.add_edge("booking", "notify_email")
+    graph.add_edge("booking", "notify_sms")
+    graph.add_edge("notify_email", END)
+    graph.add_edge("notify_sms", END)
 
     return graph.compile()
 
 
+@lru_cache(maxsize=1)
+def get_scheduler_graph():
+    """The compiled graph, built on first use and reused for the process."""
+    return create_scheduler_graph()
+
+
 if __name__ == "__main__":
-    scheduler = create_scheduler_graph()
+    scheduler = get_scheduler_graph()
 
     patient_data = {
         "name": "John Doe",
@@ -185,3 +333,5 @@ if __name__ == "__main__":
     })
 
     print("\n✅ Final State:", final_state)
+    worker = outbox.OutboxWorker()
+    print("📨 Deliveries:", worker.drain(), worker.stats())
@@ -0,0 +1,96 @@
+"""
+Availability index benchmark: rebuild time and query latency.
+
+Generates a year-scale doctor_schedules table in a throwaway DB, rebuilds
+the in-memory AvailabilityIndex from it and times earliest-fit queries.
+
+    python -m scripts.bench_availability --slots 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import tools.calendar_tool as calendar_tool
+from tools.availability import AvailabilityIndex
+from tools.calendar_tool import CalendarTool
+
+
+def seed(db_path: str, slots: int, doctors: int, booked_ratio: float):
+    per_doctor = slots // doctors
+    day0 = datetime(2030, 1, 1, 9, 0)
+    rng = random.Random(7)
+
+    def rows():
+        for d in range(doctors):
+            for n in range(per_doctor):
+                # 16 half-hour slots per day, 09:00-17:00
+                s = day0 + timedelta(days=n // 16, minutes=30 * (n % 16))
+                status = "booked" if rng.random() < booked_ratio else "free"
+                yield (f"D{d:03d}", f"Clinic {d % 5}", s.isoformat(),
+                       (s + timedelta(minutes=30)).isoformat(), status)
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO doctor_schedules (doctor_id, clinic_location, start_dt, end_dt, status) "
+        "VALUES (?, ?, ?, ?, ?)",
+        rows(),
+    )
+    conn.commit()
+    conn.close()
+    return per_doctor * doctors
+
+
+def run(slots: int, doctors: int, booked_ratio: float, queries: int):
+    calendar_tool.DB_PATH = os.path.join(tempfile.mkdtemp(), "appointments.db")
+    CalendarTool(use_fallback=True).init_fallback_db()
+
+    t0 = time.perf_counter()
+    total = seed(calendar_tool.DB_PATH, slots, doctors, booked_ratio)
+    print(f"seeded {total} slots for {doctors} doctors in {time.perf_counter() - t0:.1f}s")
+
+    index = AvailabilityIndex()
+    t0 = time.perf_counter()
+    index.rebuild(calendar_tool.DB_PATH)
+    rebuild = time.perf_counter() - t0
+    intervals = sum(len(iv.starts) for iv in index._keys.values())
+    print(f"✅ rebuild: {rebuild:.3f}s ({intervals} merged free intervals)")
+
+    rng = random.Random(11)
+    day0 = datetime(2030, 1, 1, 9, 0)
+    span_days = (slots // doctors) // 16
+    latencies = []
+    for _ in range(queries):
+        doc = f"D{rng.randrange(doctors):03d}"
+        after = day0 + timedelta(days=rng.randrange(max(span_days, 1)), minutes=30 * rng.randrange(16))
+        t0 = time.perf_counter()
+        index.earliest_fit(doc, f"Clinic {int(doc[1:]) % 5}", rng.choice((30, 60)), after)
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    print(f"   earliest_fit p50={latencies[len(latencies) // 2] * 1e6:.1f}µs "
+          f"p99={latencies[int(len(latencies) * 0.99)] * 1e6:.1f}µs over {queries} queries")
+
+    t0 = time.perf_counter()
+    for _ in range(queries):
+        doc = f"D{rng.randrange(doctors):03d}"
+        loc = f"Clinic {int(doc[1:]) % 5}"
+        fit = index.earliest_fit(doc, loc, 30, day0)
+        if fit:
+            index.mark_booked(doc, loc, fit["start"], fit["end"])
+            index.mark_free(doc, loc, fit["start"], fit["end"])
+    per_update = (time.perf_counter() - t0) / (queries * 2)
+    print(f"   book/free update ≈ {per_update * 1e6:.1f}µs each")
+    return rebuild
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slots", type=int, default=1_000_000)
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--booked-ratio", type=float, default=0.3)
+    parser.add_argument("--queries", type=int, default=10_000)
+    args = parser.parse_args()
+    run(args.slots, args.doctors, args.booked_ratio, args.queries)
@@ -0,0 +1,79 @@
+"""
+Batch booking benchmark: book a referral list of --patients against a
+throwaway fallback DB and patient registry.
+
+    python -m scripts.bench_batch_booking --patients 10000 --doctors 50
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import tools.calendar_tool as calendar_tool
+from tools.batch_booking import book_batch
+from tools.calendar_tool import CalendarTool
+
+
+def seed(tmp: str, patients: int, doctors: int, registered_ratio: float):
+    calendar_tool.DB_PATH = os.path.join(tmp, "appointments.db")
+    CalendarTool(use_fallback=True).init_fallback_db()
+    # 60-minute visits need two slots each; leave 20% headroom
+    per_doctor = int(patients * 2 * 1.2 / doctors) + 1
+    start = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    def slots():
+        for d in range(doctors):
+            for n in range(per_doctor):
+                s = start + timedelta(days=n // 16, minutes=30 * (n % 16))
+                yield (f"D{d:03d}", f"Clinic {'ABCDE'[d % 5]}", s.isoformat(),
+                       (s + timedelta(minutes=30)).isoformat())
+
+    conn = sqlite3.connect(calendar_tool.DB_PATH)
+    conn.executemany("INSERT INTO doctor_schedules (doctor_id, clinic_location, start_dt, end_dt, status) "
+                     "VALUES (?, ?, ?, ?, 'free')", slots())
+    conn.commit()
+    conn.close()
+
+    rng = random.Random(5)
+    rows = [(f"P{i:06d}", f"Patient {i}", f"19{50 + i % 50}-0{1 + i % 9}-1{i % 10}",
+             f"Clinic {'ABCDE'[i % 5]}",
+             (datetime.now() - timedelta(days=rng.randrange(1500))).strftime("%Y-%m-%d"))
+            for i in range(patients)]
+    patients_db = os.path.join(tmp, "patients.db")
+    conn = sqlite3.connect(patients_db)
+    conn.execute("CREATE TABLE patients (mrn TEXT PRIMARY KEY, name TEXT, dob TEXT, phone TEXT, email TEXT, "
+                 "preferred_location TEXT, last_visit_dt TEXT)")
+    registered = rows[: int(patients * registered_ratio)]
+    conn.executemany("INSERT INTO patients (mrn, name, dob, preferred_location, last_visit_dt) "
+                     "VALUES (?, ?, ?, ?, ?)", registered)
+    conn.commit()
+    conn.close()
+
+    # half the referrals carry an MRN, the rest only name + DOB
+    referrals = pd.DataFrame({
+        "mrn": [r[0] if i % 2 else None for i, r in enumerate(rows)],
+        "name": [r[1] for r in rows],
+        "dob": [r[2] for r in rows],
+    })
+    return referrals, patients_db, per_doctor * doctors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--registered-ratio", type=float, default=0.7)
+    args = parser.parse_args()
+
+    referrals, patients_db, slots = seed(tempfile.mkdtemp(), args.patients, args.doctors, args.registered_ratio)
+    print(f"seeded {slots} slots and {args.patients} referrals")
+    t0 = time.perf_counter()
+    report = book_batch(referrals, notify=False, patients_db=patients_db)
+    elapsed = time.perf_counter() - t0
+    print(f"✅ {len(report)} rows in {elapsed:.2f}s ({len(report) / elapsed:.0f} rows/s): "
+          f"{report['status'].value_counts().to_dict()}")
@@ -0,0 +1,67 @@
+"""
+Import-time benchmark for the app's entry modules.
+
+Each measurement runs in a fresh interpreter, so nothing is cached between
+runs. Reports the median wall time per module and the heaviest imports
+from `python -X importtime`.
+
+    python -m scripts.bench_import_time --runs 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = ("scheduler_graph", "tools.intake_parser", "tools.calendar_tool", "streamlit")
+
+
+def wall_time(module: str) -> float:
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - t0
+
+
+def heaviest(module: str, top: int) -> list[tuple[int, str]]:
+    """Top-level imports of `module` by cumulative microseconds."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  ") and not name.startswith("    "):  # direct imports only
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def first_graph_build() -> float:
+    code = (
+        "import time, scheduler_graph; t0 = time.perf_counter(); "
+        "scheduler_graph.get_scheduler_graph(); print(time.perf_counter() - t0)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main(runs: int, top: int):
+    baseline = statistics.median(wall_time("sys") for _ in range(runs))
+    print(f"interpreter start-up: {baseline * 1000:.0f}ms (subtracted below)")
+    for module in MODULES:
+        median = statistics.median(wall_time(module) for _ in range(runs))
+        print(f"{module:>22}: {(median - baseline) * 1000:7.0f}ms")
+        for micros, name in heaviest(module, top):
+            print(f"{'':>24}{micros / 1000:7.1f}ms  {name}")
+    print(f"first get_scheduler_graph(): {first_graph_build() * 1000:.0f}ms "
+          "(langgraph import + compile, once per process)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=3)
+    args = parser.parse_args()
+    main(args.runs, args.top)
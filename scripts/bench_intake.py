@@ -0,0 +1,129 @@
+"""
+Intake parsing benchmark: LLM call rate and latency with and without the
+rule-based fast path.
+
+Builds a corpus of synthetic requests with Faker (most in the app's
+"my name is…, my DOB is…, member ID…" shape, some free-form) and parses it
+against a simulated LLM that sleeps --llm-ms per generation. Also reports
+time-to-first-field for the streaming path.
+
+    python -m scripts.bench_intake --requests 500 --llm-ms 800
+"""
+import argparse
+import json
+import random
+import time
+
+from faker import Faker
+
+from tools.intake_parser import IntakeParser
+
+TEMPLATES = (
+    "Hi, my name is {name}, my DOB is {dob}. I'd like to book with {doctor} at {location}. "
+    "My insurance is {carrier}, member ID {member}.",
+    "Name: {name}. Date of birth: {dob_us}. Email {email}, phone {phone}. Member ID {member}, group {group}.",
+    "This is {name}, born on {dob_long}. MRN {mrn}. Please book me at {location}.",
+    # free-form: the rules find little here, the LLM has to fill in
+    "hey it's {first} again, need to see someone about my back next week, I'm with {carrier}",
+)
+
+
+class SimulatedOllama:
+    """Answers from the request's ground truth after sleeping like a real generation."""
+
+    def __init__(self, truth: dict, latency: float):
+        self.truth = truth
+        self.latency = latency
+        self.calls = 0
+
+    def generate(self, model, prompt, format=None, options=None, stream=False):
+        self.calls += 1
+        request = prompt.rsplit("Request:", 1)[1].strip()
+        fields = (format or {}).get("properties", {})
+        reply = json.dumps({f: self.truth[request].get(f) for f in fields})
+        if stream:
+            return self._tokens(reply)
+        time.sleep(self.latency)
+        return {"response": reply}
+
+    def _tokens(self, reply: str, size: int = 4):
+        # the same total generation time, spread over ~4-character tokens
+        pieces = [reply[i:i + size] for i in range(0, len(reply), size)]
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            yield {"response": piece}
+
+
+def corpus(n: int, seed: int = 3):
+    fake = Faker()
+    Faker.seed(seed)
+    rng = random.Random(seed)
+    truth = {}
+    for i in range(n):
+        dob = fake.date_of_birth(minimum_age=18, maximum_age=90)
+        record = {
+            "name": fake.name(),
+            "dob": dob.isoformat(),
+            "mrn": f"MRN{i:05d}",
+            "email": fake.email(),
+            "phone": fake.msisdn()[:10],
+            "doctor": f"Dr. {fake.last_name()}",
+            "location": f"Clinic {rng.choice('ABC')}",
+            "insurance_carrier": rng.choice(("Aetna", "Cigna", "Blue Cross", "Humana")),
+            "insurance_member_id": fake.bothify("??######").upper(),
+            "insurance_group": fake.bothify("GRP####"),
+        }
+        text = rng.choices(TEMPLATES, weights=(5, 3, 2, 2))[0].format(
+            name=record["name"], first=record["name"].split()[0], dob=record["dob"],
+            dob_us=dob.strftime("%m/%d/%Y"), dob_long=dob.strftime("%B %d, %Y"),
+            doctor=record["doctor"], location=record["location"], carrier=record["insurance_carrier"],
+            member=record["insurance_member_id"], group=record["insurance_group"],
+            email=record["email"], phone=record["phone"], mrn=record["mrn"],
+        )
+        truth[text] = record
+    return truth
+
+
+def run_once(label: str, truth: dict, llm_ms: float, use_rules: bool):
+    llm = SimulatedOllama(truth, llm_ms / 1000)
+    parser = IntakeParser(client=llm, use_rules=use_rules, cache_size=0)
+    latencies = []
+    for text in truth:
+        t0 = time.perf_counter()
+        parser.parse(text)
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    n = len(latencies)
+    print(f"{label:>12}: LLM calls {llm.calls}/{n} ({llm.calls / n:.0%})  "
+          f"p50={latencies[n // 2] * 1000:.2f}ms  p99={latencies[min(int(n * 0.99), n - 1)] * 1000:.2f}ms")
+    return llm.calls / n
+
+
+def run_stream(truth: dict, llm_ms: float):
+    """Time to the first shown field vs. the full result when streaming."""
+    llm = SimulatedOllama(truth, llm_ms / 1000)
+    parser = IntakeParser(client=llm, use_rules=False, cache_size=0)
+    first, full = [], []
+    for text in truth:
+        t0 = time.perf_counter()
+        for i, _ in enumerate(parser.stream(text)):
+            if i == 0:
+                first.append(time.perf_counter() - t0)
+        full.append(time.perf_counter() - t0)
+    first.sort()
+    full.sort()
+    n = len(full)
+    print(f"{'streaming':>12}: first field p50={first[len(first) // 2] * 1000:.2f}ms  "
+          f"full result p50={full[n // 2] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--llm-ms", type=float, default=800)
+    args = parser.parse_args()
+
+    truth = corpus(args.requests)
+    run_once("LLM only", truth, args.llm_ms, use_rules=False)
+    run_once("rules first", truth, args.llm_ms, use_rules=True)
+    run_stream(truth, args.llm_ms)
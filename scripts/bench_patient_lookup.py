@@ -0,0 +1,109 @@
+"""
+Patient lookup benchmark on a synthetic patients table (default 1M rows).
+
+Times the old unindexed `name = ? AND dob = ?` scan against the indexed,
+normalized search-key lookup, plus trigram fuzzy search.
+
+    python -m scripts.bench_patient_lookup --patients 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from faker import Faker
+
+import tools.patient_lookup as patient_lookup
+from scripts.update_db import migrate
+
+
+def seed(db_path: str, patients: int):
+    fake = Faker()
+    Faker.seed(9)
+    firsts = sorted({fake.first_name() for _ in range(3000)})
+    lasts = sorted({fake.last_name() for _ in range(3000)})
+    rng = random.Random(9)
+
+    def rows():
+        for i in range(patients):
+            yield (f"MRN{i:07d}", f"{rng.choice(firsts)} {rng.choice(lasts)}",
+                   f"{rng.randint(1930, 2015)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+    CREATE TABLE patients (
+        mrn TEXT PRIMARY KEY, name TEXT NOT NULL, dob DATE NOT NULL, phone TEXT, email TEXT,
+        preferred_location TEXT, last_visit_dt DATE, doctor TEXT,
+        insurance_carrier TEXT, insurance_member_id TEXT, insurance_group TEXT
+    )""")
+    conn.executemany("INSERT INTO patients (mrn, name, dob) VALUES (?, ?, ?)", rows())
+    conn.commit()
+    sample = conn.execute("SELECT name, dob FROM patients ORDER BY random() LIMIT 1000").fetchall()
+    conn.close()
+    return sample
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+
+def main(patients: int, queries: int):
+    db_path = os.path.join(tempfile.mkdtemp(), "patients.db")
+    t0 = time.perf_counter()
+    sample = seed(db_path, patients)
+    print(f"seeded {patients} patients in {time.perf_counter() - t0:.1f}s")
+
+    conn = sqlite3.connect(db_path)
+    scans = []
+    for name, dob in sample[:5]:
+        t0 = time.perf_counter()
+        conn.execute("SELECT * FROM patients WHERE name = ? AND dob = ?", (name, dob)).fetchone()
+        scans.append(time.perf_counter() - t0)
+    conn.close()
+    print(f"   before: unindexed name/dob scan p50={percentiles(scans)[0]:.1f}ms")
+
+    t0 = time.perf_counter()
+    migrate(db_path)
+    print(f"   migration (search_key backfill + trigram index): {time.perf_counter() - t0:.1f}s")
+
+    patient_lookup.DB_PATH = db_path
+    exact = []
+    for name, dob in (sample * (queries // len(sample) + 1))[:queries]:
+        messy = f"  {name.upper()} "  # casing / spacing the old query would miss
+        patient_lookup.patient_cache.clear()  # time the indexed query, not the cache
+        t0 = time.perf_counter()
+        res = patient_lookup.lookup_patient(name=messy, dob=dob)
+        exact.append(time.perf_counter() - t0)
+        assert res["found"], (name, dob)
+    p50, p99 = percentiles(exact)
+    print(f"✅ after: normalized exact lookup p50={p50:.3f}ms p99={p99:.3f}ms over {queries} lookups")
+
+    cached = []
+    for name, dob in (sample * (queries // len(sample) + 1))[:queries]:
+        t0 = time.perf_counter()
+        patient_lookup.lookup_patient(name=name, dob=dob)
+        cached.append(time.perf_counter() - t0)
+    p50, p99 = percentiles(cached)
+    print(f"   cached lookup p50={p50:.4f}ms p99={p99:.4f}ms, {patient_lookup.patient_cache_stats()}")
+
+    fuzzy, top1 = [], 0
+    for name, dob in sample[:200]:
+        typo = name[:-2] + name[-1]  # drop a letter
+        t0 = time.perf_counter()
+        found = patient_lookup.search_patients(typo, dob=dob, limit=5)
+        fuzzy.append(time.perf_counter() - t0)
+        top1 += bool(found) and (found[0]["name"], found[0]["dob"]) == (name, dob)
+    p50, p99 = percentiles(fuzzy)
+    print(f"   fuzzy search (one letter dropped) p50={p50:.2f}ms p99={p99:.2f}ms, "
+          f"intended patient ranked first {top1}/200")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    args = parser.parse_args()
+    main(args.patients, args.queries)
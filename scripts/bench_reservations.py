@@ -0,0 +1,86 @@
+"""
+Concurrent booking benchmark for CalendarTool.reserve_slot.
+
+Seeds a throwaway appointments DB, fires parallel reservations at it and
+checks that no slot was handed out twice.
+
+    python -m scripts.bench_reservations --slots 2000 --bookings 2500 --workers 64
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import tools.calendar_tool as calendar_tool
+from tools.calendar_tool import CalendarTool
+
+
+def seed(db_path: str, slots: int, doctors: int):
+    start = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    rows = []
+    for d in range(doctors):
+        for n in range(slots // doctors):
+            s = start + timedelta(minutes=30 * n)
+            rows.append((f"D{d:03d}", f"Clinic {d % 3}", s.isoformat(), (s + timedelta(minutes=30)).isoformat()))
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO doctor_schedules (doctor_id, clinic_location, start_dt, end_dt, status) "
+        "VALUES (?, ?, ?, ?, 'free')",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def run(slots: int, bookings: int, workers: int, doctors: int, duration: int):
+    tmp = tempfile.mkdtemp()
+    calendar_tool.DB_PATH = os.path.join(tmp, "appointments.db")
+    cal = CalendarTool(use_fallback=True)
+    cal.init_fallback_db()
+    total = seed(calendar_tool.DB_PATH, slots, doctors)
+
+    latencies = []
+
+    def book(n):
+        t0 = time.perf_counter()
+        res = cal.reserve_slot(f"MRN{n:06d}", duration_minutes=duration)
+        latencies.append(time.perf_counter() - t0)
+        return res
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(book, range(bookings)))
+    elapsed = time.perf_counter() - t0
+
+    booked = [r for r in results if r]
+    claimed = [sid for r in booked for sid in r["slot_ids"]]
+    double_booked = len(claimed) - len(set(claimed))
+
+    conn = sqlite3.connect(calendar_tool.DB_PATH)
+    db_booked = conn.execute("SELECT COUNT(*) FROM doctor_schedules WHERE status='booked'").fetchone()[0]
+    conn.close()
+
+    latencies.sort()
+    print(f"slots={total} bookings={bookings} workers={workers} duration={duration}min")
+    print(f"✅ booked={len(booked)} rejected={bookings - len(booked)} double_booked={double_booked}")
+    print(f"   rows booked in DB={db_booked} (expected {len(claimed)})")
+    print(f"   throughput={len(results) / elapsed:.0f} bookings/s")
+    print(f"   p50={latencies[len(latencies) // 2] * 1000:.2f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms")
+    return double_booked == 0 and db_booked == len(claimed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slots", type=int, default=2000)
+    parser.add_argument("--bookings", type=int, default=2500)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--duration", type=int, default=30)
+    args = parser.parse_args()
+    ok = run(args.slots, args.bookings, args.workers, args.doctors, args.duration)
+    raise SystemExit(0 if ok else 1)
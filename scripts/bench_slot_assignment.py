@@ -0,0 +1,73 @@
+"""
+Slot assignment benchmark: --requests pending visits over --slots free slots.
+
+Reports solve time, peak Python memory (tracemalloc), filled demand and how
+many requests got their preferred doctor or clinic.
+
+    python -m scripts.bench_slot_assignment --requests 10000 --slots 100000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+
+from tools.slot_assignment import TIER_ANY, TIER_DOCTOR, TIER_LOCATION, SlotRequest, SlotAssigner
+
+
+def make_slots(count: int, doctors: int, rng: random.Random, booked_ratio: float):
+    day0 = datetime(2030, 1, 7, 9, 0)
+    per_doctor = count // doctors
+    for d in range(doctors):
+        for n in range(per_doctor):
+            if rng.random() < booked_ratio:
+                continue  # already booked: leaves gaps between free runs
+            s = day0 + timedelta(days=n // 16, minutes=30 * (n % 16))
+            yield (d * per_doctor + n, f"D{d:03d}", f"Clinic {d % 10}", s.isoformat(),
+                   (s + timedelta(minutes=30)).isoformat())
+
+
+def make_requests(count: int, doctors: int, rng: random.Random):
+    requests = []
+    for n in range(count):
+        doctor = f"D{rng.randrange(doctors):03d}" if rng.random() < 0.3 else None
+        location = f"Clinic {rng.randrange(10)}" if rng.random() < 0.6 else None
+        requests.append(SlotRequest(n, duration_minutes=rng.choice((30, 60)),
+                                    doctor_id=doctor, location=location,
+                                    priority=0 if rng.random() < 0.1 else 1))
+    return requests
+
+
+def main(requests: int, slots: int, doctors: int, booked_ratio: float):
+    rng = random.Random(42)
+    free = list(make_slots(slots, doctors, rng, booked_ratio))
+    pending = make_requests(requests, doctors, rng)
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    plan = SlotAssigner(free).assign(pending)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tiers = Counter(a["tier"] for a in plan["assigned"].values())
+    wanted = {r.id: (r.doctor_id, r.location) for r in pending}
+    preferred = sum(1 for rid, a in plan["assigned"].items()
+                    if (wanted[rid][0] and a["tier"] == TIER_DOCTOR)
+                    or (wanted[rid][1] and a["tier"] == TIER_LOCATION))
+    with_pref = sum(1 for d, loc in wanted.values() if d or loc)
+    print(f"✅ {len(plan['assigned'])}/{requests} placed over {len(free)} free slots "
+          f"in {elapsed:.2f}s, peak {peak / 2**20:.0f} MiB")
+    print(f"   tiers: doctor={tiers[TIER_DOCTOR]} location={tiers[TIER_LOCATION]} any={tiers[TIER_ANY]}; "
+          f"{preferred}/{with_pref} requests with a preference got it")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--slots", type=int, default=100_000)
+    parser.add_argument("--doctors", type=int, default=100)
+    parser.add_argument("--booked-ratio", type=float, default=0.3)
+    args = parser.parse_args()
+    main(args.requests, args.slots, args.doctors, args.booked_ratio)
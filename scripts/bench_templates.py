@@ -0,0 +1,74 @@
+"""
+Template benchmark: render --count reminder emails (subject, text, HTML and
+the full MIME message) with the compiled templates, against the old path of
+f-strings plus a fresh MIMEMultipart tree per message.
+
+    python -m scripts.bench_templates --count 100000
+"""
+import argparse
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from tools.templates import mime_message, render
+
+SENDER = "clinic@example.com"
+
+
+def contexts(count: int):
+    for n in range(count):
+        yield f"patient{n}@example.com", {
+            "patient_name": f"Patient {n} O'Brien & Co",
+            "appointment_dt": f"2030-01-{n % 28 + 1:02d} 09:{n % 60:02d}",
+            "clinic_location": f"Clinic {'AB'[n % 2]}",
+        }
+
+
+def old_path(to_email: str, ctx: dict) -> str:
+    subject = f"Reminder: Your Appointment on {ctx['appointment_dt']}"
+    text_body = (
+        f"Hello {ctx['patient_name']},\n\n"
+        f"This is a reminder for your upcoming appointment on {ctx['appointment_dt']}.\n"
+        f"Location: {ctx['clinic_location']}\n\n"
+        "Please arrive 10 minutes early.\n\n"
+        "Thank you,\nAI Scheduler Team"
+    )
+    html_body = f"""
+        <html>
+          <body style="font-family: Arial, sans-serif; line-height: 1.6;">
+            <p>Hello <b>{ctx['patient_name']}</b>,</p>
+            <p>This is a reminder for your upcoming appointment on:</p>
+            <p><b>{ctx['appointment_dt']}</b></p>
+            <p>Location: {ctx['clinic_location']}</p>
+            <p>Please arrive 10 minutes early.</p>
+          </body>
+        </html>
+        """
+    msg = MIMEMultipart("alternative")
+    msg["From"] = SENDER
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(text_body, "plain"))
+    msg.attach(MIMEText(html_body, "html"))
+    return msg.as_string()
+
+
+def new_path(to_email: str, ctx: dict) -> str:
+    message = render("appointment_reminder", **ctx)
+    return mime_message(SENDER, to_email, message.subject, message.text, message.html)
+
+
+def main(count: int):
+    for label, build in (("f-strings + MIMEMultipart", old_path), ("compiled templates", new_path)):
+        t0 = time.perf_counter()
+        size = sum(len(build(to, ctx)) for to, ctx in contexts(count))
+        elapsed = time.perf_counter() - t0
+        print(f"{label:26s}: {count} messages in {elapsed:.2f}s "
+              f"({count / elapsed:,.0f}/s, {size / count:.0f} bytes avg)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+    main(args.count)
@@ -1,8 +1,10 @@
-import sqlite3
+import asyncio
 from fastapi import FastAPI, Request
 import uvicorn
+from tools import database
+from tools.calendar_tool import CalendarTool
 
-DB_PATH = "db/appointments.db"
+DB_PATH = database.APPOINTMENTS_DB
 
 app = FastAPI()
 
@@ -15,27 +17,23 @@ def save_booking(payload: dict):
         print("⚠️ Invalid payload, skipping")
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    with database.transaction(DB_PATH) as conn:
+        conn.execute("""
+            INSERT INTO appointments (
+                patient_name, patient_email, start_dt, end_dt, doctor_id,
+                clinic_location, type, status
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            invitee.get("name"),
+            invitee.get("email"),
+            event.get("start_time"),
+            event.get("end_time"),
+            "unknown",  # can map later if needed
+            "unknown",
+            "Calendly",
+            "confirmed"
+        ))
 
-    cur.execute("""
-        INSERT INTO appointments (
-            patient_name, patient_email, start_dt, end_dt, doctor_id,
-            clinic_location, type, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        invitee.get("name"),
-        invitee.get("email"),
-        event.get("start_time"),
-        event.get("end_time"),
-        "unknown",  # can map later if needed
-        "unknown",
-        "Calendly",
-        "confirmed"
-    ))
-
-    conn.commit()
-    conn.close()
     print(f"✅ Booking saved for {invitee.get('name')} at {event.get('start_time')}")
 
 def cancel_booking(payload: dict):
@@ -46,15 +44,12 @@ def cancel_booking(payload: dict):
 
     email = invitee.get("email")
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE appointments
-        SET status = 'canceled'
-        WHERE patient_email = ?
-    """, (email,))
-    conn.commit()
-    conn.close()
+    with database.transaction(DB_PATH) as conn:
+        conn.execute("""
+            UPDATE appointments
+            SET status = 'canceled'
+            WHERE patient_email = ?
+        """, (email,))
     print(f"❌ Booking canceled for {email}")
 @app.post("/webhooks/calendly")
 async def calendly_webhook(request: Request):
@@ -62,10 +57,16 @@ async def calendly_webhook(request: Request):
     print("📩 Received webhook:", data)
 
     event_type = data.get("event")
+    # sqlite writes run in a worker thread so the event loop keeps serving
     if event_type == "invitee.created":
-        save_booking(data)
+        await asyncio.to_thread(save_booking, data)
     elif event_type == "invitee.canceled":
-        cancel_booking(data)
+        await asyncio.to_thread(cancel_booking, data)
+    elif event_type and event_type.startswith("event_type."):
+        # event types changed in Calendly – rebuild the duration index off-thread
+        cal = CalendarTool()
+        if not cal.use_fallback:
+            cal.refresh_event_types(background=True)
 
     return {"status": "ok"}
 @app.get("/webhooks/calendly")
@@ -0,0 +1,26 @@
+"""
+Nightly job: recompute new/returning for every patient in patients.db.
+
+    python -m scripts.classify_patients [--db db/patients.db]
+"""
+import argparse
+import time
+
+from tools import patient_lookup
+
+
+def main(db_path: str):
+    t0 = time.perf_counter()
+    counts = patient_lookup.classify_patients(db_path)
+    total = sum(counts.values())
+    print(f"✅ Classified {total} patients in {time.perf_counter() - t0:.2f}s: "
+          + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    if counts.get("unclassified"):
+        print(f"⚠️ {counts['unclassified']} patients have an unreadable last_visit_dt")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=patient_lookup.DB_PATH)
+    args = parser.parse_args()
+    main(args.db)
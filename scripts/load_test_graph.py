@@ -0,0 +1,109 @@
+"""
+Scheduler graph load test: sequential `invoke` vs. concurrent `ainvoke`.
+
+Books --bookings patients against a throwaway fallback DB, once through the
+sync path one after another and once as concurrent `ainvoke` calls in a
+single event loop. --io-ms adds simulated latency to the patient lookup
+(e.g. a remote patient DB). Notifications are replaced by no-ops.
+
+The async path only wins by overlapping I/O waits: the nodes run the same
+sync calls in worker threads and SQLite serialises the bookings, so with
+nothing to wait on it is slower than plain `invoke`. For 500 bookings:
+
+    --io-ms 0  : sync ~200/s, async ~170/s (thread hand-off overhead)
+    --io-ms 20 : sync ~39/s,  async ~128/s (lookup waits overlap)
+
+    python -m scripts.load_test_graph --bookings 500 --io-ms 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import scheduler_graph
+import tools.calendar_tool as calendar_tool
+import tools.patient_lookup as patient_lookup
+from tools.calendar_tool import CalendarTool
+
+
+def seed(bookings: int, doctors: int = 20):
+    """Fresh DB with enough back-to-back 30-minute slots for every booking (2 each)."""
+    calendar_tool.DB_PATH = os.path.join(tempfile.mkdtemp(), "appointments.db")
+    calendar_tool.CALENDLY_API_KEY = None
+    CalendarTool(use_fallback=True).init_fallback_db()
+
+    per_doctor = bookings * 2 // doctors + 2
+    start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=1)
+    conn = sqlite3.connect(calendar_tool.DB_PATH)
+    conn.executemany(
+        "INSERT INTO doctor_schedules (doctor_id, clinic_location, start_dt, end_dt, status) "
+        "VALUES (?, ?, ?, ?, 'free')",
+        (
+            (f"D{d:03d}", "Clinic A", (start + timedelta(minutes=30 * n)).isoformat(),
+             (start + timedelta(minutes=30 * (n + 1))).isoformat())
+            for d in range(doctors) for n in range(per_doctor)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def patient(n: int) -> dict:
+    return {"name": f"Load Test {n}", "dob": "1980-01-01", "mrn": f"LT{n:06d}",
+            "email": None, "phone": None, "location": "Clinic A"}
+
+
+def run_sync(scheduler, bookings: int) -> float:
+    t0 = time.perf_counter()
+    for n in range(bookings):
+        scheduler.invoke({"patient": patient(n), "lookup_result": None, "booking": None})
+    return time.perf_counter() - t0
+
+
+async def run_async(scheduler, bookings: int, concurrency: int) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(n):
+        async with gate:
+            return await scheduler.ainvoke({"patient": patient(n), "lookup_result": None, "booking": None})
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(bookings)))
+    return time.perf_counter() - t0
+
+
+def main(bookings: int, concurrency: int, io_ms: float):
+    if io_ms:
+        real_lookup = patient_lookup.lookup_patient
+
+        def slow_lookup(*args, **kwargs):
+            time.sleep(io_ms / 1000)
+            return real_lookup(*args, **kwargs)
+
+        patient_lookup.lookup_patient = scheduler_graph.lookup_patient = slow_lookup
+
+    scheduler = scheduler_graph.create_scheduler_graph()
+    with contextlib.redirect_stdout(io.StringIO()):  # the nodes print every step
+        seed(bookings)
+        sync_s = run_sync(scheduler, bookings)
+        seed(bookings)
+        async_s = asyncio.run(run_async(scheduler, bookings, concurrency))
+
+    print(f"sync invoke : {bookings} bookings in {sync_s:.2f}s ({bookings / sync_s:.0f}/s)")
+    print(f"async ainvoke: {bookings} bookings in {async_s:.2f}s ({bookings / async_s:.0f}/s) "
+          f"with {concurrency} in flight")
+    print(f"async/sync  : {sync_s / async_s:.2f}x at {io_ms:g} ms simulated lookup I/O")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--io-ms", type=float, default=20)
+    args = parser.parse_args()
+    main(args.bookings, args.concurrency, args.io_ms)
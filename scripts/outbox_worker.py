@@ -0,0 +1,35 @@
+"""
+Outbox worker: delivers the notifications the scheduler wrote to the
+outbox table. The Streamlit app runs one in-process unless
+OUTBOX_IN_APP=0; run one or more of these alongside it (or instead of it)
+for dedicated delivery. They share the work.
+
+    python -m scripts.outbox_worker [--workers 8] [--poll 2] [--once]
+"""
+import argparse
+
+from tools import outbox
+from tools.config import load_env
+
+
+def main(workers: int, poll: float, once: bool):
+    load_env()
+    worker = outbox.OutboxWorker(workers=workers)
+    if once:
+        print(f"📨 Outbox: {worker.drain()}")
+    else:
+        print(f"ℹ️ Outbox worker polling every {poll}s with {workers} threads")
+        try:
+            worker.run_forever(poll_interval=poll)
+        except KeyboardInterrupt:
+            pass
+    print(f"✅ Outbox status: {worker.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=outbox.OUTBOX_WORKERS)
+    parser.add_argument("--poll", type=float, default=2.0, help="seconds between polls")
+    parser.add_argument("--once", action="store_true", help="drain what is due and exit")
+    args = parser.parse_args()
+    main(args.workers, args.poll, args.once)
@@ -30,7 +30,8 @@ def seed_schedules(num_days: int = 5, slots_per_day: int = 4):
     for day in range(num_days):
         for doc in doctors:
             for slot in range(slots_per_day):
-                start_time = start_date + timedelta(days=day, hours=slot)
+                # back-to-back 30-minute slots so 60-minute visits can span two
+                start_time = start_date + timedelta(days=day, minutes=30 * slot)
                 end_time = start_time + timedelta(minutes=30)
                 cur.execute("""
                 INSERT INTO doctor_schedules (doctor_id, clinic_location, start_dt, end_dt, status)
@@ -1,10 +1,24 @@
 import sqlite3
+from tools.patient_lookup import clear_patient_cache, search_key
 
 DB_PATH = "db/patients.db"
 
-def migrate():
-    conn = sqlite3.connect(DB_PATH)
+# patient_lookup.search_key(new.name, new.dob) in SQL, where SQL can match it:
+# casefold is lower() for ASCII, whitespace runs (up to 16) become one space
+_COLLAPSED_NAME = "trim(new.name)"
+for _ in range(4):
+    _COLLAPSED_NAME = f"replace({_COLLAPSED_NAME}, '  ', ' ')"
+SQL_SEARCH_KEY = f"""CASE
+    WHEN new.name GLOB '*[^ -~]*' OR {_COLLAPSED_NAME} LIKE '%  %' OR {_COLLAPSED_NAME} = ''
+      OR date(new.dob) IS NOT new.dob THEN NULL
+    ELSE lower({_COLLAPSED_NAME}) || '|' || new.dob
+END"""
+
+def migrate(db_path: str = DB_PATH):
+    conn = sqlite3.connect(db_path)
     cur = conn.cursor()
+    # concurrent lookups read while bookings and migrations write
+    cur.execute("PRAGMA journal_mode=WAL")
 
     # Get existing columns
     cur.execute("PRAGMA table_info(patients)")
@@ -29,8 +43,78 @@ def migrate():
     else:
         print("ℹ️ 'insurance_group' already exists")
 
+    # Normalized name + DOB key for indexed, case-insensitive lookups
+    if "search_key" not in columns:
+        cur.execute("ALTER TABLE patients ADD COLUMN search_key TEXT")
+        print("✅ Added 'search_key'")
+    else:
+        print("ℹ️ 'search_key' already exists")
+    conn.create_function("search_key", 2, search_key, deterministic=True)
+    cur.execute("""
+        UPDATE patients SET search_key = search_key(name, dob)
+        WHERE search_key IS NULL OR search_key != search_key(name, dob)
+    """)
+    print(f"✅ Backfilled search_key for {cur.rowcount} patients")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_patients_search_key ON patients (search_key)")
+    # New rows, renames and DOB corrections get their key from plain SQL, as
+    # other writers do not register the search_key() UDF. The SQL matches
+    # search_key() for printable-ASCII names and ISO DOBs; anything else gets
+    # NULL and falls back to exact name/DOB matching until the next migrate
+    for suffix, event in (("ai", "INSERT"), ("au", "UPDATE OF name, dob")):
+        cur.execute(f"DROP TRIGGER IF EXISTS patients_search_key_{suffix}")
+        cur.execute(f"""
+            CREATE TRIGGER patients_search_key_{suffix} AFTER {event} ON patients BEGIN
+                UPDATE patients SET search_key = {SQL_SEARCH_KEY} WHERE rowid = new.rowid;
+            END
+        """)
+
+    # Materialized new/returning classification, refreshed nightly by
+    # scripts/classify_patients.py; a new last visit clears it until then
+    for column in ("classification", "classified_at"):
+        if column not in columns:
+            cur.execute(f"ALTER TABLE patients ADD COLUMN {column} TEXT")
+            print(f"✅ Added '{column}'")
+        else:
+            print(f"ℹ️ '{column}' already exists")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_patients_classification ON patients (classification)")
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS patients_classification_au AFTER UPDATE OF last_visit_dt ON patients BEGIN
+            UPDATE patients SET classification = NULL, classified_at = NULL WHERE rowid = new.rowid;
+        END
+    """)
+
+    # Trigram full-text index over names for fuzzy candidate search; the
+    # triggers keep it in step with every write to patients
+    fts_exists = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'patients_fts'"
+    ).fetchone()
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+            name, content='patients', content_rowid='rowid', tokenize='trigram'
+        )
+    """)
+    cur.executescript("""
+        CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN
+            INSERT INTO patients_fts (rowid, name) VALUES (new.rowid, new.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN
+            INSERT INTO patients_fts (patients_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF name ON patients BEGIN
+            INSERT INTO patients_fts (patients_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+            INSERT INTO patients_fts (rowid, name) VALUES (new.rowid, new.name);
+        END;
+    """)
+    if not fts_exists:
+        cur.execute("INSERT INTO patients_fts (patients_fts) VALUES ('rebuild')")
+        print("✅ Built patients_fts trigram index")
+    else:
+        print("ℹ️ 'patients_fts' already exists")
+
     conn.commit()
     conn.close()
+    # cached patients and schema probes predate the new columns / indexes
+    clear_patient_cache()
 
 if __name__ == "__main__":
     migrate()
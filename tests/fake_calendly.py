@@ -0,0 +1,109 @@
+"""
+Minimal in-process stand-in for the Calendly v2 API, for offline tests.
+
+    with FakeCalendly(event_types=[...]) as fake:
+        client = CalendlyClient("token", base_url=fake.url)
+"""
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+USER_URI = "https://api.calendly.com/users/FAKEUSER"
+
+
+class FakeCalendly:
+    def __init__(self, event_types=None, page_size: int = 2):
+        self.event_types = event_types if event_types is not None else [
+            {"uri": "https://api.calendly.com/event_types/ET30", "name": "30 Minute Meeting", "duration": 30},
+            {"uri": "https://api.calendly.com/event_types/ET60", "name": "New Patient Visit", "duration": 60},
+        ]
+        self.page_size = page_size
+        self.calls: Counter = Counter()
+        self.connections: set = set()
+        self.links_created = 0
+        # queue of (status, headers) to return before serving normally
+        self.failures: list[tuple[int, dict]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so session reuse is observable
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: dict | None = None):
+                raw = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _route(self, method: str):
+                parsed = urlparse(self.path)
+                with fake._lock:
+                    fake.calls[(method, parsed.path)] += 1
+                    fake.connections.add(self.client_address)
+                    failure = fake.failures.pop(0) if fake.failures else None
+                if failure:
+                    status, headers = failure
+                    return self._send(status, {"title": "error"}, headers)
+                if self.headers.get("Authorization") != "Bearer test-token":
+                    return self._send(401, {"title": "Unauthenticated"})
+
+                if method == "GET" and parsed.path == "/users/me":
+                    return self._send(200, {"resource": {"uri": USER_URI}})
+                if method == "GET" and parsed.path == "/event_types":
+                    qs = parse_qs(parsed.query)
+                    offset = int(qs.get("page_token", ["0"])[0])
+                    page = fake.event_types[offset:offset + fake.page_size]
+                    next_offset = offset + fake.page_size
+                    next_page = None
+                    if next_offset < len(fake.event_types):
+                        next_page = f"{fake.url}/event_types?user={USER_URI}&page_token={next_offset}"
+                    return self._send(200, {"collection": page, "pagination": {"next_page": next_page}})
+                if method == "POST" and parsed.path == "/scheduling_links":
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    with fake._lock:
+                        fake.links_created += 1
+                        n = fake.links_created
+                    return self._send(201, {"resource": {
+                        "booking_url": f"https://calendly.com/d/fake-{n}",
+                        "owner": body.get("owner"),
+                    }})
+                return self._send(404, {"title": "Not Found"})
+
+            def do_GET(self):
+                self._route("GET")
+
+            def do_POST(self):
+                self._route("POST")
+
+        return Handler
@@ -0,0 +1,105 @@
+"""
+Minimal in-process SMTP server, for offline EmailTool tests.
+
+    with FakeSMTP() as fake:
+        monkeypatch.setenv("SMTP_PORT", str(fake.port))
+
+Speaks just enough ESMTP for smtplib (EHLO, AUTH PLAIN, MAIL, RCPT, DATA,
+RSET, NOOP, QUIT); no STARTTLS, so clients must run with SMTP_STARTTLS=0.
+"""
+import socketserver
+import threading
+import time
+
+
+class FakeSMTP:
+    def __init__(self, latency: float = 0.0, drop_after: int | None = None, reject=(),
+                 auth: bool = True, drop_in_data: bool = False):
+        self.latency = latency        # seconds slept before every reply (network round trip)
+        self.drop_after = drop_after  # hang up after this many messages on one connection
+        self.auth = auth              # advertise AUTH in the EHLO reply
+        self.drop_in_data = drop_in_data  # queue the message, then hang up before replying
+        self.reject = set(reject)     # recipients refused with 550
+        self.connections = 0
+        self.logins = 0
+        self.messages: list[tuple[str, str]] = []  # (recipient, raw message)
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                with fake._lock:
+                    fake.connections += 1
+                sent, recipients = 0, []
+                self.reply("220 fake ESMTP")
+                while True:
+                    line = self.rfile.readline().decode().rstrip("\r\n")
+                    if not line:
+                        return
+                    verb = line.split(" ", 1)[0].upper()
+                    if verb in ("EHLO", "HELO"):
+                        self.wfile.write(b"250-fake\r\n" + (b"250-AUTH PLAIN\r\n" if fake.auth else b""))
+                        self.reply("250 8BITMIME")
+                    elif verb == "AUTH":
+                        with fake._lock:
+                            fake.logins += 1
+                        self.reply("235 2.7.0 Authentication successful")
+                    elif verb == "MAIL":
+                        recipients = []
+                        self.reply("250 OK")
+                    elif verb == "RCPT":
+                        address = line.split(":", 1)[1].strip().strip("<>")
+                        if address in fake.reject:
+                            self.reply("550 5.1.1 No such user")
+                        else:
+                            recipients.append(address)
+                            self.reply("250 OK")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        data = []
+                        for raw in self.rfile:
+                            if raw in (b".\r\n", b".\n"):
+                                break
+                            data.append(raw.decode())
+                        with fake._lock:
+                            fake.messages.extend((r, "".join(data)) for r in recipients)
+                        if fake.drop_in_data:
+                            return
+                        self.reply("250 OK queued")
+                        sent += 1
+                        if fake.drop_after is not None and sent >= fake.drop_after:
+                            return  # server closes the session
+                    elif verb in ("RSET", "NOOP"):
+                        recipients = []
+                        self.reply("250 OK")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Command not implemented")
+
+        return Handler
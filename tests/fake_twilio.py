@@ -0,0 +1,85 @@
+"""
+Minimal in-process Twilio REST endpoint, for offline SMS tests.
+
+    with FakeTwilio() as fake:
+        monkeypatch.setenv("TWILIO_BASE_URL", fake.url)
+
+Implements only POST /2010-04-01/Accounts/<sid>/Messages.json, over
+keep-alive HTTP/1.1 so connection reuse can be counted.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeTwilio:
+    def __init__(self, latency: float = 0.0, reject=()):
+        self.latency = latency      # seconds slept before every response
+        self.reject = set(reject)   # numbers answered with error 21211 (invalid 'To')
+        self.connections = 0
+        self.messages: list[dict] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def respond(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if not self.path.endswith("/Messages.json"):
+                    return self.respond(404, {"code": 20404, "message": "Not found", "status": 404})
+                to = form.get("To", [""])[0]
+                if to in fake.reject:
+                    return self.respond(400, {
+                        "code": 21211, "message": f"The 'To' number {to} is not a valid phone number.",
+                        "status": 400,
+                    })
+                message = {
+                    "sid": "SM" + uuid.uuid4().hex, "to": to, "from": form.get("From", [""])[0],
+                    "body": form.get("Body", [""])[0], "status": "queued",
+                }
+                with fake._lock:
+                    fake.messages.append(message)
+                self.respond(201, message)
+
+        return Handler
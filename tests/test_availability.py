@@ -0,0 +1,122 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import tools.calendar_tool as calendar_tool
+from tools import availability
+from tools.availability import AvailabilityIndex
+from tools.calendar_tool import CalendarTool
+
+DAY = datetime(2030, 1, 7, 9, 0)
+
+
+@pytest.fixture
+def schedule_db(monkeypatch, tmp_path):
+    """D001 @ Clinic A: 09:00-11:00 free except 09:30; D002 @ Clinic B: 09:00-10:00."""
+    db_path = str(tmp_path / "appointments.db")
+    monkeypatch.setattr(calendar_tool, "DB_PATH", db_path)
+    CalendarTool(use_fallback=True).init_fallback_db()
+
+    conn = sqlite3.connect(db_path)
+    for doc, loc, count in (("D001", "Clinic A", 4), ("D002", "Clinic B", 2)):
+        for n in range(count):
+            s = DAY + timedelta(minutes=30 * n)
+            status = "booked" if (doc, n) == ("D001", 1) else "free"
+            conn.execute(
+                "INSERT INTO doctor_schedules (doctor_id, clinic_location, start_dt, end_dt, status) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (doc, loc, s.isoformat(), (s + timedelta(minutes=30)).isoformat(), status),
+            )
+    conn.commit()
+    conn.close()
+    yield db_path
+    availability.drop_availability_index(db_path)
+
+
+def test_rebuild_merges_back_to_back_slots(schedule_db):
+    index = AvailabilityIndex.from_db(schedule_db)
+    windows = index.fits_in_range(DAY, DAY + timedelta(hours=3), doctor_id="D001")
+    assert [(w["start"], w["end"]) for w in windows] == [
+        ("2030-01-07T09:00:00", "2030-01-07T09:30:00"),
+        ("2030-01-07T10:00:00", "2030-01-07T11:00:00"),
+    ]
+
+
+def test_earliest_fit_respects_duration(schedule_db):
+    index = AvailabilityIndex.from_db(schedule_db)
+
+    short = index.earliest_fit("D001", "Clinic A", 30, after=DAY)
+    assert short["start"] == "2030-01-07T09:00:00"
+
+    long = index.earliest_fit("D001", "Clinic A", 60, after=DAY)
+    assert long["start"] == "2030-01-07T10:00:00"
+
+    # across doctors the earliest 60-minute window is D002's
+    any_doc = index.earliest_fit(duration_minutes=60, after=DAY)
+    assert (any_doc["doctor_id"], any_doc["start"]) == ("D002", "2030-01-07T09:00:00")
+
+    assert index.earliest_fit("D001", "Clinic A", 90, after=DAY) is None
+
+
+def test_earliest_fit_aligns_to_slot_grid(schedule_db):
+    index = AvailabilityIndex.from_db(schedule_db)
+    fit = index.earliest_fit("D001", "Clinic A", 30, after=DAY + timedelta(minutes=70))
+    assert fit["start"] == "2030-01-07T10:30:00"
+
+
+def test_incremental_book_and_free(schedule_db):
+    index = AvailabilityIndex()
+    index.rebuild(schedule_db)
+
+    index.mark_booked("D001", "Clinic A", "2030-01-07T10:00:00", "2030-01-07T10:30:00")
+    assert index.earliest_fit("D001", "Clinic A", 60, after=DAY) is None
+
+    index.mark_free("D001", "Clinic A", "2030-01-07T09:30:00", "2030-01-07T10:00:00")
+    index.mark_free("D001", "Clinic A", "2030-01-07T10:00:00", "2030-01-07T10:30:00")
+    windows = index.fits_in_range(DAY, DAY + timedelta(hours=3), doctor_id="D001")
+    assert [(w["start"], w["end"]) for w in windows] == [
+        ("2030-01-07T09:00:00", "2030-01-07T11:00:00"),
+    ]
+
+
+def test_calendar_tool_keeps_index_in_step(schedule_db):
+    cal = CalendarTool(use_fallback=True)
+    assert cal.next_available("D002", duration_minutes=60, after=DAY.isoformat())["start"] == "2030-01-07T09:00:00"
+
+    booking = cal.reserve_slot("MRN001", doctor_id="D002", duration_minutes=60, earliest=DAY.isoformat())
+    assert cal.next_available("D002", duration_minutes=30, after=DAY.isoformat()) is None
+
+    assert cal.release_slot(booking["slot_ids"]) == 2
+    assert cal.next_available("D002", duration_minutes=60, after=DAY.isoformat())["start"] == "2030-01-07T09:00:00"
+
+
+def _book_elsewhere(db_path, doctor_id, start):
+    """A booking made by another process, which this process's index never hears about."""
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "UPDATE doctor_schedules SET status='booked', patient_mrn='MRN999' WHERE doctor_id=? AND start_dt=?",
+        (doctor_id, start),
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_reserve_slot_recovers_from_a_stale_index(schedule_db):
+    cal = CalendarTool(use_fallback=True)
+    assert cal.next_available("D002", duration_minutes=30, after=DAY.isoformat())["start"] == "2030-01-07T09:00:00"
+    _book_elsewhere(schedule_db, "D002", "2030-01-07T09:00:00")
+
+    booking = cal.reserve_slot("MRN001", doctor_id="D002", duration_minutes=30, earliest=DAY.isoformat())
+    assert booking["start"] == "2030-01-07T09:30:00"
+    assert cal.next_available("D002", duration_minutes=30, after=DAY.isoformat()) is None
+
+
+def test_shared_index_is_reloaded_after_its_ttl(schedule_db, monkeypatch):
+    cal = CalendarTool(use_fallback=True)
+    assert cal.next_available("D001", duration_minutes=30, after=DAY.isoformat())["start"] == "2030-01-07T09:00:00"
+    _book_elsewhere(schedule_db, "D001", "2030-01-07T09:00:00")
+    assert cal.next_available("D001", duration_minutes=30, after=DAY.isoformat())["start"] == "2030-01-07T09:00:00"
+
+    monkeypatch.setattr(availability, "AVAILABILITY_INDEX_TTL", 0)
+    assert cal.next_available("D001", duration_minutes=30, after=DAY.isoformat())["start"] == "2030-01-07T10:00:00"
@@ -0,0 +1,98 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from tests.test_calender_tool import _seed_tmp_schedule
+from tools import batch_booking
+
+
+@pytest.fixture
+def patients_db(tmp_path):
+    db_path = str(tmp_path / "patients.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+    CREATE TABLE patients (
+        mrn TEXT PRIMARY KEY, name TEXT, dob TEXT, phone TEXT, email TEXT,
+        preferred_location TEXT, last_visit_dt TEXT, doctor TEXT,
+        insurance_carrier TEXT, insurance_member_id TEXT, insurance_group TEXT
+    )""")
+    recent = pd.Timestamp.now().strftime("%Y-%m-%d")
+    conn.executemany("INSERT INTO patients (mrn, name, dob, phone, email, preferred_location, last_visit_dt) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        ("MRN001", "Jane Smith", "1990-03-12", "+15550001", "jane@example.com", "Clinic B", recent),
+        ("MRN002", "John Roe", "1975-01-02", None, None, "Clinic A", "2001-01-01"),
+    ])
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def test_batch_books_every_row_in_one_pass(monkeypatch, tmp_path, patients_db):
+    _, db_path = _seed_tmp_schedule(monkeypatch, tmp_path, slots=10)
+    referrals = pd.DataFrame({
+        "Patient Name": ["Jane  Smith", "John Roe", "New Person", None],
+        "Date of Birth": ["03/12/1990", "1975-01-02", "1999-09-09", None],
+        "MRN": [None, "MRN002", None, None],
+    })
+
+    report = batch_booking.book_batch(referrals, notify=False, patients_db=patients_db)
+
+    assert list(report["status"]) == ["booked", "booked", "booked", "invalid"]
+    assert list(report["found"][:3]) == [True, True, False]
+    # returning patient gets 30 minutes at their preferred clinic
+    jane = report.iloc[0]
+    assert (jane["mrn"], jane["duration_minutes"], jane["location"]) == ("MRN001", 30, "Clinic B")
+    assert report.iloc[1]["duration_minutes"] == 60
+    assert report.iloc[2]["mrn"].startswith("TEMP-")
+
+    conn = sqlite3.connect(db_path)
+    booked = conn.execute("SELECT COUNT(*) FROM doctor_schedules WHERE status='booked'").fetchone()[0]
+    appts = conn.execute("SELECT patient_mrn, type FROM appointments ORDER BY id").fetchall()
+    conn.close()
+    assert booked == 1 + 2 + 2
+    assert appts[0] == ("MRN001", "returning")
+
+
+def test_batch_never_double_books_and_reports_shortage(monkeypatch, tmp_path, patients_db):
+    _seed_tmp_schedule(monkeypatch, tmp_path, doctors=("D001",), slots=4)
+    referrals = pd.DataFrame({"name": [f"P{i}" for i in range(4)], "dob": ["2000-01-01"] * 4})
+
+    report = batch_booking.book_batch(referrals, notify=False, patients_db=patients_db)
+
+    assert list(report["status"]) == ["booked", "booked", "no_slot", "no_slot"]
+    claimed = [s for ids in report["slot_ids"].dropna() for s in ids]
+    assert len(claimed) == len(set(claimed)) == 4
+
+
+def test_batch_reads_csv_and_queues_notifications(monkeypatch, tmp_path, patients_db):
+    _, db_path = _seed_tmp_schedule(monkeypatch, tmp_path)
+    csv = tmp_path / "referrals.csv"
+    csv.write_text("mrn,phone\nMRN001,\nMRN002,+15550002\n")
+
+    report = batch_booking.book_batch(str(csv), patients_db=patients_db)
+
+    assert list(report["notifications"]) == [["email", "sms"], ["sms"]]
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT channel, address, template, status FROM outbox").fetchall()
+    conn.close()
+    assert set(rows) == {
+        ("email", "jane@example.com", "booking_confirmation", "pending"),
+        ("sms", "+15550001", "booking_confirmation", "pending"),
+        ("sms", "+15550002", "booking_confirmation", "pending"),
+    }
+
+
+def test_bad_duration_marks_only_that_row_invalid(monkeypatch, tmp_path, patients_db):
+    _seed_tmp_schedule(monkeypatch, tmp_path, doctors=("D001",), slots=10)
+    referrals = pd.DataFrame({
+        "name": ["A One", "B Two", "C Three", "D Four"],
+        "dob": ["2000-01-01"] * 4,
+        "duration": ["45 min", "90", None, "-30"],
+    })
+
+    report = batch_booking.book_batch(referrals, notify=False, patients_db=patients_db)
+
+    assert list(report["status"]) == ["invalid", "booked", "booked", "invalid"]
+    assert report.iloc[0]["reason"] == "duration_minutes must be a whole number of minutes"
+    assert list(report["duration_minutes"][1:3]) == [90, 60]
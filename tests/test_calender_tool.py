@@ -1,4 +1,6 @@
+import shutil
 import sqlite3
+import sys
 import pytest
 from tools.calendar_tool import CalendarTool
 from scripts.seed_schedules import seed_schedules
@@ -7,9 +9,18 @@ DB_PATH = "db/appointments.db"
 
 
 @pytest.fixture(scope="module", autouse=True)
-def setup_schedules():
-    """Seed fallback schedules before running tests."""
-    seed_schedules(num_days=2, slots_per_day=3)
+def setup_schedules(tmp_path_factory):
+    """Seed fallback schedules in a copy of db/appointments.db before running tests."""
+    import scripts.seed_schedules
+    import tools.calendar_tool as calendar_tool
+
+    db_path = str(tmp_path_factory.mktemp("appointments") / "appointments.db")
+    shutil.copyfile(DB_PATH, db_path)
+    with pytest.MonkeyPatch.context() as mp:
+        for module in (scripts.seed_schedules, calendar_tool, sys.modules[__name__]):
+            mp.setattr(module, "DB_PATH", db_path)
+        seed_schedules(num_days=2, slots_per_day=3)
+        yield
 
 
 def test_get_slots_fallback():
@@ -57,3 +68,148 @@ def test_calendly_slots():
         assert "booking_url" in slot_info
         assert slot_info["booking_url"].startswith("https://calendly.com/")
 
+
+
+# -----------------------------
+# Reservation engine
+# -----------------------------
+def _seed_tmp_schedule(monkeypatch, tmp_path, doctors=("D001", "D002"), slots=40):
+    """Point CalendarTool at a throwaway DB with back-to-back 30-minute slots."""
+    from datetime import datetime, timedelta
+    import tools.calendar_tool as calendar_tool
+
+    db_path = str(tmp_path / "appointments.db")
+    monkeypatch.setattr(calendar_tool, "DB_PATH", db_path)
+    cal = CalendarTool(use_fallback=True)
+    cal.init_fallback_db()
+
+    start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=1)
+    conn = sqlite3.connect(db_path)
+    for i, doc in enumerate(doctors):
+        for n in range(slots):
+            s = start + timedelta(minutes=30 * n)
+            conn.execute(
+                "INSERT INTO doctor_schedules (doctor_id, clinic_location, start_dt, end_dt, status) "
+                "VALUES (?, ?, ?, ?, 'free')",
+                (doc, f"Clinic {'AB'[i % 2]}", s.isoformat(), (s + timedelta(minutes=30)).isoformat()),
+            )
+    conn.commit()
+    conn.close()
+    return cal, db_path
+
+
+def test_reserve_slot_records_mrn(monkeypatch, tmp_path):
+    cal, db_path = _seed_tmp_schedule(monkeypatch, tmp_path)
+    booking = cal.reserve_slot("MRN001", doctor_id="D002", duration_minutes=30)
+
+    assert booking["doctor_id"] == "D002"
+    conn = sqlite3.connect(db_path)
+    row = conn.execute(
+        "SELECT status, patient_mrn FROM doctor_schedules WHERE id=?", (booking["slot_id"],)
+    ).fetchone()
+    conn.close()
+    assert row == ("booked", "MRN001")
+
+
+def test_reserve_slot_spans_consecutive_slots(monkeypatch, tmp_path):
+    cal, _ = _seed_tmp_schedule(monkeypatch, tmp_path, doctors=("D001",), slots=4)
+    first = cal.reserve_slot("MRN001", duration_minutes=60)
+    second = cal.reserve_slot("MRN002", duration_minutes=60)
+
+    assert len(first["slot_ids"]) == 2
+    assert first["end"] == second["start"]
+    assert cal.reserve_slot("MRN003", duration_minutes=60) is None
+
+
+def test_concurrent_reservations_never_double_book(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    cal, db_path = _seed_tmp_schedule(monkeypatch, tmp_path, slots=100)
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(
+            lambda n: cal.reserve_slot(f"MRN{n:04d}", duration_minutes=30), range(250)
+        ))
+
+    booked = [r for r in results if r]
+    assert len(booked) == 200  # every slot filled, the rest got None
+    claimed = [sid for r in booked for sid in r["slot_ids"]]
+    assert len(claimed) == len(set(claimed))
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT patient_mrn) FROM doctor_schedules WHERE status='booked'"
+    ).fetchone()
+    conn.close()
+    assert rows == (200, 200)
+
+
+# -----------------------------
+# Slot search
+# -----------------------------
+def test_search_slots_filters_and_orders(monkeypatch, tmp_path):
+    cal, _ = _seed_tmp_schedule(monkeypatch, tmp_path, slots=6)
+    page = cal.search_slots(doctor_id="D002", location="Clinic B", limit=10)
+
+    starts = [s["start"] for s in page["slots"]]
+    assert len(starts) == 6
+    assert starts == sorted(starts)
+    assert {s["doctor_id"] for s in page["slots"]} == {"D002"}
+    assert page["next_cursor"] is None
+
+
+def test_search_slots_duration_and_cursor(monkeypatch, tmp_path):
+    cal, _ = _seed_tmp_schedule(monkeypatch, tmp_path, doctors=("D001",), slots=6)
+    first = cal.search_slots(duration_minutes=60, limit=3)
+    second = cal.search_slots(duration_minutes=60, limit=3, cursor=first["next_cursor"])
+
+    # 6 back-to-back slots -> 5 possible 60-minute windows
+    windows = first["slots"] + second["slots"]
+    assert len(windows) == 5
+    assert all(len(w["slot_ids"]) == 2 for w in windows)
+    assert [w["start"] for w in windows] == sorted(w["start"] for w in windows)
+
+
+def test_search_slots_latest_bounds_the_start(monkeypatch, tmp_path):
+    cal, _ = _seed_tmp_schedule(monkeypatch, tmp_path, doctors=("D001",), slots=6)
+    third = cal.search_slots(limit=3)["slots"][2]["start"]
+    page = cal.search_slots(duration_minutes=60, latest=third, limit=10)
+
+    # windows starting at or before `latest` may end after it
+    assert [w["start"] for w in page["slots"]][-1] == third
+    assert len(page["slots"]) == 3
+
+
+def test_search_slots_skips_past_slots(monkeypatch, tmp_path):
+    cal, db_path = _seed_tmp_schedule(monkeypatch, tmp_path, doctors=("D001",), slots=2)
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "INSERT INTO doctor_schedules (doctor_id, clinic_location, start_dt, end_dt, status) "
+        "VALUES ('D001', 'Clinic A', '2000-01-01T09:00:00', '2000-01-01T09:30:00', 'free')"
+    )
+    conn.commit()
+    conn.close()
+
+    page = cal.search_slots(limit=10)
+    assert all(s["start"] > "2000-01-02" for s in page["slots"])
+
+
+@pytest.mark.parametrize("doctor_id, location, latest, index", [
+    ("D001", "Clinic A", None, "idx_schedules_free_doctor"),
+    ("D001", None, None, "idx_schedules_free_doctor_start"),
+    (None, "Clinic A", None, "idx_schedules_free_location"),
+    (None, None, "2099-01-01", "idx_schedules_free_start"),
+])
+def test_slot_search_uses_index(monkeypatch, tmp_path, doctor_id, location, latest, index):
+    from tools import database
+    from tools.calendar_tool import _candidate_query
+
+    _, db_path = _seed_tmp_schedule(monkeypatch, tmp_path)
+    sql, filters = _candidate_query(doctor_id, location, latest)
+    with database.connection(db_path) as conn:
+        plan = " ".join(
+            r["detail"] for r in conn.execute(
+                "EXPLAIN QUERY PLAN " + sql, ("2025-01-01", "2025-01-01", 0, *filters, 10)
+            )
+        )
+    assert f"USING INDEX {index} " in plan
+    assert "TEMP B-TREE" not in plan
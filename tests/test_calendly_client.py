@@ -0,0 +1,129 @@
+import pytest
+import requests
+
+from tests.fake_calendly import FakeCalendly
+from tools.calendar_tool import CalendarTool
+from tools.calendly_client import CalendlyClient
+
+
+@pytest.fixture
+def fake():
+    event_types = [
+        {"uri": f"https://api.calendly.com/event_types/ET{n}", "name": f"Type {n}", "duration": 15 * n}
+        for n in range(1, 6)
+    ]
+    with FakeCalendly(event_types=event_types, page_size=2) as server:
+        yield server
+
+
+def _client(fake, **kwargs):
+    kwargs.setdefault("backoff_max", 0.01)
+    return CalendlyClient("test-token", base_url=fake.url, **kwargs)
+
+
+def test_event_types_follow_pagination(fake):
+    client = _client(fake)
+    event_types = client.list_event_types()
+    assert [et["duration"] for et in event_types] == [15, 30, 45, 60, 75]
+    assert fake.calls[("GET", "/event_types")] == 3
+
+
+def test_user_uri_and_event_types_are_cached(fake):
+    client = _client(fake)
+    for _ in range(5):
+        client.list_event_types()
+
+    assert fake.calls[("GET", "/users/me")] == 1
+    assert fake.calls[("GET", "/event_types")] == 3
+
+    client.invalidate()
+    client.list_event_types()
+    assert fake.calls[("GET", "/users/me")] == 2
+
+
+def test_session_reuses_connection(fake):
+    client = _client(fake)
+    for _ in range(10):
+        client.create_scheduling_link("https://api.calendly.com/event_types/ET1")
+    assert len(fake.connections) == 1
+
+
+def test_retries_honor_retry_after(fake):
+    fake.failures = [(429, {"Retry-After": "0"}), (503, {})]
+    client = _client(fake)
+    assert client.get_user_uri().endswith("FAKEUSER")
+    assert fake.calls[("GET", "/users/me")] == 3
+
+
+def test_gives_up_after_max_retries(fake):
+    fake.failures = [(429, {"Retry-After": "0"})] * 5
+    client = _client(fake, max_retries=2)
+    with pytest.raises(requests.HTTPError):
+        client.get_user_uri()
+    assert fake.calls[("GET", "/users/me")] == 3
+
+
+def test_client_errors_are_not_retried(fake):
+    client = CalendlyClient("wrong-token", base_url=fake.url, backoff_max=0.01)
+    with pytest.raises(requests.HTTPError):
+        client.get_user_uri()
+    assert fake.calls[("GET", "/users/me")] == 1
+
+
+def test_calendar_tool_uses_client(fake):
+    cal = CalendarTool(api_key="test-token", base_url=fake.url)
+    assert not cal.use_fallback
+    url = cal.create_scheduling_link(cal.list_event_types()[0]["uri"])
+    assert url.startswith("https://calendly.com/")
+
+
+# -----------------------------
+# Duration -> event type index
+# -----------------------------
+@pytest.fixture
+def tricky_fake():
+    event_types = [
+        {"uri": "https://api.calendly.com/event_types/LONG", "name": "300 Minute Workshop", "duration": 300},
+        {"uri": "https://api.calendly.com/event_types/FU", "name": "Follow-up (30)", "duration": 30},
+        {"uri": "https://api.calendly.com/event_types/NEW", "name": "New Patient Visit", "duration": 60},
+        {"uri": "https://api.calendly.com/event_types/OLD", "name": "Old 60", "duration": 60, "active": False},
+    ]
+    with FakeCalendly(event_types=event_types, page_size=10) as server:
+        yield server
+
+
+def test_event_type_resolved_by_duration_field(tricky_fake):
+    cal = CalendarTool(api_key="test-token", base_url=tricky_fake.url)
+    assert cal.event_type_for_duration(30)["uri"].endswith("/FU")
+    assert cal.event_type_for_duration(60)["uri"].endswith("/NEW")
+    assert cal.event_type_for_duration(300)["uri"].endswith("/LONG")
+    assert cal.event_type_for_duration(45) is None
+
+
+def test_event_type_lookup_stays_off_the_network(tricky_fake):
+    cal = CalendarTool(api_key="test-token", base_url=tricky_fake.url)
+    cal.event_type_for_duration(30)
+    calls = sum(tricky_fake.calls.values())
+
+    for _ in range(50):
+        CalendarTool(api_key="test-token", base_url=tricky_fake.url).event_type_for_duration(60)
+    assert sum(tricky_fake.calls.values()) == calls
+
+
+def test_event_type_name_mapping_wins(tricky_fake):
+    cal = CalendarTool(
+        api_key="test-token", base_url=tricky_fake.url,
+        event_type_names={30: "New Patient Visit"},
+    )
+    assert cal.event_type_for_duration(30)["uri"].endswith("/NEW")
+
+
+def test_event_type_refresh_picks_up_changes(tricky_fake):
+    cal = CalendarTool(api_key="test-token", base_url=tricky_fake.url)
+    assert cal.event_type_for_duration(45) is None
+
+    tricky_fake.event_types.append(
+        {"uri": "https://api.calendly.com/event_types/MID", "name": "Consult", "duration": 45}
+    )
+    cal.refresh_event_types()
+    assert cal.event_type_for_duration(45)["uri"].endswith("/MID")
@@ -0,0 +1,74 @@
+import threading
+from tools import database
+
+
+def test_pool_reuses_connections(tmp_path):
+    db_path = str(tmp_path / "pool.db")
+    pool = database.get_pool(db_path)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert database.get_pool(db_path) is pool
+    database.close_pool(db_path)
+
+
+def test_pragmas_applied(tmp_path):
+    db_path = str(tmp_path / "pragmas.db")
+    with database.connection(db_path) as conn:
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == database.BUSY_TIMEOUT_MS
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        # opening a pooled connection leaves the file's journal mode alone
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+    database.enable_wal(db_path)
+    with database.connection(db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    database.close_pool(db_path)
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    db_path = str(tmp_path / "tx.db")
+    with database.transaction(db_path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+
+    try:
+        with database.transaction(db_path) as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    with database.connection(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    database.close_pool(db_path)
+
+
+def test_concurrent_writers_do_not_lock(tmp_path):
+    db_path = str(tmp_path / "concurrent.db")
+    with database.transaction(db_path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(50):
+                with database.transaction(db_path) as conn:
+                    conn.execute("INSERT INTO t VALUES (?)", (n * 1000 + i,))
+        except Exception as e:  # pragma: no cover - surfaced via assert below
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    with database.connection(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 16 * 50
+    database.close_pool(db_path)
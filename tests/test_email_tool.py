@@ -0,0 +1,99 @@
+import smtplib
+import time
+
+import pytest
+
+from tests.fake_smtp import FakeSMTP
+from tools.email_tool import EmailTool
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    def start(**kwargs):
+        fake = FakeSMTP(**kwargs).__enter__()
+        started.append(fake)
+        monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+        monkeypatch.setenv("SMTP_PORT", str(fake.port))
+        monkeypatch.setenv("SMTP_USER", "scheduler@example.com")
+        monkeypatch.setenv("SMTP_PASS", "secret")
+        monkeypatch.setenv("SMTP_STARTTLS", "0")
+        return fake, EmailTool()
+
+    started = []
+    yield start
+    for fake in started:
+        fake.__exit__(None, None, None)
+
+
+def _batch(n, domain="example.com"):
+    return [{"to_email": f"p{i}@{domain}", "subject": f"Reminder {i}", "body": "See you soon"} for i in range(n)]
+
+
+def test_sessions_are_reused_across_messages(smtp):
+    fake, tool = smtp()
+    for m in _batch(5):
+        tool.send_email(**m)
+
+    assert len(fake.messages) == 5
+    assert fake.connections == 1 and fake.logins == 1
+
+
+def test_send_many_reconnects_and_resumes(smtp):
+    fake, tool = smtp(drop_after=3)
+    result = tool.send_many(_batch(10))
+
+    assert result["sent"] == 10 and result["failed"] == []
+    assert sorted(r for r, _ in fake.messages) == sorted(m["to_email"] for m in _batch(10))
+    assert fake.connections == 4
+
+
+def test_refused_recipient_does_not_stop_the_batch(smtp):
+    fake, tool = smtp(reject={"p1@example.com"})
+    result = tool.send_many(_batch(3))
+
+    assert result["sent"] == 2
+    assert [to for to, _ in result["failed"]] == ["p1@example.com"]
+    assert fake.connections == 1
+
+
+def test_pooled_sending_beats_a_login_per_message(smtp):
+    fake, tool = smtp(latency=0.002)
+    batch = _batch(20)
+
+    t0 = time.perf_counter()
+    for m in batch:  # what send_email used to do for every message
+        with smtplib.SMTP(tool.smtp_host, tool.smtp_port) as server:
+            server.login(tool.smtp_user, tool.smtp_pass)
+            server.sendmail(tool.from_email, m["to_email"], tool.build_message(**m))
+    login_per_message = len(batch) / (time.perf_counter() - t0)
+
+    result = tool.send_many(batch)
+    assert result["per_sec"] > 2 * login_per_message
+
+
+def test_configured_credentials_require_auth(smtp):
+    fake, tool = smtp(auth=False)
+    with pytest.raises(smtplib.SMTPNotSupportedError):
+        tool.send_email("p0@example.com", "Hi", "body")
+    assert fake.messages == []
+
+
+def test_dropped_idle_session_is_retried_on_a_fresh_one(smtp):
+    fake, tool = smtp(drop_after=1)
+    tool.send_email("p0@example.com", "Hi", "body")
+    tool.send_email("p1@example.com", "Hi", "body")
+
+    assert [r for r, _ in fake.messages] == ["p0@example.com", "p1@example.com"]
+    assert fake.connections == 2
+
+
+def test_drop_during_data_is_not_resent(smtp):
+    fake, tool = smtp(drop_in_data=True)
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        tool.send_email("p0@example.com", "Hi", "body")
+    assert len(fake.messages) == 1
+
+    result = tool.send_many(_batch(2))
+    assert result["sent"] == 0
+    assert [to for to, _ in result["failed"]] == ["p0@example.com", "p1@example.com"]
+    assert len(fake.messages) == 3
@@ -0,0 +1,197 @@
+import json
+import threading
+
+import pytest
+
+from tools.intake_parser import INTAKE_FIELDS, IntakeParser, JSONFieldStream, PatientIntake
+from tools.intake_rules import extract_fields
+
+
+class FakeOllama:
+    """Stands in for ollama.Client: returns a canned JSON reply, counts calls."""
+
+    def __init__(self, reply: dict | str):
+        self.reply = reply if isinstance(reply, str) else json.dumps(reply)
+        self.calls = []
+
+    def generate(self, model, prompt, format=None, options=None, stream=False):
+        self.calls.append({"model": model, "prompt": prompt, "format": format})
+        if stream:
+            return self._chunks()
+        return {"response": self.reply}
+
+    def _chunks(self, size=4):
+        self.streamed = 0
+        for i in range(0, len(self.reply), size):
+            self.streamed += 1
+            yield {"response": self.reply[i:i + size]}
+
+
+REQUEST = "Hi, my name is Jane Smith, my DOB is 1990-03-12. Member ID BC789456."
+
+
+def test_parse_returns_all_intake_fields():
+    fake = FakeOllama({"name": "Jane Smith", "dob": "1990-03-12", "insurance_member_id": "BC789456"})
+    parsed = IntakeParser(client=fake).parse(REQUEST)
+
+    assert set(parsed) == set(INTAKE_FIELDS)
+    assert parsed["name"] == "Jane Smith"
+    assert parsed["email"] is None
+
+
+def test_generation_is_schema_constrained():
+    fake = FakeOllama({"name": "Jane Smith"})
+    IntakeParser(client=fake, use_rules=False).parse(REQUEST)
+    schema = fake.calls[0]["format"]
+    assert schema["properties"].keys() == PatientIntake.model_json_schema()["properties"].keys()
+
+
+def test_identical_and_retried_requests_hit_cache():
+    fake = FakeOllama({"name": "Jane Smith"})
+    parser = IntakeParser(client=fake)
+
+    parser.parse(REQUEST)
+    parser.parse(REQUEST)
+    parser.parse("  hi, MY name is Jane Smith,   my DOB is 1990-03-12. Member ID BC789456. ")
+
+    assert len(fake.calls) == 1
+    assert parser.cache.stats()["hits"] == 2
+
+
+def test_cached_result_is_not_shared_mutable_state():
+    parser = IntakeParser(client=FakeOllama({"name": "Jane Smith"}))
+    parser.parse(REQUEST)["name"] = "Mallory"
+    assert parser.parse(REQUEST)["name"] == "Jane Smith"
+
+
+def test_cache_is_size_bounded():
+    fake = FakeOllama({"name": "X"})
+    parser = IntakeParser(client=fake, cache_size=2)
+    for n in range(3):
+        parser.parse(f"request {n}")
+    parser.parse("request 0")
+    assert len(fake.calls) == 4
+
+
+def test_invalid_reply_falls_back_and_is_not_cached():
+    fake = FakeOllama("not json")
+    parser = IntakeParser(client=fake)
+    request = "please book me something next week"
+    assert parser.parse(request) == {"raw_text": request}
+    parser.parse(request)
+    assert len(fake.calls) == 2
+
+
+# -----------------------------
+# Rule-based fast path
+# -----------------------------
+WELL_FORMED = (
+    "Hi, my name is Jane Smith, my DOB is 1990-03-12. I'd like to book an appointment "
+    "with Dr. Johnson at Clinic A. My insurance is Blue Cross, member ID BC789456."
+)
+
+
+def test_well_formed_request_skips_llm():
+    fake = FakeOllama({})
+    parsed = IntakeParser(client=fake).parse(WELL_FORMED)
+
+    assert fake.calls == []
+    assert parsed["name"] == "Jane Smith"
+    assert parsed["dob"] == "1990-03-12"
+    assert parsed["doctor"] == "Dr. Johnson"
+    assert parsed["location"] == "Clinic A"
+    assert parsed["insurance_carrier"] == "Blue Cross"
+    assert parsed["insurance_member_id"] == "BC789456"
+
+
+def test_llm_is_only_asked_for_missing_fields():
+    fake = FakeOllama({"dob": "1990-03-12"})
+    parsed = IntakeParser(client=fake).parse(
+        "my name is Jane Smith and I was born in the spring of 1990, email jane@example.com"
+    )
+
+    asked = set(fake.calls[0]["format"]["properties"])
+    assert "name" not in asked and "email" not in asked
+    assert "dob" in asked
+    assert "dob" in fake.calls[0]["prompt"] and "email" not in fake.calls[0]["prompt"].split("Request:")[0]
+    assert parsed["name"] == "Jane Smith"
+    assert parsed["dob"] == "1990-03-12"
+
+
+@pytest.mark.parametrize("text, field, expected", [
+    ("DOB: 03/12/1990", "dob", "1990-03-12"),
+    ("born on May 15, 1980", "dob", "1980-05-15"),
+    ("my MRN is MRN002", "mrn", "MRN002"),
+    ("reach me at +1 (415) 555-0199", "phone", "+14155550199"),
+    ("email: jane.doe+appt@example.co.uk", "email", "jane.doe+appt@example.co.uk"),
+    ("group number GRP7890", "insurance_group", "GRP7890"),
+    ("I have aetna", "insurance_carrier", "Aetna"),
+])
+def test_extract_fields(text, field, expected):
+    found, confidence = extract_fields(text, vocabulary={})
+    assert found[field] == expected
+    assert 0 < confidence <= 1
+
+
+def test_doctor_introduction_is_not_the_patient_name():
+    found, _ = extract_fields("Hi, this is Dr Johnson calling. My name is Jane Smith.", vocabulary={})
+    assert found["name"] == "Jane Smith"
+    assert found["doctor"] == "Dr Johnson"
+
+    found, _ = extract_fields("This is Dr. Lee's office", vocabulary={})
+    assert "name" not in found
+
+
+def test_intake_fields_match_the_schema():
+    assert tuple(PatientIntake.model_fields) == INTAKE_FIELDS
+
+
+def test_extract_fields_uses_known_clinics():
+    found, _ = extract_fields("can I come to clinic b?", vocabulary={"locations": ["Clinic B"]})
+    assert found["location"] == "Clinic B"
+
+
+# -----------------------------
+# Streaming
+# -----------------------------
+def test_field_stream_emits_values_as_they_complete():
+    stream = JSONFieldStream()
+    assert stream.feed('{"name": "Jane') == []
+    assert stream.feed(' Smith", "dob"') == [("name", "Jane Smith")]
+    assert stream.feed(': null, "mrn": "M\\"1"}') == [("dob", None), ("mrn", 'M"1')]
+    assert stream.state == "done"
+
+
+def test_stream_yields_growing_snapshots_and_caches_result():
+    reply = {"name": "Jane Smith", "dob": "1990-03-12", "email": "jane@example.com"}
+    fake = FakeOllama(reply)
+    parser = IntakeParser(client=fake, use_rules=False)
+
+    snapshots = list(parser.stream(REQUEST))
+    known = [sum(v is not None for v in s.values()) for s in snapshots]
+    assert known[:3] == [1, 2, 3]
+    assert snapshots[-1]["email"] == "jane@example.com"
+
+    assert list(parser.stream(REQUEST)) == [snapshots[-1]]
+    assert len(fake.calls) == 1
+
+
+def test_stream_shows_rule_fields_before_the_llm_answers():
+    fake = FakeOllama({"email": "jane@example.com"})
+    first = next(IntakeParser(client=fake).stream(REQUEST))
+    assert first["name"] == "Jane Smith"
+    assert fake.calls == []
+
+
+def test_cancelled_stream_stops_and_is_not_cached():
+    fake = FakeOllama({f: "x" * 20 for f in INTAKE_FIELDS})
+    parser = IntakeParser(client=fake, use_rules=False)
+    cancel = threading.Event()
+
+    for snapshot in parser.stream(REQUEST, cancel=cancel):
+        cancel.set()
+    assert sum(v is not None for v in snapshot.values()) == 1
+    assert fake.streamed < len(fake.reply) / 4
+
+    list(parser.stream(REQUEST))
+    assert len(fake.calls) == 2
@@ -0,0 +1,98 @@
+import itertools
+import sqlite3
+import threading
+from datetime import timedelta
+
+import pytest
+
+import tools.calendar_tool as calendar_tool
+from tests.fake_calendly import FakeCalendly
+from tools import link_pool
+from tools.calendar_tool import CalendarTool
+from tools.link_pool import SchedulingLinkPool
+
+ET = "https://api.calendly.com/event_types/ET30"
+
+
+class LinkFactory:
+    def __init__(self):
+        self.counter = itertools.count(1)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, event_type_uri):
+        with self.lock:
+            self.calls += 1
+        return f"https://calendly.com/d/link-{next(self.counter)}"
+
+
+@pytest.fixture
+def pool(tmp_path):
+    factory = LinkFactory()
+    pool = SchedulingLinkPool(factory, db_path=str(tmp_path / "appointments.db"), depth=3)
+    pool.factory = factory
+    yield pool
+    pool.shutdown()
+
+
+def test_acquire_hands_out_prebuilt_links(pool):
+    pool.warm([ET])
+    assert pool.factory.calls == 3
+
+    link = pool.acquire(ET)
+    assert link == "https://calendly.com/d/link-1"
+    assert pool.factory.calls in (3, 4)  # the refill may already be running
+
+
+def test_pool_refills_to_depth(pool):
+    pool.warm([ET])
+    for _ in range(3):
+        pool.acquire(ET)
+    pool.shutdown()  # wait for background refills
+    assert pool.depth_of(ET) == 3
+
+
+def test_links_are_single_use(pool):
+    pool.warm([ET])
+    links = [pool.acquire(ET) for _ in range(10)]
+    assert len(set(links)) == 10
+
+
+def test_empty_pool_falls_back_to_inline_creation(pool):
+    assert pool.acquire(ET).startswith("https://calendly.com/d/")
+    assert pool.metrics()["misses"] == 1
+
+
+def test_expired_links_are_not_handed_out(pool):
+    pool.link_ttl = timedelta(seconds=-1)
+    pool.warm([ET])
+    pool.link_ttl = timedelta(hours=1)
+
+    conn = sqlite3.connect(pool.db_path)
+    stale = {r[0] for r in conn.execute("SELECT booking_url FROM scheduling_links")}
+    conn.close()
+    assert pool.acquire(ET) not in stale
+
+
+def test_metrics_report_depth_and_refill_latency(pool):
+    pool.warm([ET])
+    pool.acquire(ET)
+    pool.shutdown()
+    metrics = pool.metrics()
+    assert metrics["depth"] == {ET: 3}
+    assert metrics["hits"] == 1
+    assert metrics["refills"] >= 2
+    assert metrics["refill_latency_ms_avg"] >= 0
+
+
+def test_calendar_tool_uses_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(calendar_tool, "DB_PATH", str(tmp_path / "appointments.db"))
+    with FakeCalendly() as fake:
+        cal = CalendarTool(api_key="test-token", base_url=fake.url)
+        cal.warm_link_pool()
+        created = fake.links_created
+
+        url = cal.get_scheduling_link(cal.event_type_for_duration(30)["uri"])
+        assert url.startswith("https://calendly.com/d/fake-")
+        assert int(url.rsplit("-", 1)[1]) <= created  # came from the pool
+        link_pool.get_link_pool(calendar_tool.DB_PATH, cal.client).shutdown()
@@ -1,5 +1,30 @@
+import shutil
+import sqlite3
+from datetime import date, timedelta
+
 import pytest
-from tools.patient_lookup import lookup_patient
+
+import tools.patient_lookup as patient_lookup
+from scripts.update_db import migrate
+from tools import database
+from tools.patient_lookup import (
+    classify_patients,
+    invalidate_patient,
+    lookup_patient,
+    patient_cache_stats,
+    search_key,
+    search_patients,
+)
+
+
+@pytest.fixture(autouse=True)
+def patients_copy(monkeypatch, tmp_path):
+    """Look patients up in a copy of db/patients.db, leaving the tracked file untouched."""
+    db_path = str(tmp_path / "patients_copy.db")
+    shutil.copyfile(database.PATIENTS_DB, db_path)
+    monkeypatch.setattr(patient_lookup, "DB_PATH", db_path)
+    return db_path
+
 
 def test_lookup_by_mrn_found():
     # Change MRN001 to a real MRN in your patients.db
@@ -24,3 +49,172 @@ def test_classification_new_vs_returning():
     assert res["found"] is True
     assert res["classification"] in ["new", "returning"]
     assert "reason" in res
+
+
+# -----------------------------
+# Search key and fuzzy search
+# -----------------------------
+@pytest.fixture
+def migrated_db(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "patients.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+    CREATE TABLE patients (
+        mrn TEXT PRIMARY KEY, name TEXT NOT NULL, dob DATE NOT NULL, phone TEXT, email TEXT,
+        preferred_location TEXT, last_visit_dt DATE, doctor TEXT
+    )""")
+    conn.executemany("INSERT INTO patients (mrn, name, dob) VALUES (?, ?, ?)", [
+        ("MRN001", "Jane Smith", "1990-03-12"),
+        ("MRN002", "Jane Smyth", "1985-07-01"),
+        ("MRN003", "Robert Jones", "1970-01-01"),
+    ])
+    conn.commit()
+    conn.close()
+    migrate(db_path)
+    monkeypatch.setattr(patient_lookup, "DB_PATH", db_path)
+    patient_lookup._features.clear()
+    yield db_path
+    patient_lookup._features.clear()
+
+
+def test_search_key_normalizes_case_whitespace_and_dob_format():
+    assert search_key("  jane   SMITH ", "03/12/1990") == search_key("Jane Smith", "1990-03-12")
+
+
+def test_lookup_matches_regardless_of_case_and_spacing(migrated_db):
+    res = lookup_patient(name="jane  smith", dob="03/12/1990")
+    assert res["found"] is True
+    assert res["mrn"] == "MRN001"
+
+
+def test_new_rows_get_a_key_from_sql(migrated_db):
+    conn = sqlite3.connect(migrated_db)
+    conn.execute("INSERT INTO patients (mrn, name, dob) VALUES ('MRN004', ' Ann   LEE', '2000-02-02')")
+    conn.commit()
+    (key,) = conn.execute("SELECT search_key FROM patients WHERE mrn = 'MRN004'").fetchone()
+    conn.close()
+    assert key == search_key(" Ann   LEE", "2000-02-02")
+    assert lookup_patient(name="ann lee", dob="02/02/2000")["mrn"] == "MRN004"
+
+
+def test_rows_without_a_key_are_still_found_exactly(migrated_db):
+    # non-ASCII names are left to the UDF backfill in the next migrate run
+    conn = sqlite3.connect(migrated_db)
+    conn.execute("INSERT INTO patients (mrn, name, dob) VALUES ('MRN004', 'Zoë Lee', '2000-02-02')")
+    conn.commit()
+    assert conn.execute("SELECT search_key FROM patients WHERE mrn = 'MRN004'").fetchone() == (None,)
+    conn.close()
+    assert lookup_patient(name="Zoë Lee", dob="2000-02-02")["mrn"] == "MRN004"
+
+
+def test_name_lookup_uses_index(migrated_db):
+    conn = sqlite3.connect(migrated_db)
+    plan = " ".join(r[3] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM patients "
+        "WHERE search_key = ? OR (search_key IS NULL AND name = ? AND dob = ?)", ("k", "n", "d")
+    ))
+    conn.close()
+    assert "idx_patients_search_key" in plan
+    assert "SCAN patients" not in plan
+
+
+def test_fuzzy_search_ranks_closest_name_and_dob_first(migrated_db):
+    results = search_patients("Jane Smit", dob="1985-07-01")
+    assert [r["mrn"] for r in results[:2]] == ["MRN002", "MRN001"]
+    assert all(r["mrn"] != "MRN003" for r in results)
+
+    # the trigram index follows writes through its triggers
+    conn = sqlite3.connect(migrated_db)
+    conn.execute("UPDATE patients SET name = 'Janet Smithers' WHERE mrn = 'MRN001'")
+    conn.commit()
+    conn.close()
+    assert search_patients("smithers")[0]["mrn"] == "MRN001"
+
+
+def test_rename_recomputes_search_key(migrated_db):
+    _rename(migrated_db, "MRN001", "Jane Doe")
+
+    assert lookup_patient(name="jane  DOE", dob="03/12/1990")["mrn"] == "MRN001"
+    assert lookup_patient(name="Jane Smith", dob="1990-03-12")["found"] is False
+
+
+# -----------------------------
+# Patient cache
+# -----------------------------
+def _rename(db_path, mrn, name):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE patients SET name = ? WHERE mrn = ?", (name, mrn))
+    conn.commit()
+    conn.close()
+
+
+def test_lookups_are_cached_under_mrn_and_name_key(migrated_db):
+    before = patient_cache_stats()
+    first = lookup_patient(name="Jane Smith", dob="1990-03-12")
+    first["email"] = "mutated@example.com"
+    by_mrn = lookup_patient(mrn="MRN001")
+    again = lookup_patient(name="JANE SMITH", dob="03/12/1990")
+
+    stats = patient_cache_stats()
+    assert stats["hits"] - before["hits"] == 2
+    assert by_mrn["name"] == "Jane Smith"
+    assert again["email"] is None
+
+
+def test_invalidation_drops_both_keys(migrated_db):
+    lookup_patient(mrn="MRN003")
+    _rename(migrated_db, "MRN003", "Bob Jones")
+    assert lookup_patient(mrn="MRN003")["name"] == "Robert Jones"  # stale until invalidated
+
+    invalidate_patient(mrn="MRN003")
+    assert lookup_patient(mrn="MRN003")["name"] == "Bob Jones"
+
+    invalidate_patient(name="Bob Jones", dob="1970-01-01")
+    _rename(migrated_db, "MRN003", "Robert Jones")
+    assert lookup_patient(mrn="MRN003")["name"] == "Robert Jones"
+
+
+def test_misses_are_not_cached(migrated_db):
+    assert lookup_patient(name="Ann Lee", dob="2000-02-02")["found"] is False
+    conn = sqlite3.connect(migrated_db)
+    conn.execute("INSERT INTO patients (mrn, name, dob) VALUES ('MRN004', 'Ann Lee', '2000-02-02')")
+    conn.commit()
+    conn.close()
+    assert lookup_patient(name="Ann Lee", dob="2000-02-02")["found"] is True
+
+
+# -----------------------------
+# Bulk classification
+# -----------------------------
+def _set_last_visits(db_path, visits):
+    conn = sqlite3.connect(db_path)
+    conn.executemany("UPDATE patients SET last_visit_dt = ? WHERE mrn = ?", visits)
+    conn.commit()
+    conn.close()
+
+
+def test_classify_patients_materializes_the_24_month_rule(migrated_db):
+    recent = (date.today() - timedelta(days=30)).isoformat()
+    _set_last_visits(migrated_db, [(recent, "MRN001"), ("2001-01-01", "MRN002"), ("last spring", "MRN003")])
+
+    assert classify_patients() == {"returning": 1, "new": 1, "unclassified": 1}
+    for mrn, expected in (("MRN001", "returning"), ("MRN002", "new"), ("MRN003", "new")):
+        assert lookup_patient(mrn=mrn)["classification"] == expected
+
+
+def test_lookup_reads_the_materialized_value(migrated_db):
+    classify_patients()
+    conn = sqlite3.connect(migrated_db)
+    conn.execute("UPDATE patients SET classification = 'returning' WHERE mrn = 'MRN003'")
+    conn.commit()
+    conn.close()
+    assert lookup_patient(mrn="MRN003")["classification"] == "returning"
+
+
+def test_new_visit_clears_the_materialized_value(migrated_db):
+    classify_patients()
+    _set_last_visits(migrated_db, [(date.today().isoformat(), "MRN002")])
+    conn = sqlite3.connect(migrated_db)
+    assert conn.execute("SELECT classification FROM patients WHERE mrn = 'MRN002'").fetchone() == (None,)
+    conn.close()
+    assert lookup_patient(mrn="MRN002")["classification"] == "returning"
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from tools import database
+from tools.outbox import OUTBOX_LEASE, OutboxWorker, enqueue
+
+
+class FlakySender:
+    """Fails the first `failures` sends, then records the rest."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def __call__(self, address, message):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("provider unavailable")
+        self.sent.append((address, message.sms))
+
+
+@pytest.fixture
+def worker(tmp_path):
+    sender = FlakySender()
+    return OutboxWorker(db_path=str(tmp_path / "outbox.db"), senders={"sms": sender}, max_attempts=3), sender
+
+
+def _enqueue(worker, key="appointment:1:booking_confirmation:sms"):
+    with database.transaction(worker.db_path) as conn:
+        return enqueue(conn, key, "sms", "+15550001", "booking_confirmation", {
+            "patient_name": "Jane", "duration_minutes": 30, "start_time": "2025-01-01T09:00:00",
+            "clinic_location": "Clinic A",
+        })
+
+
+def _row(worker):
+    with database.connection(worker.db_path) as conn:
+        return dict(conn.execute("SELECT * FROM outbox").fetchone())
+
+
+def test_enqueue_is_idempotent(worker):
+    worker, sender = worker
+    assert _enqueue(worker) is True
+    assert _enqueue(worker) is False
+    assert worker.drain()["sent"] == 1
+    assert sender.sent == [("+15550001", "Hello Jane, your 30-minute appointment is booked for "
+                                         "2025-01-01T09:00:00 at Clinic A.")]
+
+
+def test_failures_back_off_then_dead_letter(worker):
+    worker, sender = worker
+    sender.failures = 5
+    _enqueue(worker)
+    now = datetime.now()
+
+    assert worker.run_once(now) == {"sent": 0, "retried": 1, "dead": 0}
+    row = _row(worker)
+    assert row["attempts"] == 1 and row["last_error"] == "ConnectionError: provider unavailable"
+    retry_at = datetime.fromisoformat(row["next_attempt_at"])
+    assert now + timedelta(seconds=worker.base_delay / 2 - 1) <= retry_at
+    assert worker.run_once(now)["retried"] == 0  # not due yet
+
+    assert worker.run_once(retry_at)["retried"] == 1
+    assert worker.run_once(now + timedelta(days=1))["dead"] == 1
+    assert _row(worker)["status"] == "dead"
+    assert worker.run_once(now + timedelta(days=2)) == {"sent": 0, "retried": 0, "dead": 0}
+
+
+def test_backoff_grows_and_is_capped(worker):
+    worker, _ = worker
+    delays = [worker.backoff(n) for n in range(1, 12)]
+    assert worker.base_delay / 2 <= delays[0] <= worker.base_delay
+    assert delays[3] >= worker.base_delay * 4
+    assert max(delays) <= worker.max_delay
+
+
+def test_stale_claim_is_reclaimed(worker):
+    worker, sender = worker
+    _enqueue(worker)
+    now = datetime.now()
+    assert len(worker.claim(now, 10)) == 1  # this worker dies before sending
+
+    assert worker.run_once(now)["sent"] == 0
+    assert worker.run_once(now + OUTBOX_LEASE + timedelta(seconds=1))["sent"] == 1
+    assert len(sender.sent) == 1
+
+
+def test_cancel_before_drain_sends_nothing(monkeypatch, tmp_path):
+    from tests.test_calender_tool import _seed_tmp_schedule
+
+    cal, db_path = _seed_tmp_schedule(monkeypatch, tmp_path, doctors=("D001",), slots=4)
+    sender = FlakySender()
+    worker = OutboxWorker(db_path=db_path, senders={"sms": sender})
+    cal.reserve_slot("MRN001", duration_minutes=30, notify=[{
+        "channel": "sms", "address": "+15550001", "template": "booking_confirmation",
+        "context": {"patient_name": "Jane"},
+    }])
+    cancelled = cal.reserve_slot("MRN002", duration_minutes=30, notify=[{
+        "channel": "sms", "address": "+15550002", "template": "booking_confirmation",
+        "context": {"patient_name": "Joe"},
+    }])
+    cal.release_slot(cancelled["slot_ids"])
+
+    assert worker.drain() == {"sent": 1, "retried": 0, "dead": 0}
+    assert [address for address, _ in sender.sent] == ["+15550001"]
+    assert worker.stats() == {"sent": 1, "dead": 1}
+
+
+def test_cancel_uses_the_appointment_index(worker):
+    worker, _ = worker
+    with database.connection(worker.db_path) as conn:
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN UPDATE outbox SET status='dead' "
+            "WHERE appointment_id IN (SELECT value FROM json_each(?)) AND status IN ('pending','sending')",
+            ("[1]",),
+        ))
+    assert "idx_outbox_appointment" in plan
+
+
+def test_purge_drops_old_sent_and_dead_rows(worker):
+    worker, sender = worker
+    sender.failures = 3
+    _enqueue(worker, "appointment:1:booking_confirmation:sms")
+    now = datetime.now()
+    worker.drain(now + timedelta(days=1))
+    worker.drain(now + timedelta(days=2))
+    assert worker.drain(now + timedelta(days=3))["dead"] == 1
+    _enqueue(worker, "appointment:2:booking_confirmation:sms")
+    worker.drain()
+    _enqueue(worker, "appointment:3:booking_confirmation:sms")
+
+    assert worker.purge(now + timedelta(days=1)) == 0
+    assert worker.purge(now + timedelta(days=60)) == 2
+    assert worker.stats() == {"pending": 1}
@@ -0,0 +1,186 @@
+import smtplib
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import tools.reminder_tool as reminder_tool
+from tests.test_calender_tool import _seed_tmp_schedule
+from tools.rate_limit import TokenBucket
+from tools.reminder_tool import ReminderTool
+
+
+class FakeSender:
+    """Records email / SMS sends instead of delivering them."""
+
+    def __init__(self, delay=0.0, failures=()):
+        self.sent = []
+        self.delay = delay
+        self.failures = list(failures)  # exceptions raised by the next sends
+        self._lock = threading.Lock()
+
+    def _send(self, record):
+        time.sleep(self.delay)
+        with self._lock:
+            if self.failures:
+                raise self.failures.pop(0)
+            self.sent.append(record)
+
+    def send_email(self, to_email, subject, body):
+        self._send(("email", to_email, subject))
+
+    def send_sms(self, to_number, message):
+        self._send(("sms", to_number, message))
+
+
+@pytest.fixture
+def reminders(monkeypatch, tmp_path):
+    cal, db_path = _seed_tmp_schedule(monkeypatch, tmp_path, doctors=("D001",), slots=8)
+    conn = sqlite3.connect(db_path)
+    # three days out, so every stage is still ahead at booking time
+    conn.execute("""
+    UPDATE doctor_schedules SET start_dt = strftime('%Y-%m-%dT%H:%M:%S', start_dt, '+2 days'),
+                                end_dt = strftime('%Y-%m-%dT%H:%M:%S', end_dt, '+2 days')
+    """)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(reminder_tool, "DB_PATH", db_path)
+    sender = FakeSender()
+    return cal, db_path, ReminderTool(email_tool=sender, sms_tool=sender), sender
+
+
+def _rows(db_path, sql, args=()):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(sql, args).fetchall()
+    conn.close()
+    return rows
+
+
+def test_booking_materializes_every_stage(reminders):
+    cal, db_path, _, _ = reminders
+    booking = cal.reserve_slot("MRN001", duration_minutes=30, visit_type="returning")
+
+    assert _rows(db_path, "SELECT patient_mrn, type, status FROM appointments WHERE id=?",
+                 (booking["appointment_id"],)) == [("MRN001", "returning", "confirmed")]
+    rows = _rows(db_path, "SELECT stage, channel, when_dt, status FROM reminders ORDER BY stage, channel")
+    start = datetime.fromisoformat(booking["start"])
+    assert [(s, c) for s, c, _, _ in rows] == [(s, c) for s in (1, 2, 3) for c in ("email", "sms")]
+    assert rows[0][2] == (start - timedelta(hours=48)).isoformat(timespec="seconds")
+    assert {r[3] for r in rows} == {"pending"}
+
+
+def test_runs_send_only_due_stages_once(reminders):
+    cal, _, tool, sender = reminders
+    start = datetime.fromisoformat(cal.reserve_slot("MRN001", duration_minutes=30)["start"])
+
+    assert tool.run_reminders(now=start - timedelta(hours=47))["sent"] == 2
+    assert sorted(s[0] for s in sender.sent) == ["email", "sms"]
+    assert ("email", "carlos47@example.net") in {s[:2] for s in sender.sent}  # from the patient record
+
+    assert tool.run_reminders(now=start - timedelta(hours=47))["sent"] == 0
+    assert tool.run_reminders(now=start - timedelta(hours=3))["sent"] == 4
+    assert len(sender.sent) == 6
+
+
+def test_cancelled_booking_sends_nothing(reminders):
+    cal, db_path, tool, sender = reminders
+    booking = cal.reserve_slot("MRN001", duration_minutes=60)
+    cal.release_slot(booking["slot_ids"])
+
+    start = datetime.fromisoformat(booking["start"])
+    assert tool.run_reminders(now=start - timedelta(hours=1))["sent"] == 0
+    assert sender.sent == []
+    assert {r[0] for r in _rows(db_path, "SELECT status FROM reminders")} == {"cancelled"}
+
+
+def test_patient_without_record_uses_the_booking_contact(reminders):
+    cal, _, tool, _ = reminders
+    contact = {"name": "Ann Lee", "email": "ann@example.com", "phone": "+15550003"}
+    start = datetime.fromisoformat(cal.reserve_slot("TEMP-NOBODY", duration_minutes=30, contact=contact)["start"])
+
+    due = tool.claim_due(now=start - timedelta(hours=47))
+    assert {(r["channel"], r["address"], r["name"]) for r in due} == {
+        ("email", "ann@example.com", "Ann Lee"), ("sms", "+15550003", "Ann Lee"),
+    }
+
+
+def test_patient_without_record_or_contact_is_skipped(reminders):
+    cal, db_path, tool, sender = reminders
+    start = datetime.fromisoformat(cal.reserve_slot("TEMP-NOBODY", duration_minutes=30)["start"])
+
+    assert tool.run_reminders(now=start - timedelta(hours=1))["sent"] == 0
+    assert {r[0] for r in _rows(db_path, "SELECT status FROM reminders")} == {"skipped"}
+
+
+def test_due_poll_uses_status_when_index(reminders):
+    _, db_path, _, _ = reminders
+    plan = " ".join(r[3] for r in _rows(
+        db_path, "EXPLAIN QUERY PLAN SELECT id FROM reminders "
+                 "WHERE status='pending' AND when_dt <= ? ORDER BY when_dt LIMIT 100", ("x",)
+    ))
+    assert "idx_reminders_due" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+# -----------------------------
+# Dispatch
+# -----------------------------
+def _book(cal, patients):
+    return [datetime.fromisoformat(cal.reserve_slot(mrn, duration_minutes=30)["start"]) for mrn in patients]
+
+
+def test_batch_is_sent_concurrently(reminders):
+    cal, _, _, _ = reminders
+    sender = FakeSender(delay=0.05)
+    tool = ReminderTool(email_tool=sender, sms_tool=sender, workers=8, rates={"email": 1000, "sms": 1000})
+    last = max(_book(cal, ["MRN001", "MRN002", "MRN003", "MRN004"]))
+
+    counts = tool.run_reminders(now=last - timedelta(hours=3))
+    assert counts["sent"] == 24
+    assert counts["elapsed_s"] < 24 * 0.05 / 2  # serial sending would take 1.2s
+    assert counts["per_sec"] > 0
+
+
+def test_same_message_to_same_recipient_goes_once(reminders):
+    cal, db_path, tool, sender = reminders
+    start = _book(cal, ["MRN001", "MRN001"])[0]
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE appointments SET start_dt = ?", (start.isoformat(),))  # double-booked
+    conn.commit()
+    conn.close()
+
+    counts = tool.run_reminders(now=start - timedelta(hours=47))
+    assert counts["sent"] == 2 and counts["skipped"] == 2
+    assert len(sender.sent) == 2
+
+
+def test_transient_failures_are_retried(reminders):
+    cal, db_path, _, _ = reminders
+    sender = FakeSender(failures=[smtplib.SMTPServerDisconnected("reset"), ConnectionError("reset")])
+    tool = ReminderTool(email_tool=sender, sms_tool=sender, backoff_max=0.01)
+    start = _book(cal, ["MRN001"])[0]
+
+    counts = tool.run_reminders(now=start - timedelta(hours=47))
+    assert counts["sent"] == 2 and counts["failed"] == 0
+
+
+def test_permanent_failure_is_recorded(reminders):
+    cal, db_path, _, _ = reminders
+    sender = FakeSender(failures=[smtplib.SMTPRecipientsRefused({"x": (550, b"no such user")})])
+    tool = ReminderTool(email_tool=sender, sms_tool=sender, workers=1)
+    start = _book(cal, ["MRN001"])[0]
+
+    counts = tool.run_reminders(now=start - timedelta(hours=47))
+    assert counts["failed"] == 1 and counts["sent"] == 1
+    assert _rows(db_path, "SELECT count(*) FROM reminders WHERE status = 'failed'") == [(1,)]
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    t0 = time.perf_counter()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.perf_counter() - t0 >= 10 / 50 * 0.9
+    assert not bucket.try_acquire()
@@ -0,0 +1,155 @@
+import shutil
+import sqlite3
+import time
+
+import pytest
+
+import scheduler_graph
+import tools.calendar_tool as calendar_tool
+import tools.patient_lookup as patient_lookup
+from tests.test_calender_tool import _seed_tmp_schedule
+from tools import database
+from tools.outbox import OutboxWorker
+
+PATIENT = {
+    "name": "John Doe",
+    "dob": "1980-05-15",
+    "mrn": None,
+    "email": "patient@example.com",
+    "phone": "+911234567890",
+    "doctor": "Dr. Smith",
+    "location": "Clinic A",
+}
+
+
+@pytest.fixture
+def graph(monkeypatch, tmp_path):
+    _, db_path = _seed_tmp_schedule(monkeypatch, tmp_path)
+    patients_db = str(tmp_path / "patients.db")
+    shutil.copyfile(database.PATIENTS_DB, patients_db)
+    monkeypatch.setattr(patient_lookup, "DB_PATH", patients_db)
+    monkeypatch.setattr(calendar_tool, "CALENDLY_API_KEY", None)
+    scheduler_graph.get_tool.cache_clear()
+    yield scheduler_graph.create_scheduler_graph(), db_path
+    scheduler_graph.get_tool.cache_clear()
+
+
+def _outbox(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT channel, address, template, status FROM outbox ORDER BY channel").fetchall()
+    conn.close()
+    return rows
+
+
+def test_graph_is_compiled_once():
+    assert scheduler_graph.get_scheduler_graph() is scheduler_graph.get_scheduler_graph()
+
+
+def test_env_is_loaded_once():
+    from tools.config import load_env
+    load_env()
+    load_env()
+    assert load_env.cache_info().misses == 1
+
+
+def test_booking_writes_notifications_to_the_outbox(graph):
+    scheduler, db_path = graph
+    t0 = time.perf_counter()
+    state = scheduler.invoke({"patient": dict(PATIENT), "lookup_result": None, "booking": None})
+    assert time.perf_counter() - t0 < 2
+    assert state["booking"]["status"] == "booked"
+    assert state["notifications"] == {"email": "queued", "sms": "queued"}
+    assert state["notified"] is True
+    assert _outbox(db_path) == [
+        ("email", "patient@example.com", "booking_confirmation", "pending"),
+        ("sms", "+911234567890", "booking_confirmation", "pending"),
+    ]
+    conn = sqlite3.connect(db_path)
+    contact = conn.execute("SELECT patient_name, email, phone FROM appointments WHERE id=?",
+                           (state["booking"]["appointment_id"],)).fetchone()
+    conn.close()
+    assert contact == ("John Doe", "patient@example.com", "+911234567890")
+
+    sent = []
+    worker = OutboxWorker(senders={
+        "email": lambda address, message: sent.append(("email", address, message.subject)),
+        "sms": lambda address, message: sent.append(("sms", address, message.sms)),
+    })
+    assert worker.run_once() == {"sent": 2, "retried": 0, "dead": 0}
+    assert {c for c, _, _ in sent} == {"email", "sms"}
+    assert all(state["booking"]["start_time"] in text for _, _, text in sent)
+    assert worker.stats() == {"sent": 2}
+
+
+def test_timings_recorded_per_node(graph):
+    scheduler, _ = graph
+    state = scheduler.invoke({"patient": dict(PATIENT), "lookup_result": None, "booking": None})
+    assert set(state["timings"]) == {"intake", "lookup", "booking", "notify_email", "notify_sms"}
+    assert all(ms >= 0 for ms in state["timings"].values())
+
+
+def test_missing_contact_is_skipped(graph):
+    scheduler, db_path = graph
+    state = scheduler.invoke({"patient": dict(PATIENT, phone=None), "lookup_result": None, "booking": None})
+
+    assert state["notifications"] == {"email": "queued", "sms": "skipped"}
+    assert [r[0] for r in _outbox(db_path)] == ["email"]
+
+
+def test_link_booking_is_queued_once(graph):
+    scheduler, db_path = graph
+    state = {"patient": dict(PATIENT), "booking": {"booking_url": "https://calendly.com/d/abc", "duration_minutes": 30}}
+
+    for _ in range(2):  # a retried graph run must not notify twice
+        assert scheduler_graph.notify_email_node(state) == {"notifications": {"email": "queued"}, "notified": True}
+    assert _outbox(db_path) == [("email", "patient@example.com", "booking_link", "pending")]
+
+
+def test_ainvoke_runs_concurrent_bookings_without_double_booking(graph, monkeypatch):
+    import asyncio
+
+    scheduler, _ = graph
+    calls = []
+    areserve = calendar_tool.CalendarTool.areserve_slot
+
+    async def counting_areserve(self, *args, **kwargs):
+        calls.append(args)
+        return await areserve(self, *args, **kwargs)
+
+    monkeypatch.setattr(calendar_tool.CalendarTool, "areserve_slot", counting_areserve)
+
+    async def run(n):
+        return await asyncio.gather(*(
+            scheduler.ainvoke({"patient": dict(PATIENT, mrn=f"MRN{i:04d}"), "lookup_result": None, "booking": None})
+            for i in range(n)
+        ))
+
+    states = asyncio.run(run(30))
+    claimed = [sid for s in states for sid in s["booking"]["slot_ids"]]
+    assert len(claimed) == len(set(claimed)) == 60  # 60-minute visits, two slots each
+    assert len(calls) >= 30
+
+
+def test_booking_goes_to_the_requested_doctor(graph):
+    import asyncio
+    from datetime import datetime, timedelta
+
+    scheduler, db_path = graph
+    start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=3)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO doctor_schedules (doctor_id, clinic_location, start_dt, end_dt, status) "
+        "VALUES ('Dr. Baker', 'Clinic B', ?, ?, 'free')",
+        [((start + timedelta(minutes=30 * n)).isoformat(), (start + timedelta(minutes=30 * n + 30)).isoformat())
+         for n in range(4)],
+    )
+    conn.commit()
+    conn.close()
+
+    # Dr. Baker has no slots in Clinic A and later ones than everyone else
+    patient = dict(PATIENT, doctor="Dr. Baker", location="Clinic A")
+    state = scheduler.invoke({"patient": dict(patient), "lookup_result": None, "booking": None})
+    assert (state["booking"]["doctor_id"], state["booking"]["location"]) == ("Dr. Baker", "Clinic B")
+
+    state = asyncio.run(scheduler.ainvoke({"patient": dict(patient), "lookup_result": None, "booking": None}))
+    assert state["booking"]["doctor_id"] == "Dr. Baker"
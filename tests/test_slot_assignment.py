@@ -0,0 +1,90 @@
+import random
+from datetime import datetime, timedelta
+
+from tools.slot_assignment import TIER_ANY, TIER_DOCTOR, TIER_LOCATION, SlotRequest, assign_slots
+
+DAY0 = datetime(2030, 1, 7, 9, 0)
+
+
+def slots(doctor, location, first, count, day=0):
+    """`count` back-to-back 30-minute slots starting at slot index `first`."""
+    out = []
+    for n in range(first, first + count):
+        s = DAY0 + timedelta(days=day, minutes=30 * n)
+        out.append((f"{doctor}-{day}-{n}", doctor, location, s.isoformat(), (s + timedelta(minutes=30)).isoformat()))
+    return out
+
+
+def test_preferences_are_tried_doctor_then_location_then_any():
+    free = slots("D1", "Clinic A", 4, 1) + slots("D2", "Clinic B", 0, 1) + slots("D3", "Clinic C", 2, 1)
+    plan = assign_slots([
+        SlotRequest("doc", doctor_id="D1"),
+        SlotRequest("loc", location="Clinic B"),
+        SlotRequest("any", doctor_id="D9", location="Clinic Z"),
+    ], free)
+
+    got = {k: (a["doctor_id"], a["tier"]) for k, a in plan["assigned"].items()}
+    assert got == {"doc": ("D1", TIER_DOCTOR), "loc": ("D2", TIER_LOCATION), "any": ("D3", TIER_ANY)}
+
+
+def test_visit_length_needs_back_to_back_slots():
+    free = slots("D1", "Clinic A", 0, 1) + slots("D1", "Clinic A", 2, 2)
+    plan = assign_slots([SlotRequest("long", duration_minutes=60)], free)
+    assert plan["assigned"]["long"]["slot_ids"] == ["D1-0-2", "D1-0-3"]
+
+
+def test_longer_visits_are_placed_first_to_fill_more_demand():
+    # a first-come 30-minute visit would split the only 60-minute run
+    free = slots("D1", "Clinic A", 0, 2) + slots("D2", "Clinic A", 5, 1)
+    plan = assign_slots([SlotRequest("short"), SlotRequest("long", duration_minutes=60)], free)
+    assert plan["unassigned"] == []
+    assert plan["assigned"]["short"]["doctor_id"] == "D2"
+
+
+def test_strict_requests_do_not_fall_back_and_earliest_is_honoured():
+    free = slots("D1", "Clinic A", 0, 4)
+    plan = assign_slots([
+        SlotRequest("strict", doctor_id="D2", fallback=False),
+        SlotRequest("later", earliest=(DAY0 + timedelta(hours=1)).isoformat()),
+    ], free)
+    assert plan["unassigned"] == ["strict"]
+    assert plan["assigned"]["later"]["start"] == (DAY0 + timedelta(hours=1)).isoformat()
+
+
+def test_assignment_is_deterministic_and_never_reuses_a_slot():
+    rng = random.Random(1)
+    free = [s for d in range(5) for day in range(3) for s in slots(f"D{d}", f"Clinic {d % 2}", 0, 12, day)]
+    requests = [
+        SlotRequest(n, duration_minutes=rng.choice((30, 60)),
+                    location=rng.choice((None, "Clinic 0", "Clinic 1")))
+        for n in range(150)
+    ]
+
+    first = assign_slots(requests, free)
+    shuffled = free[:]
+    rng.shuffle(shuffled)
+    assert assign_slots(requests, shuffled) == first
+
+    used = [s for a in first["assigned"].values() for s in a["slot_ids"]]
+    assert len(used) == len(set(used))
+
+
+def test_doctor_request_prefers_its_clinic():
+    free = slots("D1", "Clinic A", 0, 1) + slots("D1", "Clinic B", 4, 1)
+    plan = assign_slots([SlotRequest("visit", doctor_id="D1", location="Clinic B")], free)
+    assert plan["assigned"]["visit"]["location"] == "Clinic B"
+    assert plan["assigned"]["visit"]["tier"] == TIER_DOCTOR
+
+
+def test_earliest_cutoffs_match_a_brute_force_scan():
+    free = slots("D1", "Clinic A", 0, 16)
+    cutoffs = [(DAY0 + timedelta(minutes=30 * n)).isoformat() for n in (3, 3, 0, 8, 3, 15, 15)]
+    plan = assign_slots([SlotRequest(n, earliest=e) for n, e in enumerate(cutoffs)], free)
+
+    taken = set()
+    for n, earliest in enumerate(cutoffs):
+        expected = min((s[3] for s in free if s[3] >= earliest and s[0] not in taken), default=None)
+        got = plan["assigned"].get(n)
+        assert (got["start"] if got else None) == expected
+        if got:
+            taken.update(got["slot_ids"])
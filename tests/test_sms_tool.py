@@ -1,5 +1,7 @@
 import os
+
 import pytest
+from tools.sms_log import SMSLog, get_sms_log, replay
 from tools.sms_tool import SMSTool
 
 
@@ -8,7 +10,7 @@ def test_sms_simulation(tmp_path, monkeypatch):
     Test SMS simulation mode (no Twilio).
     """
     # Use a temp log file so tests don't overwrite real logs
-    log_file = tmp_path / "sms_log.txt"
+    log_file = tmp_path / "sms_log.jsonl"
     monkeypatch.chdir(tmp_path)
 
     sms_tool = SMSTool(use_twilio=False)
@@ -18,9 +20,58 @@ def test_sms_simulation(tmp_path, monkeypatch):
     assert "message" in result
 
     # Verify log file created
+    assert sms_tool.log.flush(timeout=5)
     assert log_file.exists()
-    content = log_file.read_text()
-    assert "Test SMS from simulation mode." in content
+    (record,) = list(replay(str(log_file)))
+    assert record["to"] == "+911234567890"
+    assert record["message"] == "Test SMS from simulation mode."
+    sms_tool.log.close()
+
+
+def test_sms_log_is_buffered_and_rotated(tmp_path):
+    path = tmp_path / "sms.jsonl"
+    log = SMSLog(str(path), flush_interval=60, max_bytes=4096, backups=2)
+
+    for i in range(500):
+        log.write({"to": f"+1555{i:07d}", "message": f"Reminder {i}"})
+    assert not path.exists() or path.stat().st_size == 0  # nothing on disk before a flush
+    assert log.flush(timeout=5)
+    assert path.stat().st_size > 0
+
+    for i in range(500, 2000):
+        log.write({"to": f"+1555{i:07d}", "message": f"Reminder {i}"})
+    log.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["sms.jsonl", "sms.jsonl.1", "sms.jsonl.2"]
+    assert all(p.stat().st_size <= 4096 for p in tmp_path.iterdir())
+    messages = [r["message"] for r in replay(str(path))]
+    assert messages == [f"Reminder {i}" for i in range(2000)][-len(messages):]  # oldest rotated away
+
+
+def test_closed_shared_log_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.setenv("SMS_SIMULATION_ECHO", "0")
+    path = tmp_path / "sms.jsonl"
+    sms_tool = SMSTool(log_path=str(path))
+    sms_tool.send_sms("+15550001", "first")
+    first = get_sms_log(str(path))
+    first.close()
+
+    sms_tool.send_sms("+15550002", "second")
+    assert get_sms_log(str(path)) is not first
+    assert sms_tool.log.flush(timeout=5)
+    sms_tool.log.close()
+    assert [r["message"] for r in replay(str(path))] == ["first", "second"]
+
+
+def test_sms_log_flush_after_close_does_not_block(tmp_path):
+    log = SMSLog(str(tmp_path / "sms.jsonl"))
+    log.write({"to": "+15550001", "message": "hi"})
+    assert log.flush() is True
+    log.close()
+
+    assert log.flush() is True  # closing flushed everything
+    log.write({"to": "+15550002", "message": "too late"})
+    assert log.flush() is False  # nothing left to write it
 
 
 @pytest.mark.skipif(
@@ -39,3 +90,58 @@ def test_sms_twilio():
 
     assert result["status"] == "sent"
     assert "sid" in result
+
+
+# -----------------------------
+# Twilio (against tests/fake_twilio.py)
+# -----------------------------
+@pytest.fixture
+def twilio(monkeypatch):
+    from tests.fake_twilio import FakeTwilio
+
+    def start(**kwargs):
+        fake = FakeTwilio(**kwargs).__enter__()
+        fakes.append(fake)
+        monkeypatch.setenv("TWILIO_SID", "AC" + "0" * 32)
+        monkeypatch.setenv("TWILIO_AUTH_TOKEN", "token")
+        monkeypatch.setenv("TWILIO_PHONE_NUMBER", "+15550000000")
+        monkeypatch.setenv("TWILIO_BASE_URL", fake.url)
+        return fake
+
+    fakes = []
+    yield start
+    for fake in fakes:
+        fake.__exit__(None, None, None)
+
+
+def test_twilio_client_is_shared_and_pooled(twilio):
+    fake = twilio()
+    first, second = SMSTool(use_twilio=True, rate=1000), SMSTool(use_twilio=True, rate=1000)
+    assert first.twilio_client is second.twilio_client
+
+    for i in range(10):
+        assert first.send_sms(f"+1555000{i:04d}", "hi")["status"] == "sent"
+    assert len(fake.messages) == 10
+    assert fake.connections == 1  # one keep-alive connection for all sends
+
+
+def test_send_many_is_concurrent_and_records_rejects(twilio):
+    fake = twilio(latency=0.05, reject={"+15550000003"})
+    sms_tool = SMSTool(use_twilio=True, rate=1000)
+
+    result = sms_tool.send_many(
+        [{"to_number": f"+1555000000{i}", "message": f"Reminder {i}"} for i in range(8)] * 3, workers=8
+    )
+    assert result["sent"] == 21
+    assert [to for to, _ in result["failed"]] == ["+15550000003"] * 3
+    assert result["elapsed_s"] < 24 * 0.05 / 2  # serial sends would take 1.2s
+    assert sorted(m["body"] for m in fake.messages)[0] == "Reminder 0"
+
+
+def test_send_many_is_throttled_to_the_sender_rate(twilio):
+    twilio()
+    sms_tool = SMSTool(use_twilio=True, rate=50)
+
+    result = sms_tool.send_many([{"to_number": "+15550001", "message": "hi"}] * 60, workers=8)
+    assert result["sent"] == 60
+    assert result["elapsed_s"] >= 10 / 50 * 0.9  # 50-message burst, then 50/s
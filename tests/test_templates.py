@@ -0,0 +1,50 @@
+import email
+from email.policy import default
+
+import pytest
+
+from tools.reminder_tool import reminder_message
+from tools.templates import mime_message, render
+
+
+def test_patient_values_are_escaped_in_html_only():
+    message = render(
+        "booking_link", patient_name="<script>x</script>", doctor="Dr. O'Neil", clinic_location="A & B",
+        duration_minutes=30, booking_url="https://example.com/?a=1&b=2",
+    )
+    assert "&lt;script&gt;" in message.html and "<script>" not in message.html
+    assert 'href="https://example.com/?a=1&amp;b=2"' in message.html
+    assert "<script>x</script>" in message.text
+    assert message.sms.endswith("https://example.com/?a=1&b=2")
+
+
+def test_subject_cannot_carry_line_breaks():
+    message = render("appointment_reminder", patient_name="x", appointment_dt="Mon\r\nBcc: a@b.c",
+                     clinic_location="A")
+    assert "\n" not in message.subject
+
+
+def test_missing_value_raises():
+    with pytest.raises(KeyError):
+        render("reminder_stage_1", patient_name="Jane")
+
+
+def test_reminder_text_is_unchanged():
+    subject, body, sms = reminder_message(2, "Jane", "2030-01-07T09:00:00")
+    assert subject == "Action Needed: Forms for your appointment on 2030-01-07T09:00:00"
+    assert body.startswith("Hello Jane, please complete your intake forms")
+    assert sms == "Reminder: Please complete your intake forms before 2030-01-07T09:00:00."
+
+
+@pytest.mark.parametrize("name", ["Jane Smith", "Zoë Åberg"])
+def test_mime_message_round_trips(name):
+    message = render("appointment_reminder", patient_name=name, appointment_dt="2030-01-07 09:00",
+                     clinic_location="Clinic A")
+    raw = mime_message("clinic@example.com", "jane@example.com", message.subject, message.text, message.html)
+    parsed = email.message_from_string(raw, policy=default)
+
+    assert parsed["To"] == "jane@example.com"
+    assert parsed["Subject"] == message.subject
+    plain, html = parsed.iter_parts()
+    assert plain.get_content().rstrip("\n") == message.text
+    assert name in html.get_content()
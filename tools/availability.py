@@ -0,0 +1,308 @@
+# tools/availability.py
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from tools import database
+
+EPOCH = datetime(1970, 1, 1)
+MINUTE = timedelta(minutes=1)
+# other processes book the same DB without telling this one; a shared index
+# older than this is reloaded before it is used again (seconds)
+AVAILABILITY_INDEX_TTL = float(os.getenv("AVAILABILITY_INDEX_TTL", 60))
+
+
+def to_minutes(value) -> int:
+    """ISO string / datetime -> minutes since epoch (naive, same as the DB)."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return (value - EPOCH) // MINUTE
+
+
+def to_iso(minutes: int) -> str:
+    return (EPOCH + timedelta(minutes=minutes)).isoformat()
+
+
+class _FreeIntervals:
+    """
+    Merged free intervals of one doctor/location, kept as sorted arrays.
+
+    `starts`/`ends` hold every interval in start order. `by_length` groups
+    interval starts by length so earliest-fit only bisects the groups long
+    enough for the visit: O(L log n) with L distinct interval lengths
+    (bounded by a working day / slot length).
+    """
+
+    def __init__(self, slot_minutes: int = 30):
+        self.slot_minutes = slot_minutes
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        self.by_length: dict[int, list[int]] = {}
+
+    # -- bookkeeping --
+    def _add(self, start: int, end: int):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        insort(self.by_length.setdefault(end - start, []), start)
+
+    def _remove(self, i: int):
+        start = self.starts.pop(i)
+        end = self.ends.pop(i)
+        group = self.by_length[end - start]
+        del group[bisect_left(group, start)]
+        if not group:
+            del self.by_length[end - start]
+
+    def _append_sorted(self, start: int, end: int):
+        """Bulk-load path: intervals arrive in start order."""
+        self.starts.append(start)
+        self.ends.append(end)
+        self.by_length.setdefault(end - start, []).append(start)
+
+    def _align(self, start: int, after: int) -> int:
+        """First slot boundary of the interval starting at `start` that is >= after."""
+        if after <= start:
+            return start
+        steps = -(-(after - start) // self.slot_minutes)
+        return start + steps * self.slot_minutes
+
+    # -- updates --
+    def book(self, start: int, end: int) -> bool:
+        i = bisect_right(self.starts, start) - 1
+        if i < 0 or self.ends[i] < end:
+            return False
+        istart, iend = self.starts[i], self.ends[i]
+        self._remove(i)
+        if istart < start:
+            self._add(istart, start)
+        if end < iend:
+            self._add(end, iend)
+        return True
+
+    def free(self, start: int, end: int):
+        i = bisect_left(self.starts, start)
+        # merge with the interval ending exactly where this one starts
+        if i > 0 and self.ends[i - 1] == start:
+            start = self.starts[i - 1]
+            self._remove(i - 1)
+            i -= 1
+        # ... and the one starting exactly where it ends
+        if i < len(self.starts) and self.starts[i] == end:
+            end = self.ends[i]
+            self._remove(i)
+        self._add(start, end)
+
+    # -- queries --
+    def earliest_fit(self, duration: int, after: int):
+        best = None
+
+        # an interval already in progress at `after`
+        i = bisect_right(self.starts, after) - 1
+        if i >= 0:
+            begin = self._align(self.starts[i], after)
+            if self.ends[i] - begin >= duration:
+                best = begin
+
+        for length, group in self.by_length.items():
+            if length < duration:
+                continue
+            j = bisect_left(group, after)
+            if j < len(group) and (best is None or group[j] < best):
+                best = group[j]
+        return best
+
+    def fits_in_range(self, duration: int, start: int, end: int):
+        out = []
+        i = max(bisect_right(self.starts, start) - 1, 0)
+        while i < len(self.starts) and self.starts[i] < end:
+            begin = self._align(self.starts[i], start)
+            finish = min(self.ends[i], end)
+            if finish - begin >= duration:
+                out.append((begin, finish))
+            i += 1
+        return out
+
+
+class AvailabilityIndex:
+    """
+    In-process index of free time per (doctor_id, clinic_location), built from
+    doctor_schedules and kept current by CalendarTool on every booking and
+    cancellation. The DB stays the source of truth; the index answers
+    "when is the next 60-minute window" without touching it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: dict[tuple[str, str], _FreeIntervals] = {}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_db(cls, db_path: str = database.APPOINTMENTS_DB) -> "AvailabilityIndex":
+        index = cls()
+        index.rebuild(db_path)
+        return index
+
+    def rebuild(self, db_path: str = database.APPOINTMENTS_DB, doctor_id: str | None = None,
+                location: str | None = None):
+        """
+        Reload free slots, merging back-to-back slots into intervals. With
+        `doctor_id` and `location` only that calendar is reloaded.
+        """
+        one = doctor_id is not None and location is not None
+        only = (doctor_id, location)
+        keys: dict[tuple[str, str], _FreeIntervals] = {}
+        with database.connection(db_path) as conn:
+            # One row per doctor/location: epoch conversion and concatenation run
+            # inside SQLite, so Python parses a handful of strings instead of
+            # materialising a row object per slot (the bulk of rebuild time).
+            cur = conn.cursor()
+            cur.row_factory = None
+            rows = cur.execute(f"""
+            SELECT doctor_id, clinic_location,
+                   group_concat((unixepoch(start_dt) / 60) || ' ' || (unixepoch(end_dt) / 60), ' ')
+            FROM doctor_schedules
+            WHERE status='free' AND doctor_id IS NOT NULL {"AND doctor_id=? AND clinic_location=?" if one else ""}
+            GROUP BY doctor_id, clinic_location
+            """, only if one else ()).fetchall()
+
+        for doctor_id, location, packed in rows:
+            nums = list(map(int, packed.split()))
+            starts, ends = nums[0::2], nums[1::2]
+            if starts != sorted(starts):
+                pairs = sorted(zip(starts, ends))
+                starts, ends = [p[0] for p in pairs], [p[1] for p in pairs]
+
+            intervals = keys[(doctor_id, location)] = _FreeIntervals(slot_minutes=ends[0] - starts[0])
+            run_start, run_end = starts[0], ends[0]
+            for start, end in zip(starts, ends):
+                if start <= run_end:
+                    if end > run_end:
+                        run_end = end
+                else:
+                    intervals._append_sorted(run_start, run_end)
+                    run_start, run_end = start, end
+            intervals._append_sorted(run_start, run_end)
+
+        with self._lock:
+            if one:
+                self._keys.pop(only, None)
+                self._keys.update(keys)
+            else:
+                self._keys = keys
+                self.built_at = time.monotonic()
+
+    def _matching(self, doctor_id: str | None, location: str | None):
+        return [
+            (key, intervals) for key, intervals in self._keys.items()
+            if (doctor_id is None or key[0] == doctor_id)
+            and (location is None or key[1] == location)
+        ]
+
+    def earliest_fit(
+        self,
+        doctor_id: str | None = None,
+        location: str | None = None,
+        duration_minutes: int = 30,
+        after=None,
+    ):
+        """
+        Earliest window of `duration_minutes` starting at or after `after`
+        (default: now). Returns {"doctor_id", "location", "start", "end"} or None.
+        """
+        after_min = to_minutes(after or datetime.now())
+        best = None
+        with self._lock:
+            for key, intervals in self._matching(doctor_id, location):
+                start = intervals.earliest_fit(duration_minutes, after_min)
+                if start is not None and (best is None or start < best[1]):
+                    best = (key, start)
+        if best is None:
+            return None
+        (doc, loc), start = best
+        return {
+            "doctor_id": doc,
+            "location": loc,
+            "start": to_iso(start),
+            "end": to_iso(start + duration_minutes),
+        }
+
+    def fits_in_range(
+        self,
+        start,
+        end,
+        doctor_id: str | None = None,
+        location: str | None = None,
+        duration_minutes: int = 30,
+    ):
+        """All free intervals (clipped to [start, end)) that can hold the visit."""
+        lo, hi = to_minutes(start), to_minutes(end)
+        out = []
+        with self._lock:
+            for (doc, loc), intervals in self._matching(doctor_id, location):
+                for begin, finish in intervals.fits_in_range(duration_minutes, lo, hi):
+                    out.append({
+                        "doctor_id": doc,
+                        "location": loc,
+                        "start": to_iso(begin),
+                        "end": to_iso(finish),
+                    })
+        out.sort(key=lambda w: (w["start"], w["doctor_id"], w["location"]))
+        return out
+
+    def mark_booked(self, doctor_id: str, location: str, start, end) -> bool:
+        with self._lock:
+            intervals = self._keys.get((doctor_id, location))
+            if intervals is None:
+                return False
+            return intervals.book(to_minutes(start), to_minutes(end))
+
+    def mark_free(self, doctor_id: str, location: str, start, end):
+        s, e = to_minutes(start), to_minutes(end)
+        with self._lock:
+            intervals = self._keys.get((doctor_id, location))
+            if intervals is None:
+                intervals = self._keys[(doctor_id, location)] = _FreeIntervals(slot_minutes=e - s)
+            intervals.free(s, e)
+
+
+# -----------------------------
+# Shared per-database indexes
+# -----------------------------
+_indexes: dict[str, AvailabilityIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_availability_index(db_path: str = database.APPOINTMENTS_DB) -> AvailabilityIndex:
+    """
+    Return the shared index for `db_path`, building it from the DB on first
+    use and reloading it once it is older than AVAILABILITY_INDEX_TTL.
+    """
+    key = os.path.abspath(db_path)
+    index = _indexes.get(key)
+    if index is None or time.monotonic() - index.built_at > AVAILABILITY_INDEX_TTL:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = _indexes[key] = AvailabilityIndex.from_db(db_path)
+            elif time.monotonic() - index.built_at > AVAILABILITY_INDEX_TTL:
+                index.rebuild(db_path)
+    return index
+
+
+def notify_booked(db_path: str, doctor_id: str, location: str, start, end):
+    """Keep an already-built index in step with a booking (no-op otherwise)."""
+    index = _indexes.get(os.path.abspath(db_path))
+    if index is not None:
+        index.mark_booked(doctor_id, location, start, end)
+
+
+def notify_freed(db_path: str, doctor_id: str, location: str, start, end):
+    index = _indexes.get(os.path.abspath(db_path))
+    if index is not None:
+        index.mark_free(doctor_id, location, start, end)
+
+
+def drop_availability_index(db_path: str = database.APPOINTMENTS_DB):
+    _indexes.pop(os.path.abspath(db_path), None)
@@ -0,0 +1,216 @@
+# tools/batch_booking.py
+import hashlib
+import json
+from datetime import datetime
+
+import pandas as pd
+
+import tools.calendar_tool as calendar_tool
+from tools import availability, database, patient_lookup
+from tools.calendar_tool import CalendarTool
+from tools.slot_assignment import SlotRequest, assign_slots
+
+# spreadsheet headers we accept for the canonical column names
+COLUMN_ALIASES = {
+    "patient_name": "name",
+    "full_name": "name",
+    "date_of_birth": "dob",
+    "birth_date": "dob",
+    "preferred_location": "location",
+    "clinic_location": "location",
+    "doctor": "doctor_id",
+    "duration": "duration_minutes",
+}
+
+RESULT_COLUMNS = [
+    "row", "name", "dob", "mrn", "found", "classification", "status", "reason",
+    "doctor_id", "location", "start", "end", "duration_minutes", "slot_ids", "appointment_id",
+    "notifications",
+]
+
+
+def load_requests(source) -> pd.DataFrame:
+    """
+    Read a referral list from a DataFrame, CSV or XLSX into canonical columns.
+    Rows that cannot be booked get the reason in `invalid_reason` (else None).
+    """
+    if isinstance(source, pd.DataFrame):
+        df = source.copy()
+    elif str(source).lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(source, dtype=str)
+    else:
+        df = pd.read_csv(source, dtype=str)
+
+    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    df = df.rename(columns={k: v for k, v in COLUMN_ALIASES.items() if k in df.columns})
+    for col in ("name", "dob", "mrn", "email", "phone", "location", "doctor_id", "duration_minutes"):
+        if col not in df.columns:
+            df[col] = None
+
+    # spreadsheets hand dates back in all shapes; the DB stores YYYY-MM-DD
+    parsed = pd.to_datetime(df["dob"], errors="coerce", format="mixed")
+    df["dob"] = parsed.dt.strftime("%Y-%m-%d").where(parsed.notna(), df["dob"])
+    df["name"] = df["name"].map(lambda v: " ".join(str(v).split()) if isinstance(v, str) else v)
+    df = df.astype(object).where(df.notna(), None)
+
+    # visit lengths must be whole positive minutes; blank means "by classification"
+    minutes = pd.to_numeric(df["duration_minutes"], errors="coerce")
+    bad_duration = df["duration_minutes"].notna() & ~((minutes > 0) & (minutes % 1 == 0))
+    df["duration_minutes"] = pd.Series(
+        [None if pd.isna(m) else int(m) for m in minutes.where(~bad_duration)], index=df.index, dtype=object
+    )
+    no_identity = df["mrn"].isna() & (df["name"].isna() | df["dob"].isna())
+    df["invalid_reason"] = None
+    df.loc[bad_duration, "invalid_reason"] = "duration_minutes must be a whole number of minutes"
+    df.loc[no_identity, "invalid_reason"] = "Provide either mrn or both name and dob"
+    return df.reset_index(drop=True)
+
+
+def provisional_mrn(name: str, dob: str) -> str:
+    """Stable placeholder MRN for a patient not yet registered in patients.db."""
+    digest = hashlib.sha1(f"{name.casefold()}|{dob}".encode()).hexdigest()[:10]
+    return f"TEMP-{digest.upper()}"
+
+
+# -----------------------------
+# Vectorized lookup
+# -----------------------------
+def lookup_patients(df: pd.DataFrame, db_path: str | None = None) -> pd.DataFrame:
+    """
+    Match every row against patients.db in one query (by MRN, else by
+    the normalized name + DOB search key). Returns a frame aligned with `df` holding the patient
+    record columns (prefixed `db_`) plus `found` and `classification`.
+    """
+    mrns = sorted({m for m in df["mrn"] if m})
+    pairs = sorted({(n, d) for n, d, m in zip(df["name"], df["dob"], df["mrn"]) if not m and n and d})
+    db_path = db_path or patient_lookup.DB_PATH
+
+    with database.connection(db_path) as conn:
+        features = patient_lookup._schema_features(conn, db_path)
+        extra = ", classification, classified_at" if features["classification"] else ""
+        if features["search_key"]:
+            by_key = "search_key IN (SELECT value FROM json_each(?)) OR search_key IS NULL AND"
+            key_args = (json.dumps(sorted({patient_lookup.search_key(n, d) for n, d in pairs})),)
+        else:
+            by_key, key_args = "", ()
+        rows = conn.execute(f"""
+        SELECT mrn, name, dob, email, phone, preferred_location, last_visit_dt{extra}
+        FROM patients
+        WHERE mrn IN (SELECT value FROM json_each(?))
+           OR {by_key} (name, dob) IN (
+                SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]')
+                FROM json_each(?))
+        """, (json.dumps(mrns), *key_args, json.dumps(pairs))).fetchall()
+
+    by_mrn = {r["mrn"]: r for r in rows}
+    by_name_dob = {patient_lookup.search_key(r["name"], r["dob"]): r for r in rows}
+    records = []
+    for name, dob, mrn in zip(df["name"], df["dob"], df["mrn"]):
+        record = by_mrn.get(mrn) if mrn else by_name_dob.get(patient_lookup.search_key(name, dob))
+        if record is None:
+            records.append({"found": False, "classification": "new"})
+            continue
+        classification, _ = patient_lookup.row_classification(record)
+        records.append({
+            "found": True,
+            "classification": classification,
+            **{f"db_{k}": record[k] for k in ("mrn", "email", "phone", "preferred_location")},
+        })
+    found = pd.DataFrame.from_records(records, index=df.index)
+    return found.astype(object).where(found.notna(), None)
+
+
+def load_free_slots(conn, after: str) -> list[tuple]:
+    """Every free slot from `after` on, as SlotAssigner input rows."""
+    return [tuple(r) for r in conn.execute("""
+    SELECT id, doctor_id, clinic_location, start_dt, end_dt
+    FROM doctor_schedules
+    WHERE status='free' AND start_dt >= ?
+    """, (after,))]
+
+
+# -----------------------------
+# Batch entry point
+# -----------------------------
+def book_batch(source, notify: bool = True, patients_db: str | None = None) -> pd.DataFrame:
+    """
+    Book every patient in a referral list against the SQLite fallback.
+
+    Patients are looked up in one query, slots are assigned in one pass
+    of the SlotAssigner over the free calendar, and all bookings and appointment rows are
+    written in a single transaction, together with each appointment's
+    reminder rows and confirmation outbox rows (the transaction also holds
+    the write lock while assigning, so nothing can be double-booked).
+    Confirmations are sent by the outbox worker. Returns one result row
+    per input row.
+    """
+    df = load_requests(source)
+    patients = lookup_patients(df, patients_db)
+    CalendarTool(use_fallback=True).init_fallback_db()
+
+    now = datetime.now().isoformat(timespec="seconds")
+    results, slot_updates, appointments = [], [], []
+    with database.transaction(calendar_tool.DB_PATH) as conn:
+        requests = []
+        for i, (row, patient) in enumerate(zip(df.to_dict("records"), patients.to_dict("records"))):
+            result = {
+                "row": i, "name": row["name"], "dob": row["dob"], "found": patient["found"],
+                "classification": patient["classification"], "notifications": [],
+                "email": row["email"] or patient.get("db_email"),
+                "phone": row["phone"] or patient.get("db_phone"),
+            }
+            results.append(result)
+            if row["invalid_reason"]:
+                result.update(status="invalid", reason=row["invalid_reason"])
+                continue
+
+            mrn = patient.get("db_mrn") or row["mrn"] or provisional_mrn(row["name"], row["dob"])
+            minutes = int(row["duration_minutes"] or (30 if patient["classification"] == "returning" else 60))
+            result.update(mrn=mrn, duration_minutes=minutes)
+            requests.append(SlotRequest(
+                id=i,
+                duration_minutes=minutes,
+                doctor_id=row["doctor_id"],
+                location=row["location"] or patient.get("db_preferred_location"),
+            ))
+
+        # one optimizing pass over the free calendar, under the write lock
+        plan = assign_slots(requests, load_free_slots(conn, now))
+        for i in plan["unassigned"]:
+            results[i].update(status="no_slot", reason=f"No free {results[i]['duration_minutes']}-minute window")
+        for i, a in sorted(plan["assigned"].items()):
+            r = results[i]
+            r.update(
+                status="booked", reason=None, doctor_id=a["doctor_id"], location=a["location"],
+                start=a["start"], end=a["end"], slot_ids=a["slot_ids"],
+            )
+            slot_updates.extend((r["mrn"], now, slot_id) for slot_id in a["slot_ids"])
+            appointments.append((i, (r["mrn"], a["doctor_id"], a["location"], a["start"], a["end"], r["classification"])))
+
+        conn.executemany("""
+        UPDATE doctor_schedules SET status='booked', patient_mrn=?, booked_at=?
+        WHERE id=? AND status='free'
+        """, slot_updates)
+        for i, appointment in appointments:
+            r = results[i]
+            confirmations = [
+                {"channel": channel, "address": address, "template": "booking_confirmation",
+                 "context": {"patient_name": r["name"]}}
+                for channel, address in (("email", r["email"]), ("sms", r["phone"])) if notify and address
+            ]
+            r["appointment_id"] = calendar_tool.record_appointment(
+                conn, *appointment, notify=confirmations,
+                contact={"name": r["name"], "email": r["email"], "phone": r["phone"]},
+            )
+            r["notifications"] = [c["channel"] for c in confirmations]
+
+    for r in results:
+        if r["status"] != "booked":
+            continue
+        availability.notify_booked(calendar_tool.DB_PATH, r["doctor_id"], r["location"], r["start"], r["end"])
+
+    report = pd.DataFrame(results).reindex(columns=RESULT_COLUMNS)
+    counts = report["status"].value_counts().to_dict()
+    print(f"✅ Batch booked {counts.get('booked', 0)}/{len(report)} "
+          f"(no slot: {counts.get('no_slot', 0)}, invalid: {counts.get('invalid', 0)})")
+    return report
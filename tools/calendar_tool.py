@@ -1,56 +1,170 @@
+import asyncio
 import os
-import sqlite3
-import requests
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-load_dotenv()
+from tools.config import load_env
+from tools import availability, database, link_pool, outbox
+from tools.reminder_tool import cancel_reminders, init_reminders, schedule_reminders
+from tools.calendly_client import CALENDLY_BASE_URL, get_client
+load_env()
 
 
 CALENDLY_API_KEY = os.getenv("CALENDLY_API_KEY")
-CALENDLY_BASE_URL = "https://api.calendly.com"
-DB_PATH = "db/appointments.db"
+# optional explicit mapping, e.g. "30=Follow-up Visit,60=New Patient Visit"
+CALENDLY_EVENT_TYPE_NAMES = os.getenv("CALENDLY_EVENT_TYPE_NAMES", "")
+DB_PATH = database.APPOINTMENTS_DB
+# index candidates reserve_slot tries before scanning the free slots instead
+RESERVE_INDEX_ATTEMPTS = 20
+
+# databases whose schema has already been ensured in this process
+_initialized_dbs: set[str] = set()
+
+
+def record_appointment(conn, patient_mrn: str, doctor_id: str, location: str, start_dt: str,
+                       end_dt: str, visit_type: str | None = None, notify=(),
+                       contact: dict | None = None) -> int:
+    """
+    Insert a confirmed appointment, its reminders and its confirmation
+    notifications in the booking transaction; returns the appointment id.
+    `notify` holds {"channel", "address", "template", "context"} dicts; the
+    booking details are added to each context before it goes to the outbox.
+    `contact` ({"name", "email", "phone"}) is stored on the appointment for
+    its reminders, so patients without a record (TEMP- MRNs) get them too.
+    """
+    contact = contact or {}
+    (appointment_id,) = conn.execute("""
+    INSERT INTO appointments (patient_mrn, doctor_id, clinic_location, start_dt, end_dt, type, status,
+                              patient_name, email, phone)
+    VALUES (?, ?, ?, ?, ?, ?, 'confirmed', ?, ?, ?)
+    RETURNING id
+    """, (patient_mrn, doctor_id, location, start_dt, end_dt, visit_type,
+          contact.get("name"), contact.get("email"), contact.get("phone"))).fetchone()
+    schedule_reminders(conn, appointment_id, start_dt)
+    details = {
+        "appointment_id": appointment_id, "doctor_id": doctor_id, "clinic_location": location,
+        "start_time": start_dt, "end_time": end_dt,
+        "duration_minutes": availability.to_minutes(end_dt) - availability.to_minutes(start_dt),
+    }
+    for n in notify:
+        outbox.enqueue(
+            conn, f"appointment:{appointment_id}:{n['template']}:{n['channel']}",
+            n["channel"], n["address"], n["template"], {**n.get("context", {}), **details},
+            appointment_id=appointment_id,
+        )
+    return appointment_id
+
+
+class _SlotTaken(Exception):
+    """Raised inside a claim transaction to roll back a partial claim."""
+
+
+def _candidate_query(doctor_id: str | None, location: str | None, latest: str | None):
+    """
+    Build the keyset-paginated free-slot query for the given filters;
+    `latest` is the latest acceptable start of the visit.
+    Parameters are (cursor_start, cursor_start, cursor_id, *filters, limit).
+    """
+    where = ["status='free'", "start_dt >= ?", "(start_dt > ? OR id > ?)"]
+    filters: list = []
+    if doctor_id:
+        where.append("doctor_id = ?")
+        filters.append(doctor_id)
+    if location:
+        where.append("clinic_location = ?")
+        filters.append(location)
+    if latest:
+        where.append("start_dt <= ?")
+        filters.append(latest)
+    sql = f"""
+    SELECT id, doctor_id, clinic_location, start_dt, end_dt
+    FROM doctor_schedules
+    WHERE {" AND ".join(where)}
+    ORDER BY start_dt, id
+    LIMIT ?
+    """
+    return sql, filters
+
+
+def _parse_event_type_names(spec: str) -> dict[int, str]:
+    names = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        minutes, _, name = item.partition("=")
+        names[int(minutes)] = name.strip()
+    return names
+
+
+def _window_to_slot(window) -> dict:
+    return {
+        "id": window[0]["id"],
+        "slot_ids": [r["id"] for r in window],
+        "doctor_id": window[0]["doctor_id"],
+        "location": window[0]["clinic_location"],
+        "start": window[0]["start_dt"],
+        "end": window[-1]["end_dt"],
+    }
 
 
 class CalendarTool:
-    def __init__(self, api_key: str | None = None, use_fallback: bool = False):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        use_fallback: bool = False,
+        base_url: str | None = None,
+        event_type_names: dict[int, str] | None = None,
+    ):
         self.api_key = api_key or CALENDLY_API_KEY
         self.use_fallback = use_fallback or not bool(self.api_key)
+        self.event_type_names = event_type_names or _parse_event_type_names(CALENDLY_EVENT_TYPE_NAMES)
 
         if not self.use_fallback:
-            self.headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            # shared per API key: session, caches and event-type index survive
+            # across the short-lived CalendarTool instances graph nodes create
+            self.client = get_client(
+                self.api_key,  # type: ignore
+                base_url=base_url or os.getenv("CALENDLY_BASE_URL", CALENDLY_BASE_URL),
+            )
 
     # -----------------------------
     # REAL CALENDLY API MODE
     # -----------------------------
     def get_user_uri(self):
-        url = f"{CALENDLY_BASE_URL}/users/me"
-        resp = requests.get(url, headers=self.headers)
-        resp.raise_for_status()
-        return resp.json()["resource"]["uri"]
+        return self.client.get_user_uri()
 
     def list_event_types(self):
-        user_uri = self.get_user_uri()  # fetch user first
-        url = f"{CALENDLY_BASE_URL}/event_types"
-        params = {"user": user_uri}
-        resp = requests.get(url, headers=self.headers, params=params)
-        resp.raise_for_status()
-        return resp.json()["collection"]
+        """All event types of the current user (cached, all pages)."""
+        return self.client.list_event_types()
+
+    def event_type_for_duration(self, duration_minutes: int) -> dict | None:
+        """
+        Resolve the event type for a visit length from the cached index:
+        configured name first, then the event type's `duration` field.
+        """
+        name = self.event_type_names.get(duration_minutes)
+        return self.client.event_type_index.lookup(duration_minutes, name)
+
+    def refresh_event_types(self, background: bool = False):
+        if background:
+            self.client.event_type_index.refresh_soon()
+        else:
+            self.client.event_type_index.refresh()
+
+    def start_event_type_refresher(self, interval: float = 300.0):
+        self.client.event_type_index.start_refresher(interval)
 
     def create_scheduling_link(self, event_type_uri: str):
         """Create a booking link for a given event type."""
-        url = f"{CALENDLY_BASE_URL}/scheduling_links"
-        payload = {
-            "max_event_count": 1,
-            "owner": event_type_uri,   # full URI
-            "owner_type": "EventType"  # must be included
-        }
-        print("Payload being sent:", payload)
-        resp = requests.post(url, headers=self.headers, json=payload)
-        resp.raise_for_status()
-        return resp.json()["resource"]["booking_url"]
+        return self.client.create_scheduling_link(event_type_uri)
+
+    def get_scheduling_link(self, event_type_uri: str) -> str:
+        """
+        Hand out a pre-created single-use link from the local pool (a DB read);
+        the pool is refilled in the background.
+        """
+        return link_pool.get_link_pool(DB_PATH, self.client).acquire(event_type_uri)
+
+    def warm_link_pool(self, durations=(30, 60)):
+        """Pre-create links for the event types used by booking_node."""
+        uris = [et["uri"] for et in map(self.event_type_for_duration, durations) if et]
+        link_pool.get_link_pool(DB_PATH, self.client).warm(uris)
 
     def get_available_slots_calendly(self, event_type_uri: str, **kwargs):
         """
@@ -70,56 +184,329 @@ class CalendarTool:
     # -----------------------------
     def init_fallback_db(self):
         """Initialize local doctor_schedules table if missing."""
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS doctor_schedules (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            doctor_id TEXT,
-            clinic_location TEXT,
-            start_dt DATETIME,
-            end_dt DATETIME,
-            status TEXT CHECK(status IN ('free','booked')) DEFAULT 'free'
-        )
-        """)
-        conn.commit()
-        conn.close()
+        db_key = os.path.abspath(DB_PATH)
+        if db_key in _initialized_dbs:
+            return
+        database.enable_wal(DB_PATH)
+        with database.transaction(DB_PATH) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS doctor_schedules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doctor_id TEXT,
+                clinic_location TEXT,
+                start_dt DATETIME,
+                end_dt DATETIME,
+                status TEXT CHECK(status IN ('free','booked')) DEFAULT 'free'
+            )
+            """)
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(doctor_schedules)")}
+            if "patient_mrn" not in columns:
+                conn.execute("ALTER TABLE doctor_schedules ADD COLUMN patient_mrn TEXT")
+            if "booked_at" not in columns:
+                conn.execute("ALTER TABLE doctor_schedules ADD COLUMN booked_at DATETIME")
+            # partial indexes only hold free slots, so they stay small as the
+            # calendar fills up; rowid (id) is implicitly the last key column
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_schedules_free_doctor
+            ON doctor_schedules (doctor_id, clinic_location, start_dt) WHERE status='free'
+            """)
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_schedules_free_doctor_start
+            ON doctor_schedules (doctor_id, start_dt) WHERE status='free'
+            """)
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_schedules_free_location
+            ON doctor_schedules (clinic_location, start_dt) WHERE status='free'
+            """)
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_schedules_free_start
+            ON doctor_schedules (start_dt) WHERE status='free'
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS appointments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                patient_mrn TEXT NOT NULL,
+                doctor_id TEXT NOT NULL,
+                clinic_location TEXT NOT NULL,
+                start_dt DATETIME NOT NULL,
+                end_dt DATETIME NOT NULL,
+                type TEXT CHECK(type IN ('new', 'returning')),
+                status TEXT CHECK(status IN ('confirmed', 'cancelled')) DEFAULT 'confirmed',
+                FOREIGN KEY(patient_mrn) REFERENCES patients(mrn)
+            )
+            """)
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(appointments)")}
+            for column in ("patient_name", "email", "phone"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE appointments ADD COLUMN {column} TEXT")
+            init_reminders(conn)
+            outbox.init_outbox(conn)
+        _initialized_dbs.add(db_key)
 
     def get_available_slots_fallback(self, days_ahead: int = 7, limit: int = 5):
-        """Return free slots from local SQLite fallback."""
-        self.init_fallback_db()
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
+        """Return upcoming free slots (earliest first) from local SQLite fallback."""
         cutoff = (datetime.now() + timedelta(days=days_ahead)).isoformat()
-        cur.execute("""
-        SELECT id, doctor_id, clinic_location, start_dt, end_dt
-        FROM doctor_schedules
-        WHERE status='free' AND start_dt < ?
-        LIMIT ?
-        """, (cutoff, limit))
-        rows = cur.fetchall()
-        conn.close()
-
-        slots = [
-            {"id": r[0], "doctor_id": r[1], "location": r[2], "start": r[3], "end": r[4]}
-            for r in rows
+        page = self.search_slots(latest=cutoff, limit=limit)
+        return [
+            {"id": w["id"], "doctor_id": w["doctor_id"], "location": w["location"],
+             "start": w["start"], "end": w["end"]}
+            for w in page["slots"]
         ]
-        return slots
 
     def book_slot_fallback(self, slot_id: int, patient_mrn: str):
         """Mark slot as booked in local DB."""
         self.init_fallback_db()
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("""
-        UPDATE doctor_schedules
-        SET status='booked'
-        WHERE id=? AND status='free'
-        """, (slot_id,))
-        conn.commit()
-        success = cur.rowcount > 0
-        conn.close()
-        return success
+        with database.transaction(DB_PATH) as conn:
+            row = conn.execute("""
+            UPDATE doctor_schedules
+            SET status='booked', patient_mrn=?, booked_at=?
+            WHERE id=? AND status='free'
+            RETURNING doctor_id, clinic_location, start_dt, end_dt
+            """, (patient_mrn, datetime.now().isoformat(timespec="seconds"), slot_id)).fetchone()
+            if row is not None:
+                record_appointment(conn, patient_mrn, *row)
+        if row is None:
+            return False
+        availability.notify_booked(DB_PATH, *row)
+        return True
+
+    def release_slot(self, slot_ids: list[int]):
+        """Cancel a booking: return its slots to the free pool and drop its pending notifications."""
+        self.init_fallback_db()
+        placeholders = ",".join("?" * len(slot_ids))
+        with database.transaction(DB_PATH) as conn:
+            rows = conn.execute(f"""
+            UPDATE doctor_schedules
+            SET status='free', patient_mrn=NULL, booked_at=NULL
+            WHERE id IN ({placeholders}) AND status='booked'
+            RETURNING doctor_id, clinic_location, start_dt, end_dt
+            """, tuple(slot_ids)).fetchall()
+            # the appointments covering those slots are cancelled with them
+            cancelled = [
+                r["id"] for slot in rows for r in conn.execute("""
+                UPDATE appointments SET status='cancelled'
+                WHERE status='confirmed' AND doctor_id=? AND clinic_location=?
+                  AND start_dt <= ? AND end_dt > ?
+                RETURNING id
+                """, (slot["doctor_id"], slot["clinic_location"], slot["start_dt"], slot["start_dt"]))
+            ]
+            cancel_reminders(conn, cancelled)
+            outbox.cancel_notifications(conn, cancelled)
+        for row in rows:
+            availability.notify_freed(DB_PATH, *row)
+        return len(rows)
+
+    def next_available(
+        self,
+        doctor_id: str | None = None,
+        location: str | None = None,
+        duration_minutes: int = 30,
+        after: str | None = None,
+    ):
+        """Earliest window that fits the visit, answered from the in-memory index."""
+        self.init_fallback_db()
+        index = availability.get_availability_index(DB_PATH)
+        return index.earliest_fit(doctor_id, location, duration_minutes, after)
+
+    # -----------------------------
+    # SLOT SEARCH (fallback)
+    # -----------------------------
+    def _find_window(self, conn, first, duration_minutes: int):
+        """
+        Starting at slot `first`, follow back-to-back free slots of the same
+        doctor/location until `duration_minutes` is covered.
+        Returns the list of slot rows, or None if the run is too short.
+        """
+        window = [first]
+        needed = timedelta(minutes=duration_minutes)
+        start = datetime.fromisoformat(first["start_dt"])
+        while datetime.fromisoformat(window[-1]["end_dt"]) - start < needed:
+            nxt = conn.execute("""
+            SELECT id, doctor_id, clinic_location, start_dt, end_dt
+            FROM doctor_schedules
+            WHERE status='free' AND doctor_id=? AND clinic_location=? AND start_dt=?
+            LIMIT 1
+            """, (first["doctor_id"], first["clinic_location"], window[-1]["end_dt"])).fetchone()
+            if nxt is None:
+                return None
+            window.append(nxt)
+        return window
+
+    def _iter_windows(
+        self,
+        doctor_id: str | None,
+        location: str | None,
+        latest: str | None,
+        duration_minutes: int,
+        cursor: tuple[str, int],
+        batch_size: int = 20,
+    ):
+        """Yield free windows in (start_dt, id) order, starting after `cursor`."""
+        self.init_fallback_db()
+        sql, filters = _candidate_query(doctor_id, location, latest)
+        while True:
+            with database.connection(DB_PATH) as conn:
+                candidates = conn.execute(
+                    sql, (cursor[0], cursor[0], cursor[1], *filters, batch_size)
+                ).fetchall()
+            if not candidates:
+                return
+
+            for cand in candidates:
+                # connection is released before yielding: callers may need the
+                # pool themselves (e.g. to claim the window)
+                with database.connection(DB_PATH) as conn:
+                    window = self._find_window(conn, cand, duration_minutes)
+                if window:
+                    yield window
+            cursor = (candidates[-1]["start_dt"], candidates[-1]["id"])
+
+    def search_slots(
+        self,
+        doctor_id: str | None = None,
+        location: str | None = None,
+        earliest: str | None = None,
+        latest: str | None = None,
+        duration_minutes: int = 30,
+        limit: int = 20,
+        cursor: str | None = None,
+    ):
+        """
+        Search free windows long enough for `duration_minutes`, earliest first.
+
+        `earliest` and `latest` bound the start of the visit; a window may run
+        past `latest`. `earliest` defaults to now, so past slots are never
+        returned. Pass the returned `next_cursor` back in to fetch the
+        following page.
+        """
+        if cursor:
+            start_dt, slot_id = cursor.rsplit("|", 1)
+            position = (start_dt, int(slot_id))
+        else:
+            position = (earliest or datetime.now().isoformat(timespec="seconds"), -1)
+
+        slots = []
+        for window in self._iter_windows(doctor_id, location, latest, duration_minutes, position):
+            slots.append(_window_to_slot(window))
+            if len(slots) == limit:
+                break
+
+        next_cursor = None
+        if len(slots) == limit:
+            next_cursor = f"{slots[-1]['start']}|{slots[-1]['id']}"
+        return {"slots": slots, "next_cursor": next_cursor}
+
+    # -----------------------------
+    # RESERVATION ENGINE (fallback)
+    # -----------------------------
+    def reserve_slot(
+        self,
+        patient_mrn: str,
+        doctor_id: str | None = None,
+        location: str | None = None,
+        duration_minutes: int = 30,
+        earliest: str | None = None,
+        latest: str | None = None,
+        visit_type: str | None = None,
+        notify=(),
+        contact: dict | None = None,
+    ):
+        """
+        Atomically claim the earliest free window matching the criteria.
+        The claim also records the appointment with its `contact`, its
+        reminders and the `notify` confirmations (see `record_appointment`).
+
+        The candidate comes from the availability index and is claimed with
+        a conditional UPDATE inside its own short transaction. If another
+        booking got there first the claim affects fewer rows, is rolled
+        back, and the next candidate is tried. The index only sees this
+        process's bookings, so a window it keeps offering after a failed
+        claim is reloaded from the DB; if the index has nothing (or keeps
+        missing), the free slots are scanned in start order instead.
+        Returns the booking dict, or None if nothing matches.
+        """
+        self.init_fallback_db()
+        index = availability.get_availability_index(DB_PATH)
+        missed = None
+        for _ in range(RESERVE_INDEX_ATTEMPTS):
+            fit = index.earliest_fit(doctor_id, location, duration_minutes, earliest)
+            if fit is None or (latest and fit["start"] > latest):
+                break
+            if fit == missed:
+                index.rebuild(DB_PATH, fit["doctor_id"], fit["location"])
+                continue
+            window = self._window_at(fit, duration_minutes)
+            booking = window and self._claim(window, patient_mrn, visit_type, notify, contact)
+            if booking:
+                return booking
+            missed = fit
+
+        position = (earliest or datetime.now().isoformat(timespec="seconds"), -1)
+        for window in self._iter_windows(doctor_id, location, latest, duration_minutes, position):
+            booking = self._claim(window, patient_mrn, visit_type, notify, contact)
+            if booking:
+                return booking
+        return None
+
+    def _window_at(self, fit: dict, duration_minutes: int):
+        """Slot rows of an index window, or None if the DB no longer has it free."""
+        with database.connection(DB_PATH) as conn:
+            first = conn.execute("""
+            SELECT id, doctor_id, clinic_location, start_dt, end_dt
+            FROM doctor_schedules
+            WHERE status='free' AND doctor_id=? AND clinic_location=? AND start_dt=?
+            LIMIT 1
+            """, (fit["doctor_id"], fit["location"], fit["start"])).fetchone()
+            return first and self._find_window(conn, first, duration_minutes)
+
+    def _claim(self, window, patient_mrn: str, visit_type: str | None = None, notify=(),
+               contact: dict | None = None):
+        ids = [r["id"] for r in window]
+        placeholders = ",".join("?" * len(ids))
+        booked_at = datetime.now().isoformat(timespec="seconds")
+        try:
+            with database.transaction(DB_PATH) as conn:
+                claimed = conn.execute(f"""
+                UPDATE doctor_schedules
+                SET status='booked', patient_mrn=?, booked_at=?
+                WHERE id IN ({placeholders}) AND status='free'
+                RETURNING id
+                """, (patient_mrn, booked_at, *ids)).fetchall()
+                if len(claimed) != len(ids):
+                    raise _SlotTaken
+                first, last = window[0], window[-1]
+                appointment_id = record_appointment(
+                    conn, patient_mrn, first["doctor_id"], first["clinic_location"],
+                    first["start_dt"], last["end_dt"], visit_type, notify, contact,
+                )
+        except _SlotTaken:
+            return None
+
+        for r in window:
+            availability.notify_booked(DB_PATH, r["doctor_id"], r["clinic_location"], r["start_dt"], r["end_dt"])
+
+        booking = _window_to_slot(window)
+        booking["slot_id"] = booking.pop("id")
+        booking["patient_mrn"] = patient_mrn
+        booking["appointment_id"] = appointment_id
+        return booking
+
+    # -----------------------------
+    # Async API
+    # -----------------------------
+    # sqlite3 and requests block, so each call runs in a worker thread;
+    # the connection pool and shared Calendly session are thread-safe.
+    async def areserve_slot(self, *args, **kwargs):
+        return await asyncio.to_thread(self.reserve_slot, *args, **kwargs)
+
+    async def asearch_slots(self, *args, **kwargs):
+        return await asyncio.to_thread(self.search_slots, *args, **kwargs)
+
+    async def aevent_type_for_duration(self, duration_minutes: int) -> dict | None:
+        return await asyncio.to_thread(self.event_type_for_duration, duration_minutes)
+
+    async def aget_scheduling_link(self, event_type_uri: str) -> str:
+        return await asyncio.to_thread(self.get_scheduling_link, event_type_uri)
 
     # -----------------------------
     # Unified API
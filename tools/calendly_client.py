@@ -0,0 +1,214 @@
+# tools/calendly_client.py
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
+from tools.cache import TTLCache
+
+CALENDLY_BASE_URL = "https://api.calendly.com"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 60  # seconds; never sleep longer than this on a Retry-After
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(exc, "response", None)
+    return isinstance(exc, requests.HTTPError) and response is not None \
+        and response.status_code in RETRY_STATUSES
+
+
+class _RetryAfterWait:
+    """Sleep for the server's Retry-After when given, exponential backoff otherwise."""
+
+    def __init__(self, backoff):
+        self.backoff = backoff
+
+    def __call__(self, retry_state) -> float:
+        exc = retry_state.outcome.exception()
+        response = getattr(exc, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), MAX_RETRY_AFTER)
+                except ValueError:
+                    pass
+        return self.backoff(retry_state)
+
+
+class CalendlyClient:
+    """
+    Thin Calendly v2 API client.
+
+    One pooled keep-alive `requests.Session` is reused for every call, the
+    user URI and event-type collection are cached for `cache_ttl` seconds,
+    and 429/5xx/connection errors are retried with backoff.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = CALENDLY_BASE_URL,
+        cache_ttl: float = 300.0,
+        max_retries: int = 4,
+        backoff_max: float = 30.0,
+        timeout: float = 10.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.cache = TTLCache(maxsize=64, ttl=cache_ttl)
+        self._retry_kwargs = dict(
+            retry=retry_if_exception(_is_retryable),
+            stop=stop_after_attempt(max_retries + 1),
+            wait=_RetryAfterWait(wait_exponential(multiplier=0.5, max=backoff_max)),
+            reraise=True,
+        )
+        self.event_type_index = EventTypeIndex(self)
+
+    # -----------------------------
+    # HTTP plumbing
+    # -----------------------------
+    def request(self, method: str, path_or_url: str, **kwargs) -> dict:
+        url = path_or_url if path_or_url.startswith("http") else f"{self.base_url}{path_or_url}"
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in Retrying(**self._retry_kwargs):
+            with attempt:
+                resp = self.session.request(method, url, **kwargs)
+                resp.raise_for_status()
+        return resp.json()
+
+    def iter_collection(self, path: str, params: dict | None = None):
+        """Yield every item of a paginated collection endpoint."""
+        params = {"count": 100, **(params or {})}
+        data = self.request("GET", path, params=params)
+        while True:
+            yield from data["collection"]
+            next_page = (data.get("pagination") or {}).get("next_page")
+            if not next_page:
+                return
+            # next_page already carries the query string
+            data = self.request("GET", next_page)
+
+    # -----------------------------
+    # Endpoints
+    # -----------------------------
+    def get_user_uri(self) -> str:
+        return self.cache.get_or_set(
+            "user_uri", lambda: self.request("GET", "/users/me")["resource"]["uri"]
+        )
+
+    def list_event_types(self) -> list[dict]:
+        return self.cache.get_or_set(
+            "event_types",
+            lambda: list(self.iter_collection("/event_types", {"user": self.get_user_uri()})),
+        )
+
+    def create_scheduling_link(self, event_type_uri: str) -> str:
+        payload = {
+            "max_event_count": 1,
+            "owner": event_type_uri,   # full URI
+            "owner_type": "EventType"  # must be included
+        }
+        return self.request("POST", "/scheduling_links", json=payload)["resource"]["booking_url"]
+
+    def invalidate(self):
+        """Drop cached user/event-type data (e.g. after event types change)."""
+        self.cache.clear()
+
+    def close(self):
+        self.session.close()
+
+
+class EventTypeIndex:
+    """
+    Event types keyed by their `duration` (minutes) and by name, so booking
+    resolves an event type with a dict lookup instead of scanning names.
+    Refreshed explicitly, by a background thread, or on webhook signals.
+    """
+
+    def __init__(self, client: CalendlyClient):
+        self.client = client
+        self._by_duration: dict[int, dict] = {}
+        self._by_name: dict[str, dict] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._refresher: threading.Thread | None = None
+        self._wake = threading.Event()
+
+    def refresh(self):
+        self.client.cache.pop("event_types")
+        by_duration: dict[int, dict] = {}
+        by_name: dict[str, dict] = {}
+        for et in self.client.list_event_types():
+            if not et.get("active", True):
+                continue
+            by_name[et["name"].casefold()] = et
+            duration = et.get("duration")
+            if duration is not None:
+                by_duration.setdefault(int(duration), et)  # first listed wins
+        with self._lock:
+            self._by_duration, self._by_name = by_duration, by_name
+            self._loaded = True
+
+    def lookup(self, duration_minutes: int, name: str | None = None) -> dict | None:
+        """O(1) lookup; only the very first call (empty index) hits the API."""
+        if not self._loaded:
+            self.refresh()
+        if name:
+            et = self._by_name.get(name.casefold())
+            if et is not None:
+                return et
+        return self._by_duration.get(duration_minutes)
+
+    def start_refresher(self, interval: float = 300.0):
+        """Refresh every `interval` seconds (and on refresh_soon) in a daemon thread."""
+        if self._refresher is not None:
+            return
+
+        def loop():
+            while True:
+                self._wake.wait(interval)
+                self._wake.clear()
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Event type refresh failed: {e}")
+
+        self._refresher = threading.Thread(target=loop, name="calendly-event-types", daemon=True)
+        self._refresher.start()
+
+    def refresh_soon(self):
+        """Ask for a refresh off the caller's thread (e.g. from a webhook)."""
+        if self._refresher is None:
+            threading.Thread(target=self.refresh, daemon=True).start()
+        else:
+            self._wake.set()
+
+
+# -----------------------------
+# Shared clients
+# -----------------------------
+_clients: dict[tuple[str, str], CalendlyClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str, base_url: str = CALENDLY_BASE_URL) -> CalendlyClient:
+    """One client (session, caches, event-type index) per API key and base URL."""
+    key = (api_key, base_url)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = CalendlyClient(api_key, base_url=base_url)
+    return client
@@ -0,0 +1,18 @@
+# tools/config.py
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_env() -> bool:
+    """
+    Load .env into os.environ once per process. Tool modules call this at
+    import instead of each running load_dotenv() (and its file search).
+    """
+    from dotenv import load_dotenv
+    return load_dotenv()
+
+
+@lru_cache(maxsize=None)
+def get_tool(cls, *args):
+    """One tool instance per class and arguments, shared by every request."""
+    return cls(*args)
@@ -0,0 +1,161 @@
+# tools/database.py
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+APPOINTMENTS_DB = "db/appointments.db"
+PATIENTS_DB = "db/patients.db"
+
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", 8))
+STATEMENT_CACHE_SIZE = 256   # prepared statements kept per connection
+BUSY_TIMEOUT_MS = 5000
+
+# per-connection settings; journal_mode=WAL is persistent in the file header,
+# so it is set once by the schema owners (enable_wal), not on every open
+PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",          # safe with WAL, avoids an fsync per commit
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-20000",           # ~20 MB page cache
+    "PRAGMA mmap_size=268435456",         # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class ConnectionPool:
+    """Thread-safe pool of tuned SQLite connections for a single database file."""
+
+    def __init__(self, db_path: str, size: int = POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: autocommit, writes use transaction() explicitly.
+        # Python's sqlite3 caches prepared statements per connection keyed by SQL text.
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self, timeout: float | None = None) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"❌ No free SQLite connection for {self.db_path}")
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the `with` block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self, immediate: bool = True):
+        """
+        Run the block in a single transaction.
+        BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+        queue on busy_timeout instead of failing with "database is locked".
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+def enable_wal(db_path: str):
+    """
+    Switch a database file to WAL (readers no longer block the writer).
+    Persistent, so schema setup calls it once: CalendarTool.init_fallback_db
+    for appointments.db, scripts/update_db.py for patients.db.
+    """
+    with connection(db_path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Return the shared pool for `db_path`, creating it on first use."""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(key)
+    return pool
+
+
+@contextmanager
+def connection(db_path: str):
+    with get_pool(db_path).connection() as conn:
+        yield conn
+
+
+@contextmanager
+def transaction(db_path: str, immediate: bool = True):
+    with get_pool(db_path).transaction(immediate=immediate) as conn:
+        yield conn
+
+
+def close_pool(db_path: str):
+    pool = _pools.pop(os.path.abspath(db_path), None)
+    if pool:
+        pool.close()
+
+
+def close_all_pools():
+    for key in list(_pools):
+        close_pool(key)
@@ -1,41 +1,223 @@
+import asyncio
 import os
+import queue
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
-
-load_dotenv()  # load SMTP creds from .env
+import threading
+import time
+from contextlib import contextmanager
+from tools.config import load_env
+from tools.templates import mime_message, render
+
+load_env()  # load SMTP creds from .env
+
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+# idle sessions older than this are NOOP-checked before reuse
+SMTP_HEALTHCHECK_AFTER = 30.0
+# errors after which a session is gone; the message can be retried on a new one
+SMTP_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def _envelope(server: smtplib.SMTP, from_addr: str, to_addr: str):
+    """MAIL FROM / RCPT TO. Nothing is queued yet, so a failure here can be retried."""
+    server.ehlo_or_helo_if_needed()
+    code, resp = server.mail(from_addr)
+    if code != 250:
+        raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+    code, resp = server.rcpt(to_addr)
+    if code not in (250, 251):
+        raise smtplib.SMTPRecipientsRefused({to_addr: (code, resp)})
+
+
+def _data(server: smtplib.SMTP, message: str):
+    """DATA. Once the body is on the wire the server may have queued it."""
+    code, resp = server.data(message)
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+
+
+class SMTPPool:
+    """
+    Small pool of logged-in SMTP sessions, reused across messages so
+    STARTTLS and LOGIN happen once per connection instead of per email.
+    At most `size` sessions exist; callers beyond that wait for one.
+    """
+
+    def __init__(self, host: str, port: int, user: str | None, password: str | None,
+                 size: int = SMTP_POOL_SIZE, starttls: bool = True, timeout: float = 30.0):
+        self.host, self.port = host, port
+        self.user, self.password = user, password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.ehlo()
+        if self.starttls:
+            server.starttls()
+            server.ehlo()
+        if self.user:
+            if not server.has_extn("auth"):
+                # e.g. STARTTLS off or stripped: never fall back to sending unauthenticated
+                self._close(server)
+                raise smtplib.SMTPNotSupportedError(
+                    f"❌ {self.host} does not offer AUTH; refusing to send as {self.user} unauthenticated"
+                )
+            server.login(self.user, self.password)  # type: ignore
+        self.connects += 1
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < SMTP_HEALTHCHECK_AFTER:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(server)
+
+    @contextmanager
+    def session(self):
+        """Borrow a healthy session; it is discarded if the block breaks it."""
+        self._slots.acquire()
+        try:
+            server = self._checkout()
+            try:
+                yield server
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # the server answered, so the session itself is fine
+                try:
+                    server.rset()
+                except (smtplib.SMTPException, OSError):
+                    self._close(server)
+                else:
+                    self._idle.put((server, time.monotonic()))
+                raise
+            except BaseException:
+                self._close(server)
+                raise
+            self._idle.put((server, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
 
 
 class EmailTool:
-    def __init__(self):
+    def __init__(self, pool_size: int = SMTP_POOL_SIZE):
         self.smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
         self.smtp_port = int(os.getenv("SMTP_PORT", 587))
         self.smtp_user = os.getenv("SMTP_USER")
         self.smtp_pass = os.getenv("SMTP_PASS")
         self.from_email = os.getenv("FROM_EMAIL", self.smtp_user)
+        self.starttls = os.getenv("SMTP_STARTTLS", "1").lower() not in ("0", "false", "no")
 
         if not self.smtp_user or not self.smtp_pass:
             raise ValueError("❌ Missing SMTP_USER or SMTP_PASS in environment variables.")
 
-    def send_email(self, to_email: str, subject: str, body: str, html: str | None = None):
-        """Generic email sender (plain + HTML)."""
-        msg = MIMEMultipart("alternative")
-        msg["From"] = self.from_email  # type: ignore
-        msg["To"] = to_email
-        msg["Subject"] = subject
+        self.pool = SMTPPool(
+            self.smtp_host, self.smtp_port, self.smtp_user, self.smtp_pass,
+            size=pool_size, starttls=self.starttls,
+        )
 
-        msg.attach(MIMEText(body, "plain"))
-        if html:
-            msg.attach(MIMEText(html, "html"))
+    def build_message(self, to_email: str, subject: str, body: str, html: str | None = None) -> str:
+        return mime_message(self.from_email, to_email, subject, body, html)  # type: ignore
 
-        with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-            server.starttls()
-            server.login(self.smtp_user, self.smtp_pass)  # type: ignore
-            server.sendmail(self.from_email, to_email, msg.as_string())  # type: ignore
+    def send_email(self, to_email: str, subject: str, body: str, html: str | None = None):
+        """Generic email sender (plain + HTML)."""
+        message = self.build_message(to_email, subject, body, html)
+        for attempt in range(2):
+            in_data = False
+            try:
+                with self.pool.session() as server:
+                    _envelope(server, self.from_email, to_email)  # type: ignore
+                    in_data = True
+                    _data(server, message)
+                break
+            except SMTP_CONNECTION_ERRORS:
+                # a session the server had already dropped is retried once on a
+                # fresh one; a drop during DATA is not, as that could send twice
+                if in_data or attempt:
+                    raise
 
         print(f"✅ Email sent to {to_email} with subject '{subject}'")
 
+    def send_many(self, messages, max_reconnects: int = 3) -> dict:
+        """
+        Send a batch of emails (dicts of `send_email` arguments) back to back
+        over one pooled session. If the server drops the connection the batch
+        resumes on a new session: from the message that failed if it had not
+        reached DATA yet, else from the next one (that message is recorded as
+        failed rather than risk sending it twice). Refused recipients are
+        recorded and skipped. Returns sent / failed counts and messages per
+        second.
+        """
+        messages = list(messages)
+        sent, failed, reconnects = 0, [], 0
+        t0 = time.perf_counter()
+        i = 0
+        while i < len(messages):
+            in_data = False
+            try:
+                with self.pool.session() as server:
+                    while i < len(messages):
+                        m = messages[i]
+                        try:
+                            _envelope(server, self.from_email, m["to_email"])  # type: ignore
+                            in_data = True
+                            _data(server, self.build_message(**m))
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                                smtplib.SMTPDataError) as e:
+                            failed.append((m["to_email"], str(e)))
+                            i += 1
+                            in_data = False
+                            server.rset()
+                            continue
+                        i += 1
+                        sent += 1
+                        reconnects = 0
+                        in_data = False
+            except SMTP_CONNECTION_ERRORS as e:
+                if in_data:
+                    failed.append((messages[i]["to_email"], f"connection lost during DATA, not resent: {e}"))
+                    i += 1
+                reconnects += 1
+                if reconnects > max_reconnects:
+                    failed.extend((m["to_email"], str(e)) for m in messages[i:])
+                    break
+        elapsed = time.perf_counter() - t0
+        per_sec = round(sent / elapsed, 1) if elapsed else 0.0
+        print(f"✅ Sent {sent}/{len(messages)} emails in {elapsed:.2f}s ({per_sec}/s)")
+        return {"sent": sent, "failed": failed, "elapsed_s": round(elapsed, 3), "per_sec": per_sec}
+
+    async def asend_email(self, *args, **kwargs):
+        """`send_email` run in a worker thread, for async callers."""
+        return await asyncio.to_thread(self.send_email, *args, **kwargs)
+
+    async def asend_booking_link_email(self, **kwargs):
+        return await asyncio.to_thread(self.send_booking_link_email, **kwargs)
+
     # -------------------------------
     # Appointment Booking Link Email
     # -------------------------------
@@ -49,31 +231,11 @@ class EmailTool:
         duration_minutes: int,
     ):
         """Send patient a booking link email to choose a slot."""
-        subject = f"Book Your Appointment with {doctor}"
-
-        text_body = (
-            f"Hello {patient_name},\n\n"
-            f"Please book your {duration_minutes}-minute appointment with {doctor} "
-            f"at {clinic_location} using the link below:\n\n"
-            f"{booking_url}\n\n"
-            "Thank you,\nAI Scheduler Team"
+        message = render(
+            "booking_link", patient_name=patient_name, booking_url=booking_url, doctor=doctor,
+            clinic_location=clinic_location, duration_minutes=duration_minutes,
         )
-
-        html_body = f"""
-        <html>
-          <body style="font-family: Arial, sans-serif; line-height: 1.6;">
-            <p>Hello <b>{patient_name}</b>,</p>
-            <p>Please use the link below to book your <b>{duration_minutes}-minute</b> appointment with <b>{doctor}</b> at <b>{clinic_location}</b>:</p>
-            <p><a href="{booking_url}" style="color: #007bff; text-decoration: none;">Click here to book your appointment</a></p>
-            <p style="color: gray; font-size: 12px;">
-              Thank you,<br>
-              AI Scheduler Team
-            </p>
-          </body>
-        </html>
-        """
-
-        self.send_email(to_email, subject, text_body, html_body)
+        self.send_email(to_email, message.subject, message.text, message.html)
 
     # -------------------------------
     # Appointment Reminder Email
@@ -86,30 +248,8 @@ class EmailTool:
         clinic_location: str,
     ):
         """Send a reminder for an already booked appointment."""
-        subject = f"Reminder: Your Appointment on {appointment_dt}"
-
-        text_body = (
-            f"Hello {patient_name},\n\n"
-            f"This is a reminder for your upcoming appointment on {appointment_dt}.\n"
-            f"Location: {clinic_location}\n\n"
-            "Please arrive 10 minutes early.\n\n"
-            "Thank you,\nAI Scheduler Team"
+        message = render(
+            "appointment_reminder", patient_name=patient_name, appointment_dt=appointment_dt,
+            clinic_location=clinic_location,
         )
-
-        html_body = f"""
-        <html>
-          <body style="font-family: Arial, sans-serif; line-height: 1.6;">
-            <p>Hello <b>{patient_name}</b>,</p>
-            <p>This is a reminder for your upcoming appointment on:</p>
-            <p><b>{appointment_dt}</b></p>
-            <p>Location: {clinic_location}</p>
-            <p>Please arrive 10 minutes early.</p>
-            <p style="color: gray; font-size: 12px;">
-              Thank you,<br>
-              AI Scheduler Team
-            </p>
-          </body>
-        </html>
-        """
-
-        self.send_email(to_email, subject, text_body, html_body)
+        self.send_email(to_email, message.subject, message.text, message.html)
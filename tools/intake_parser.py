@@ -0,0 +1,304 @@
+# tools/intake_parser.py
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+from pydantic import BaseModel, ValidationError, create_model
+from tools.cache import TTLCache
+from tools.intake_rules import CORE_FIELDS, INTAKE_FIELDS, extract_fields
+
+INTAKE_MODEL = os.getenv("INTAKE_MODEL", "mistral")
+# below this share of recognised fields the LLM is asked for the rest
+MIN_RULE_CONFIDENCE = float(os.getenv("INTAKE_MIN_RULE_CONFIDENCE", 0.5))
+
+INTAKE_PROMPT = """
+You are a medical intake assistant. Extract structured patient data
+from the request below. Always return valid JSON with keys:
+{fields}.
+Use null for anything the request does not mention.
+
+Request: {request}
+"""
+
+
+class PatientIntake(BaseModel):
+    """The ten intake fields the scheduler needs from a free-text request."""
+    name: Optional[str] = None
+    dob: Optional[str] = None
+    mrn: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    doctor: Optional[str] = None
+    location: Optional[str] = None
+    insurance_carrier: Optional[str] = None
+    insurance_member_id: Optional[str] = None
+    insurance_group: Optional[str] = None
+
+
+@lru_cache(maxsize=256)
+def partial_intake_model(fields: tuple[str, ...]) -> type[BaseModel]:
+    """PatientIntake restricted to `fields`, so the LLM only generates what is missing."""
+    return create_model(
+        "PartialPatientIntake", **{f: (Optional[str], None) for f in fields}
+    )
+
+
+def request_key(request: str) -> str:
+    """Content hash of the request, insensitive to case and whitespace noise."""
+    normalized = " ".join(request.split()).casefold()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class JSONFieldStream:
+    """
+    Incremental parser for the flat JSON object the LLM streams back.
+    `feed(chunk)` returns the (key, value) pairs completed by that chunk,
+    so a field can be shown as soon as its closing quote arrives.
+    """
+
+    def __init__(self):
+        self.state = "start"   # start | key | colon | value | after | done
+        self.raw = []          # characters of the token being read
+        self.key = None
+        self.in_string = False
+        self.escaped = False
+        self.depth = 0         # nesting inside a value ({} or [])
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        completed = []
+        for ch in chunk:
+            if self.state == "start":
+                if ch == "{":
+                    self.state = "key"
+            elif self.state == "key":
+                if self.in_string:
+                    if self._string_char(ch):
+                        self.key = json.loads('"' + "".join(self.raw) + '"')
+                        self.raw = []
+                        self.state = "colon"
+                elif ch == '"':
+                    self.in_string = True
+                elif ch == "}":
+                    self.state = "done"
+            elif self.state == "colon":
+                if ch == ":":
+                    self.state = "value"
+            elif self.state == "value":
+                literal = not self.raw or self.raw[0] not in '"{['
+                if self._value_char(ch):
+                    completed.append((self.key, json.loads("".join(self.raw))))
+                    self.raw = []
+                    self.state = "after"
+                    if literal and ch == "}":
+                        self.state = "done"
+                    elif literal and ch == ",":
+                        self.state = "key"
+            elif self.state == "after":
+                if ch == ",":
+                    self.state = "key"
+                elif ch == "}":
+                    self.state = "done"
+        return completed
+
+    def _string_char(self, ch: str) -> bool:
+        """Consume one character inside a string; True when it closes the string."""
+        if self.escaped:
+            self.escaped = False
+        elif ch == "\\":
+            self.escaped = True
+        elif ch == '"':
+            self.in_string = False
+            return True
+        self.raw.append(ch)
+        return False
+
+    def _value_char(self, ch: str) -> bool:
+        """Consume one value character; True once the value is complete."""
+        if not self.raw and not self.in_string:
+            if ch.isspace():
+                return False
+            self.raw.append(ch)
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth = 1
+            return False
+        if self.in_string:
+            if self.escaped:
+                self.escaped = False
+            elif ch == "\\":
+                self.escaped = True
+            elif ch == '"':
+                self.in_string = False
+                self.raw.append(ch)
+                return self.depth == 0
+            self.raw.append(ch)
+            return False
+        if self.depth:
+            self.raw.append(ch)
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                return self.depth == 0
+            return False
+        # bare literal (null, true, number) ends at a delimiter
+        if ch in ",}" or ch.isspace():
+            return True
+        self.raw.append(ch)
+        return False
+
+
+class IntakeParser:
+    """
+    Turns a free-text request into `PatientIntake` fields.
+
+    A deterministic extractor (tools/intake_rules.py) runs first; Ollama is
+    only asked for the fields it could not find, and only when a core field
+    is missing or too few fields were recognised. The Ollama client (and its
+    HTTP connection pool) is created once and reused; generation is
+    constrained to a pydantic JSON schema; results are kept in an LRU+TTL
+    cache keyed by content hash, so repeated or retried requests skip both.
+    """
+
+    def __init__(
+        self,
+        model: str = INTAKE_MODEL,
+        host: str | None = None,
+        cache_size: int = 512,
+        cache_ttl: float = 3600.0,
+        client=None,
+        use_rules: bool = True,
+        min_confidence: float = MIN_RULE_CONFIDENCE,
+    ):
+        self.model = model
+        self.host = host
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._client = client
+        self._client_lock = threading.Lock()
+        self.use_rules = use_rules
+        self.min_confidence = min_confidence
+        self.llm_calls = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import ollama  # deferred: only needed once a request hits the LLM
+                    self._client = ollama.Client(host=self.host)
+        return self._client
+
+    def build_prompt(self, request: str, fields=INTAKE_FIELDS) -> str:
+        return INTAKE_PROMPT.format(fields=", ".join(fields), request=request)
+
+    def needs_llm(self, found: dict, confidence: float) -> bool:
+        return any(f not in found for f in CORE_FIELDS) or confidence < self.min_confidence
+
+    def ask_llm(self, request: str, fields: tuple[str, ...]) -> dict | None:
+        """Generate only `fields`; None if the reply does not fit the schema."""
+        schema_model = partial_intake_model(fields)
+        self.llm_calls += 1
+        response = self.client.generate(
+            model=self.model,
+            prompt=self.build_prompt(request, fields),
+            format=schema_model.model_json_schema(),
+            options={"temperature": 0},
+        )
+        try:
+            return schema_model.model_validate_json(response["response"]).model_dump()
+        except ValidationError:
+            return None
+
+    def parse(self, request: str) -> dict:
+        key = request_key(request)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dict(cached)
+
+        found, confidence = extract_fields(request) if self.use_rules else ({}, 0.0)
+        parsed = {f: found.get(f) for f in INTAKE_FIELDS}
+
+        if self.needs_llm(found, confidence):
+            missing = tuple(f for f in INTAKE_FIELDS if f not in found)
+            generated = self.ask_llm(request, missing)
+            if generated is None:
+                # not cached: a retry may parse
+                return dict(parsed) if found else {"raw_text": request}
+            parsed.update(generated)
+
+        self.cache.set(key, parsed)
+        return dict(parsed)
+
+    def stream(self, request: str, cancel: threading.Event | None = None):
+        """
+        Like `parse`, but yields the fields known so far after each change:
+        first whatever the cache or the rules have, then each LLM field as
+        soon as its JSON value is complete. The last snapshot is the result.
+        Setting `cancel` (or closing the generator) stops the generation;
+        partial results are not cached.
+        """
+        key = request_key(request)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield dict(cached)
+            return
+
+        found, confidence = extract_fields(request) if self.use_rules else ({}, 0.0)
+        parsed = {f: found.get(f) for f in INTAKE_FIELDS}
+        if found:
+            yield dict(parsed)
+        if not self.needs_llm(found, confidence):
+            self.cache.set(key, parsed)
+            if not found:
+                yield dict(parsed)
+            return
+
+        missing = tuple(f for f in INTAKE_FIELDS if f not in found)
+        schema_model = partial_intake_model(missing)
+        self.llm_calls += 1
+        chunks = self.client.generate(
+            model=self.model,
+            prompt=self.build_prompt(request, missing),
+            format=schema_model.model_json_schema(),
+            options={"temperature": 0},
+            stream=True,
+        )
+        fields, text = JSONFieldStream(), []
+        try:
+            for chunk in chunks:
+                if cancel is not None and cancel.is_set():
+                    return
+                token = chunk["response"]
+                text.append(token)
+                try:
+                    completed = fields.feed(token)
+                except ValueError:
+                    return  # malformed JSON: keep what we have, uncached
+                changed = False
+                for name, value in completed:
+                    if name in missing and value != parsed[name]:
+                        parsed[name] = value
+                        changed = True
+                if changed:
+                    yield dict(parsed)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()  # releases the HTTP stream on cancel / early exit
+
+        try:
+            generated = schema_model.model_validate_json("".join(text)).model_dump()
+        except ValidationError:
+            return
+        parsed.update(generated)
+        self.cache.set(key, parsed)
+        yield dict(parsed)
+
+
+# shared parser, built once per process
+intake_parser = IntakeParser()
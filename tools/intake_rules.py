@@ -0,0 +1,152 @@
+# tools/intake_rules.py
+import re
+import threading
+import time
+from datetime import datetime
+from tools import database
+
+# the ten intake fields (tools.intake_parser.PatientIntake is built to match)
+INTAKE_FIELDS = (
+    "name", "dob", "mrn", "email", "phone", "doctor", "location",
+    "insurance_carrier", "insurance_member_id", "insurance_group",
+)
+# fields the scheduler cannot proceed without; the LLM is consulted if any is missing
+CORE_FIELDS = ("name", "dob")
+
+KNOWN_CARRIERS = (
+    "Blue Cross Blue Shield", "Blue Cross", "Blue Shield", "Aetna", "Cigna",
+    "UnitedHealthcare", "United Healthcare", "Humana", "Kaiser Permanente", "Kaiser",
+    "Anthem", "Medicare", "Medicaid", "Molina", "Centene", "Oscar", "Tricare",
+)
+
+DOB_FORMATS = (
+    "%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%d.%m.%Y",
+    "%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y", "%d %B %Y", "%d %b %Y",
+)
+
+# "this is Dr Johnson" names the doctor, not the patient
+_HONORIFIC = r"(?!(?:Dr|Doctor|Prof|Mr|Mrs|Ms|Miss)\b)"
+_NAME = r"([A-Z][a-zA-Z'\-]+(?:\s+[A-Z][a-zA-Z'\-]+){1,3})"
+_DATE = (
+    r"(\d{4}-\d{2}-\d{2}|\d{1,2}[/.\-]\d{1,2}[/.\-]\d{4}"
+    r"|[A-Za-z]{3,9}\.? \d{1,2},? \d{4}|\d{1,2} [A-Za-z]{3,9} \d{4})"
+)
+
+PATTERNS = {
+    "name": re.compile(
+        r"(?i:\b(?:my name is|name:|i am|i'm|this is)\s+)" + _HONORIFIC + _NAME
+    ),
+    "dob": re.compile(
+        r"(?i:\b(?:dob|d\.o\.b\.?|date of birth|birth ?date|born(?: on)?)\s*(?:is|:|-)?\s*)" + _DATE
+    ),
+    "mrn": re.compile(r"(?i:\bmrn\b)\s*(?:is|:|#|-)?\s*([A-Z]*\d{2,})|\b(MRN\d+)\b"),
+    "email": re.compile(r"\b([A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,})\b"),
+    "phone": re.compile(r"(?<![\w-])(\+?\d[\d\s().\-]{8,}\d)(?![\w-])"),
+    "insurance_member_id": re.compile(
+        r"(?i:\bmember\s*(?:id|#|number|no\.?)?\s*(?:is|:|-)?\s*)([A-Z0-9][A-Z0-9\-]{3,})"
+    ),
+    "insurance_group": re.compile(
+        r"(?i:\bgroup\s*(?:id|#|number|no\.?)?\s*(?:is|:|-)?\s*)([A-Z0-9][A-Z0-9\-]{2,})"
+    ),
+    "doctor": re.compile(r"\b(Dr\.?\s+[A-Z][a-zA-Z'\-]+)"),
+    "location": re.compile(r"\b(Clinic\s+[A-Z0-9]\b(?:\s*-\s*[A-Z][\w ]*?(?=[.,;]|$))?)"),
+}
+
+
+def parse_dob(value: str) -> str | None:
+    """Normalize a date of birth to ISO (YYYY-MM-DD); None if unparseable."""
+    value = value.strip().replace(".,", ",")
+    for fmt in DOB_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+# -----------------------------
+# Vocabulary from the DBs
+# -----------------------------
+_vocab: dict = {}
+_vocab_lock = threading.Lock()
+VOCAB_TTL = 600  # seconds
+
+
+def known_vocabulary() -> dict:
+    """Doctor and clinic names seen in patients.db / appointments.db (cached)."""
+    with _vocab_lock:
+        if _vocab and time.monotonic() - _vocab["loaded_at"] < VOCAB_TTL:
+            return _vocab
+        doctors, locations = set(), set()
+        try:
+            with database.connection(database.PATIENTS_DB) as conn:
+                for doctor, location in conn.execute(
+                    "SELECT DISTINCT doctor, preferred_location FROM patients"
+                ):
+                    doctors.add(doctor)
+                    locations.add(location)
+            with database.connection(database.APPOINTMENTS_DB) as conn:
+                for (location,) in conn.execute("SELECT DISTINCT clinic_location FROM doctor_schedules"):
+                    locations.add(location)
+        except Exception:
+            pass  # missing DBs just mean no vocabulary
+        _vocab.update(
+            doctors=sorted(filter(None, doctors), key=len, reverse=True),
+            locations=sorted(filter(None, locations), key=len, reverse=True),
+            loaded_at=time.monotonic(),
+        )
+        return _vocab
+
+
+def _find_known(text_folded: str, names) -> str | None:
+    """First known name (longest first) mentioned in the text, in canonical spelling."""
+    for name in names:
+        if re.search(r"\b" + re.escape(name.casefold()) + r"\b", text_folded):
+            return name
+    return None
+
+
+# -----------------------------
+# Extraction
+# -----------------------------
+def extract_fields(text: str, vocabulary: dict | None = None) -> tuple[dict, float]:
+    """
+    Deterministically pull intake fields out of a free-text request.
+    Returns (fields found, confidence) where confidence is the share of the
+    ten intake fields that were recognised.
+    """
+    vocabulary = known_vocabulary() if vocabulary is None else vocabulary
+    folded = text.casefold()
+    found: dict = {}
+
+    for field, pattern in PATTERNS.items():
+        m = pattern.search(text)
+        if not m:
+            continue
+        value = next(g for g in m.groups() if g)
+        if field == "dob":
+            value = parse_dob(value)
+        elif field == "phone":
+            digits = re.sub(r"\D", "", value)
+            if not 10 <= len(digits) <= 15 or re.fullmatch(r"\d{4}-\d{2}-\d{2}", value.strip()):
+                value = None
+            else:
+                value = ("+" if value.strip().startswith("+") else "") + digits
+        elif field == "name":
+            value = value.strip()
+        if value:
+            found[field] = value
+
+    # known names beat patterns: they also catch "dr johnson" / "clinic a"
+    doctor = _find_known(folded, vocabulary.get("doctors", ()))
+    if doctor:
+        found["doctor"] = doctor
+    location = _find_known(folded, vocabulary.get("locations", ()))
+    if location:
+        found["location"] = location
+    carrier = _find_known(folded, KNOWN_CARRIERS)
+    if carrier:
+        found["insurance_carrier"] = carrier
+
+    confidence = len(found) / len(INTAKE_FIELDS)
+    return found, confidence
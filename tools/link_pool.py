@@ -0,0 +1,198 @@
+# tools/link_pool.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable
+from tools import database
+
+POOL_DEPTH = int(os.getenv("SCHEDULING_LINK_POOL_SIZE", 5))
+LINK_TTL = timedelta(hours=int(os.getenv("SCHEDULING_LINK_TTL_HOURS", 24)))
+
+
+class SchedulingLinkPool:
+    """
+    Keeps `depth` single-use scheduling links pre-created per event type in
+    the `scheduling_links` table. `acquire` hands one out with a single
+    UPDATE ... RETURNING and tops the pool back up on a background thread,
+    so a booking waits on a DB read instead of a POST /scheduling_links.
+    """
+
+    def __init__(
+        self,
+        create_link: Callable[[str], str],
+        db_path: str = database.APPOINTMENTS_DB,
+        depth: int = POOL_DEPTH,
+        link_ttl: timedelta = LINK_TTL,
+        max_workers: int = 2,
+    ):
+        self.create_link = create_link
+        self.db_path = db_path
+        self.depth = depth
+        self.link_ttl = link_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="link-pool")
+        self._refilling: set[str] = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._refill_latencies: list[float] = []
+        self.init_db()
+
+    def init_db(self):
+        with database.transaction(self.db_path) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduling_links (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_type_uri TEXT NOT NULL,
+                booking_url TEXT NOT NULL,
+                created_at DATETIME NOT NULL,
+                expires_at DATETIME NOT NULL,
+                status TEXT CHECK(status IN ('ready','issued')) DEFAULT 'ready',
+                issued_at DATETIME
+            )
+            """)
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_links_ready
+            ON scheduling_links (event_type_uri, expires_at) WHERE status='ready'
+            """)
+
+    # -----------------------------
+    # Hand-out
+    # -----------------------------
+    def acquire(self, event_type_uri: str) -> str:
+        """Return a fresh link, creating one inline only if the pool ran dry."""
+        now = datetime.now().isoformat(timespec="seconds")
+        with database.connection(self.db_path) as conn:
+            row = conn.execute("""
+            UPDATE scheduling_links
+            SET status='issued', issued_at=?
+            WHERE id = (
+                SELECT id FROM scheduling_links
+                WHERE status='ready' AND event_type_uri=? AND expires_at > ?
+                ORDER BY expires_at
+                LIMIT 1
+            ) AND status='ready'
+            RETURNING booking_url
+            """, (now, event_type_uri, now)).fetchone()
+
+        self.refill_async(event_type_uri)
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if row:
+            return row["booking_url"]
+        return self.create_link(event_type_uri)
+
+    # -----------------------------
+    # Refill
+    # -----------------------------
+    def depth_of(self, event_type_uri: str) -> int:
+        now = datetime.now().isoformat(timespec="seconds")
+        with database.connection(self.db_path) as conn:
+            return conn.execute("""
+            SELECT COUNT(*) FROM scheduling_links
+            WHERE status='ready' AND event_type_uri=? AND expires_at > ?
+            """, (event_type_uri, now)).fetchone()[0]
+
+    def refill(self, event_type_uri: str) -> int:
+        """Create links until the pool is back at `depth`. Returns links created."""
+        t0 = time.perf_counter()
+        now = datetime.now()
+        with database.transaction(self.db_path) as conn:
+            conn.execute("""
+            DELETE FROM scheduling_links
+            WHERE status='ready' AND event_type_uri=? AND expires_at <= ?
+            """, (event_type_uri, now.isoformat(timespec="seconds")))
+
+        missing = self.depth - self.depth_of(event_type_uri)
+        created = []
+        for _ in range(max(missing, 0)):
+            created.append((
+                event_type_uri,
+                self.create_link(event_type_uri),
+                now.isoformat(timespec="seconds"),
+                (now + self.link_ttl).isoformat(timespec="seconds"),
+            ))
+        if created:
+            with database.transaction(self.db_path) as conn:
+                conn.executemany("""
+                INSERT INTO scheduling_links (event_type_uri, booking_url, created_at, expires_at)
+                VALUES (?, ?, ?, ?)
+                """, created)
+            with self._lock:
+                self._refill_latencies.append(time.perf_counter() - t0)
+                del self._refill_latencies[:-100]  # keep recent samples only
+        return len(created)
+
+    def refill_async(self, event_type_uri: str):
+        """Schedule a refill unless one is already running for this event type."""
+        with self._lock:
+            if event_type_uri in self._refilling:
+                return None
+            self._refilling.add(event_type_uri)
+
+        def run():
+            try:
+                return self.refill(event_type_uri)
+            except Exception as e:
+                print(f"⚠️ Scheduling link refill failed for {event_type_uri}: {e}")
+            finally:
+                with self._lock:
+                    self._refilling.discard(event_type_uri)
+
+        return self._executor.submit(run)
+
+    def warm(self, event_type_uris):
+        """Fill the pool for each event type (blocking), e.g. at startup."""
+        for uri in event_type_uris:
+            self.refill(uri)
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+    def metrics(self) -> dict:
+        now = datetime.now().isoformat(timespec="seconds")
+        with database.connection(self.db_path) as conn:
+            depth = {
+                r["event_type_uri"]: r["n"] for r in conn.execute("""
+                SELECT event_type_uri, COUNT(*) AS n FROM scheduling_links
+                WHERE status='ready' AND expires_at > ?
+                GROUP BY event_type_uri
+                """, (now,))
+            }
+        with self._lock:
+            samples = list(self._refill_latencies)
+            hits, misses = self.hits, self.misses
+        return {
+            "depth": depth,
+            "hits": hits,
+            "misses": misses,
+            "refills": len(samples),
+            "refill_latency_ms_avg": sum(samples) / len(samples) * 1000 if samples else None,
+            "refill_latency_ms_max": max(samples) * 1000 if samples else None,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+# -----------------------------
+# Shared pools
+# -----------------------------
+_pools: dict[tuple[str, int], SchedulingLinkPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_link_pool(db_path: str, client) -> SchedulingLinkPool:
+    """One pool per database and (shared) Calendly client."""
+    key = (os.path.abspath(db_path), id(client))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = SchedulingLinkPool(client.create_scheduling_link, db_path=db_path)
+    return pool
@@ -0,0 +1,255 @@
+# tools/outbox.py
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable
+
+from tools import database
+from tools.config import get_tool
+from tools.templates import RenderedMessage, render
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", 8))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 6))
+OUTBOX_BASE_DELAY = float(os.getenv("OUTBOX_BASE_DELAY", 30))    # seconds before the first retry
+OUTBOX_MAX_DELAY = float(os.getenv("OUTBOX_MAX_DELAY", 3600))
+# a row claimed longer ago than this belongs to a worker that died
+OUTBOX_LEASE = timedelta(minutes=5)
+# delivered and dead-lettered rows are deleted after this long
+OUTBOX_RETENTION = timedelta(days=float(os.getenv("OUTBOX_RETENTION_DAYS", 30)))
+OUTBOX_PURGE_INTERVAL = 3600.0  # seconds between purges in run_forever
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat(timespec="seconds")
+
+
+# -----------------------------
+# Schema and writes
+# -----------------------------
+def init_outbox(conn):
+    """Create the outbox table (called from CalendarTool.init_fallback_db)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        channel TEXT CHECK(channel IN ('email','sms')),
+        address TEXT NOT NULL,
+        template TEXT NOT NULL,
+        context TEXT NOT NULL,
+        status TEXT CHECK(status IN ('pending','sending','sent','dead')) DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at DATETIME NOT NULL,
+        locked_until DATETIME,
+        last_error TEXT,
+        created_at DATETIME NOT NULL,
+        sent_at DATETIME,
+        appointment_id INTEGER
+    )
+    """)
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(outbox)")}
+    if "appointment_id" not in columns:
+        conn.execute("ALTER TABLE outbox ADD COLUMN appointment_id INTEGER")
+        conn.execute("""
+        UPDATE outbox SET appointment_id = CAST(substr(idempotency_key, 13) AS INTEGER)
+        WHERE idempotency_key LIKE 'appointment:%'
+        """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_appointment ON outbox (appointment_id, status)")
+
+
+def enqueue(conn, key: str, channel: str, address: str, template: str, context: dict,
+            appointment_id: int | None = None) -> bool:
+    """
+    Add one notification inside the caller's transaction. `key` makes the
+    write idempotent: a second enqueue with the same key is ignored.
+    `appointment_id` ties it to a booking, so cancelling that booking
+    drops it. Returns True if a row was written.
+    """
+    now = _iso(datetime.now())
+    cur = conn.execute("""
+    INSERT OR IGNORE INTO outbox
+        (idempotency_key, channel, address, template, context, next_attempt_at, created_at, appointment_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (key, channel, address, template, json.dumps(context, default=str), now, now, appointment_id))
+    return cur.rowcount == 1
+
+
+def cancel_notifications(conn, appointment_ids) -> int:
+    """
+    Dead-letter the undelivered notifications of cancelled appointments, in
+    the cancelling transaction. A row already claimed ('sending') is marked
+    too, so its worker's outcome update no longer applies.
+    """
+    cur = conn.execute("""
+    UPDATE outbox SET status='dead', locked_until=NULL, last_error='appointment cancelled'
+    WHERE appointment_id IN (SELECT value FROM json_each(?)) AND status IN ('pending','sending')
+    """, (json.dumps(list(appointment_ids)),))
+    return cur.rowcount
+
+
+def submit(key: str, channel: str, address: str, template: str, context: dict,
+           db_path: str | None = None) -> bool:
+    """`enqueue` in a transaction of its own, for writers without a booking transaction."""
+    import tools.calendar_tool as calendar_tool
+    with database.transaction(db_path or calendar_tool.DB_PATH) as conn:
+        init_outbox(conn)
+        return enqueue(conn, key, channel, address, template, context)
+
+
+def _send_email(address: str, message: RenderedMessage):
+    from tools.email_tool import EmailTool
+    get_tool(EmailTool).send_email(address, message.subject, message.text, message.html)
+
+
+def _send_sms(address: str, message: RenderedMessage):
+    from tools.sms_tool import SMSTool
+    get_tool(SMSTool, True).send_sms(address, message.sms or message.text)
+
+
+SENDERS: dict[str, Callable] = {"email": _send_email, "sms": _send_sms}
+
+
+# -----------------------------
+# Worker
+# -----------------------------
+class OutboxWorker:
+    """
+    Drains the outbox: claims due rows with one conditional UPDATE (so any
+    number of workers can run side by side), sends them on a thread pool,
+    and records the outcome. A failed send is retried with exponential
+    backoff and jitter; after `max_attempts` the row is dead-lettered
+    (status 'dead') with its last error, for someone to look at.
+    """
+
+    def __init__(
+        self,
+        db_path: str | None = None,
+        workers: int = OUTBOX_WORKERS,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        base_delay: float = OUTBOX_BASE_DELAY,
+        max_delay: float = OUTBOX_MAX_DELAY,
+        senders: dict[str, Callable] | None = None,
+    ):
+        import tools.calendar_tool as calendar_tool  # owns the appointments DB and its schema
+        self.db_path = db_path or calendar_tool.DB_PATH
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.senders = {**SENDERS, **(senders or {})}
+        with database.transaction(self.db_path) as conn:
+            init_outbox(conn)
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds to wait after the `attempts`-th failure, jittered over the upper half."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def claim(self, now: datetime, limit: int) -> list:
+        with database.transaction(self.db_path) as conn:
+            conn.execute("""
+            UPDATE outbox SET status='pending'
+            WHERE status='sending' AND locked_until < ?
+            """, (_iso(now),))
+            return conn.execute("""
+            UPDATE outbox SET status='sending', locked_until=?
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE status='pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at LIMIT ?
+            )
+            RETURNING id, channel, address, template, context, attempts
+            """, (_iso(now + OUTBOX_LEASE), _iso(now), limit)).fetchall()
+
+    def deliver(self, row) -> str | None:
+        """Send one row; the error text on failure, None on success."""
+        try:
+            message = render(row["template"], **json.loads(row["context"]))
+            self.senders[row["channel"]](row["address"], message)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        return None
+
+    def run_once(self, now: datetime | None = None, limit: int = 100) -> dict:
+        """Claim and send one batch of due notifications; returns outcome counts."""
+        now = now or datetime.now()
+        rows = self.claim(now, limit)
+        counts = {"sent": 0, "retried": 0, "dead": 0}
+        if not rows:
+            return counts
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(rows)), thread_name_prefix="outbox") as pool:
+            errors = list(pool.map(self.deliver, rows))
+
+        sent, failed = [], []
+        for row, error in zip(rows, errors):
+            if error is None:
+                sent.append((_iso(datetime.now()), row["id"]))
+                counts["sent"] += 1
+                continue
+            attempts = row["attempts"] + 1
+            if attempts >= self.max_attempts:
+                failed.append(("dead", attempts, None, error, row["id"]))
+                counts["dead"] += 1
+                print(f"❌ Outbox {row['id']} dead-lettered after {attempts} attempts: {error}")
+            else:
+                retry_at = _iso(now + timedelta(seconds=self.backoff(attempts)))
+                failed.append(("pending", attempts, retry_at, error, row["id"]))
+                counts["retried"] += 1
+                print(f"⚠️ Outbox {row['id']} failed ({error}), retrying at {retry_at}")
+        with database.transaction(self.db_path) as conn:
+            conn.executemany("""
+            UPDATE outbox SET status='sent', sent_at=?, locked_until=NULL
+            WHERE id=? AND status='sending'
+            """, sent)
+            conn.executemany("""
+            UPDATE outbox SET status=?, attempts=?, next_attempt_at=coalesce(?, next_attempt_at),
+                              last_error=?, locked_until=NULL
+            WHERE id=? AND status='sending'
+            """, failed)
+        return counts
+
+    def drain(self, now: datetime | None = None, limit: int = 100) -> dict:
+        """Run batches until nothing is due."""
+        totals = {"sent": 0, "retried": 0, "dead": 0}
+        while True:
+            counts = self.run_once(now, limit)
+            for k, v in counts.items():
+                totals[k] += v
+            if sum(counts.values()) < limit:
+                return totals
+
+    def purge(self, now: datetime | None = None, retention: timedelta = OUTBOX_RETENTION) -> int:
+        """
+        Delete sent and dead-lettered rows older than `retention`. Their
+        idempotency keys are forgotten with them, so retention must outlast
+        any retry of the write that enqueued them.
+        """
+        cutoff = _iso((now or datetime.now()) - retention)
+        with database.transaction(self.db_path) as conn:
+            return conn.execute("""
+            DELETE FROM outbox
+            WHERE (status='sent' AND sent_at < ?) OR (status='dead' AND created_at < ?)
+            """, (cutoff, cutoff)).rowcount
+
+    def run_forever(self, poll_interval: float = 2.0, stop: threading.Event | None = None):
+        """Worker loop for scripts/outbox_worker.py; returns once `stop` is set."""
+        stop = stop or threading.Event()
+        next_purge = 0.0
+        while not stop.is_set():
+            counts = self.drain()
+            if any(counts.values()):
+                print(f"📨 Outbox: {counts}")
+            if time.monotonic() >= next_purge:
+                purged = self.purge()
+                if purged:
+                    print(f"🧹 Outbox: purged {purged} old rows")
+                next_purge = time.monotonic() + OUTBOX_PURGE_INTERVAL
+            stop.wait(poll_interval)
+
+    def stats(self) -> dict:
+        with database.connection(self.db_path) as conn:
+            return {s: n for s, n in conn.execute("SELECT status, count(*) FROM outbox GROUP BY status")}
@@ -1,62 +1,108 @@
 # tools/patient_lookup.py
+import asyncio
+import os
+from difflib import SequenceMatcher
 from typing import Optional
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from tools import database
+from tools.cache import TTLCache
+from tools.intake_rules import parse_dob
 
-DB_PATH = "db/patients.db"
+DB_PATH = database.PATIENTS_DB
+# fuzzy search re-ranks this many trigram candidates
+FUZZY_CANDIDATES = 50
+PATIENT_CACHE_SIZE = int(os.getenv("PATIENT_CACHE_SIZE", 4096))
+PATIENT_CACHE_TTL = float(os.getenv("PATIENT_CACHE_TTL", 300))
+# a patient seen within this many days is "returning" (24 months)
+RETURNING_WINDOW_DAYS = 730
 
-def lookup_patient(name: str = "", dob: str = "", mrn: Optional[str] = None) -> dict:
+
+# -----------------------------
+# Normalized keys
+# -----------------------------
+def normalize_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def normalize_dob(dob: str) -> str:
+    return parse_dob(dob) or dob.strip()
+
+
+def search_key(name: Optional[str], dob: Optional[str]) -> Optional[str]:
+    """Indexed lookup key: casefolded, whitespace-collapsed name + ISO DOB."""
+    if not name or not dob:
+        return None
+    return f"{normalize_name(name)}|{normalize_dob(dob)}"
+
+
+# which search structures (scripts/update_db.py) each database has
+_features: dict[str, dict] = {}
+
+
+def _schema_features(conn, db_path: str) -> dict:
+    key = os.path.abspath(db_path)
+    features = _features.get(key)
+    if features is None:
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(patients)")}
+        fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'patients_fts'").fetchone()
+        features = _features[key] = {
+            "search_key": "search_key" in columns,
+            "fts": bool(fts),
+            "classification": "classification" in columns,
+        }
+    return features
+
+
+# -----------------------------
+# Patient cache
+# -----------------------------
+# found patients, under (db, "mrn", mrn) and (db, "key", search_key); misses
+# are not cached so a newly registered patient is seen straight away
+patient_cache = TTLCache(maxsize=PATIENT_CACHE_SIZE, ttl=PATIENT_CACHE_TTL)
+
+
+def _cache_keys(db_path: str, mrn: Optional[str], key: Optional[str]) -> list[tuple]:
+    keys = [(db_path, "mrn", mrn)] if mrn else []
+    if key:
+        keys.append((db_path, "key", key))
+    return keys
+
+
+def invalidate_patient(mrn: Optional[str] = None, name: Optional[str] = None, dob: Optional[str] = None):
     """
-    Lookup patient in patients.db.
-    Provide either `mrn` or both `name` and `dob`.
-    Returns a dict with 'found' (bool), patient fields if found, and classification.
+    Drop one patient from the cache. Call after writing to that patient's row;
+    pass the old name/DOB too when they changed, so both keys are dropped.
     """
-    if not mrn and (not name or not dob):
-        raise ValueError("Provide either mrn or both name and dob")
+    for cache_key in _cache_keys(DB_PATH, mrn, search_key(name, dob)):
+        cached = patient_cache.pop(cache_key)
+        if cached:
+            for other in _cache_keys(DB_PATH, cached["mrn"], search_key(cached["name"], cached["dob"])):
+                patient_cache.pop(other)
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
 
-    if mrn:
-        cur.execute("SELECT * FROM patients WHERE mrn = ?", (mrn,))
-    else:
-        cur.execute("SELECT * FROM patients WHERE name = ? AND dob = ?", (name, dob))
+def clear_patient_cache():
+    """Forget every cached patient and schema probe (after migrations / bulk writes)."""
+    patient_cache.clear()
+    _features.clear()
 
-    row = cur.fetchone()
-    conn.close()
 
-    if not row:
-        return {
-            "found": False,
-            "classification": "new",
-            "reason": "Not found in DB – treat as new patient"
-        }
+def patient_cache_stats() -> dict:
+    """Hit/miss counters and size of the patient cache, for monitoring."""
+    stats = patient_cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
 
-    # Row schema with id first:
-    # (id, mrn, name, dob, email, phone, insurance_carrier, insurance_member_id,
-    #  insurance_group, doctor, preferred_location, last_visit_dt)
-    (
-        _id,
-        mrn_val,
-        pname,
-        pdob,
-        email,
-        phone,
-        insurance_carrier,
-        insurance_member_id,
-        insurance_group,
-        doctor,
-        location,
-        last_visit,
-    ) = row
 
+def classify_last_visit(last_visit: Optional[str]) -> tuple[str, str]:
+    """(classification, reason): returning if seen within the last 24 months."""
     classification = "new"
     reason = "No visit record"
 
     if last_visit:  # guard against NULL
         try:
             last_visit_dt = datetime.strptime(last_visit, "%Y-%m-%d").date()
-            cutoff = datetime.now().date() - timedelta(days=730)  # 24 months
+            cutoff = datetime.now().date() - timedelta(days=RETURNING_WINDOW_DAYS)
             if last_visit_dt >= cutoff:
                 classification = "returning"
                 reason = "Visited within last 24 months"
@@ -65,8 +111,113 @@ def lookup_patient(name: str = "", dob: str = "", mrn: Optional[str] = None) ->
                 reason = "Last visit more than 24 months ago"
         except Exception as e:
             reason = f"Invalid last_visit format: {e}"
+    return classification, reason
+
+
+def row_classification(row) -> tuple[str, str]:
+    """
+    (classification, reason) for a patients row: the value materialized by
+    `classify_patients` when it was computed today (the rule only changes
+    with the date), else computed from last_visit_dt.
+    """
+    keys = row.keys()
+    if "classification" in keys and row["classification"] and row["classified_at"] \
+            and row["classified_at"][:10] == date.today().isoformat():
+        if row["classification"] == "returning":
+            return "returning", "Visited within last 24 months"
+        if not row["last_visit_dt"]:
+            return "new", "No visit record"
+        return "new", "Last visit more than 24 months ago"
+    return classify_last_visit(row["last_visit_dt"])
+
+
+# -----------------------------
+# Bulk classification
+# -----------------------------
+def classify_patients(db_path: Optional[str] = None, today: Optional[str] = None) -> dict:
+    """
+    Materialize new/returning for every patient in one UPDATE (needs the
+    classification columns from scripts/update_db.py). Rows whose
+    last_visit_dt is not an ISO date are left NULL and classified on lookup.
+    Returns counts per classification ("unclassified" for NULL).
+    """
+    db_path = db_path or DB_PATH
+    today = today or date.today().isoformat()
+    with database.transaction(db_path) as conn:
+        conn.execute("""
+        UPDATE patients SET
+            classification = CASE
+                WHEN last_visit_dt IS NULL THEN 'new'
+                WHEN date(last_visit_dt) IS NOT last_visit_dt THEN NULL
+                WHEN last_visit_dt >= date(:today, :window) THEN 'returning'
+                ELSE 'new'
+            END,
+            classified_at = :today || 'T' || time('now', 'localtime')
+        """, {"today": today, "window": f"-{RETURNING_WINDOW_DAYS} days"})
+        counts = {
+            (c or "unclassified"): n for c, n in conn.execute(
+                "SELECT classification, count(*) FROM patients GROUP BY classification"
+            )
+        }
+    clear_patient_cache()
+    return counts
+
+
+def lookup_patient(name: str = "", dob: str = "", mrn: Optional[str] = None) -> dict:
+    """
+    Lookup patient in patients.db.
+    Provide either `mrn` or both `name` and `dob`.
+    Returns a dict with 'found' (bool), patient fields if found, and classification.
+    Found patients are served from `patient_cache` until they expire or are invalidated.
+    """
+    if not mrn and (not name or not dob):
+        raise ValueError("Provide either mrn or both name and dob")
+
+    cache_key = (DB_PATH, "mrn", mrn) if mrn else (DB_PATH, "key", search_key(name, dob))
+    cached = patient_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+
+    with database.connection(DB_PATH) as conn:
+        if mrn:
+            row = conn.execute("SELECT * FROM patients WHERE mrn = ?", (mrn,)).fetchone()
+        elif _schema_features(conn, DB_PATH)["search_key"]:
+            # rows written without a key (not yet backfilled) still match exactly;
+            # both branches of the OR are served by idx_patients_search_key
+            row = conn.execute("""
+                SELECT * FROM patients
+                WHERE search_key = ? OR (search_key IS NULL AND name = ? AND dob = ?)
+                LIMIT 1
+            """, (search_key(name, dob), name, dob)).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT * FROM patients WHERE name = ? AND dob = ?", (name, dob)
+            ).fetchone()
 
-    return {
+    if not row:
+        return {
+            "found": False,
+            "classification": "new",
+            "reason": "Not found in DB – treat as new patient"
+        }
+
+    # Columns are read by name: migrations (scripts/update_db.py) append
+    # columns, so positional unpacking would break as the schema grows.
+    mrn_val = row["mrn"]
+    pname = row["name"]
+    pdob = row["dob"]
+    email = row["email"]
+    phone = row["phone"]
+    insurance_carrier = row["insurance_carrier"]
+    insurance_member_id = row["insurance_member_id"]
+    insurance_group = row["insurance_group"]
+    doctor = row["doctor"]
+    location = row["preferred_location"]
+    last_visit = row["last_visit_dt"]
+
+    classification, reason = row_classification(row)
+
+    result = {
         "found": True,
         "mrn": mrn_val,
         "name": pname,
@@ -82,3 +233,71 @@ def lookup_patient(name: str = "", dob: str = "", mrn: Optional[str] = None) ->
         "classification": classification,
         "reason": reason,
     }
+    for key in _cache_keys(DB_PATH, mrn_val, search_key(pname, pdob)):
+        patient_cache.set(key, result)
+    return dict(result)
+
+
+def search_patients(name: str, dob: Optional[str] = None, limit: int = 10) -> list[dict]:
+    """
+    Fuzzy patient search for "did you mean" style matching. Candidates come
+    from the trigram FTS index (patients sharing at least one correctly
+    spelled name word, else any 3-letter sequence), ranked by bm25, then
+    re-ranked by name similarity with a bonus for a matching DOB.
+    Never used to auto-select a record: callers show the list to a human.
+    """
+    query_name = normalize_name(name)
+    iso_dob = normalize_dob(dob) if dob else None
+    words = [w for w in query_name.split() if len(w) >= 3]
+
+    def quoted(t):
+        return '"' + t.replace('"', '""') + '"'
+
+    def grams(word):
+        return [word[i:i + 3] for i in range(len(word) - 2)]
+
+    # a word matches when all its trigrams do; any correctly spelled word is
+    # enough to make the shortlist, so one typo does not lose the patient
+    by_word = " OR ".join("(" + " AND ".join(quoted(g) for g in grams(w)) + ")" for w in words)
+    # last resort when every word has a typo: any shared trigram
+    any_gram = " OR ".join(quoted(g) for g in sorted({g for w in words for g in grams(w)}))
+
+    candidates = """
+        SELECT p.mrn, p.name, p.dob
+        FROM patients_fts
+        JOIN patients p ON p.rowid = patients_fts.rowid
+        WHERE patients_fts MATCH ? {dob_filter}
+        ORDER BY bm25(patients_fts)
+        LIMIT ?
+    """
+    rows = {}
+    with database.connection(DB_PATH) as conn:
+        if words and _schema_features(conn, DB_PATH)["fts"]:
+            for match in (by_word, any_gram):
+                if iso_dob:
+                    for r in conn.execute(candidates.format(dob_filter="AND p.dob = ?"),
+                                          (match, iso_dob, FUZZY_CANDIDATES)):
+                        rows[r["mrn"]] = r
+                for r in conn.execute(candidates.format(dob_filter=""), (match, FUZZY_CANDIDATES)):
+                    rows.setdefault(r["mrn"], r)
+                if rows:
+                    break
+        elif iso_dob:
+            for r in conn.execute(
+                "SELECT mrn, name, dob FROM patients WHERE dob = ? LIMIT ?", (iso_dob, FUZZY_CANDIDATES)
+            ):
+                rows[r["mrn"]] = r
+
+    results = []
+    for r in rows.values():
+        score = SequenceMatcher(None, query_name, normalize_name(r["name"])).ratio()
+        if iso_dob and r["dob"] == iso_dob:
+            score += 0.5
+        results.append({"mrn": r["mrn"], "name": r["name"], "dob": r["dob"], "score": round(score, 3)})
+    results.sort(key=lambda c: (-c["score"], c["mrn"]))
+    return results[:limit]
+
+
+async def alookup_patient(name: str = "", dob: str = "", mrn: Optional[str] = None) -> dict:
+    """`lookup_patient` run in a worker thread, for async callers."""
+    return await asyncio.to_thread(lookup_patient, name, dob, mrn)
@@ -1,83 +1,308 @@
-import sqlite3
+import json
+import os
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
+from tools import database, patient_lookup
+from tools.config import get_tool
 from tools.email_tool import EmailTool
+from tools.rate_limit import TokenBucket
 from tools.sms_tool import SMSTool
+from tools.templates import render
+
+DB_PATH = database.APPOINTMENTS_DB
+
+# stage -> hours before the appointment it goes out
+REMINDER_STAGES = {1: 48, 2: 24, 3: 4}
+REMINDER_CHANNELS = ("email", "sms")
+# a reminder claimed longer ago than this belongs to a run that died
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# dispatch: worker threads, and messages per second each provider accepts
+REMINDER_WORKERS = int(os.getenv("REMINDER_WORKERS", 16))
+EMAIL_RATE = float(os.getenv("REMINDER_EMAIL_RATE", 20))
+SMS_RATE = float(os.getenv("REMINDER_SMS_RATE", 10))
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """Failures worth retrying: dropped connections, SMTP 4xx, HTTP 429/5xx."""
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+        return True
+    return getattr(exc, "status", None) in TRANSIENT_STATUSES  # TwilioRestException
+
+
+# -----------------------------
+# Schema and materialization
+# -----------------------------
+def init_reminders(conn):
+    """Create / upgrade the reminders table (called from CalendarTool.init_fallback_db)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS reminders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        appointment_id INTEGER,
+        when_dt DATETIME NOT NULL,
+        channel TEXT CHECK(channel IN ('email','sms')),
+        status TEXT DEFAULT 'pending',
+        response TEXT,
+        FOREIGN KEY(appointment_id) REFERENCES appointments(id)
+    )
+    """)
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(reminders)")}
+    for column, decl in (("stage", "INTEGER"), ("claimed_at", "DATETIME"), ("sent_at", "DATETIME")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE reminders ADD COLUMN {column} {decl}")
+    # the poller only ever reads (status, when_dt) ranges
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (status, when_dt)")
+    # one row per appointment / stage / channel, so materializing twice is a no-op
+    conn.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_reminders_stage
+    ON reminders (appointment_id, stage, channel)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_start ON appointments (start_dt)")
+
+
+def schedule_reminders(conn, appointment_id: int, start_dt: str, now: datetime | None = None,
+                       channels=REMINDER_CHANNELS) -> int:
+    """
+    Insert the reminder stages of one appointment, inside the caller's
+    booking transaction. Stages whose time has already passed are skipped.
+    Returns the number of rows written.
+    """
+    start = datetime.fromisoformat(start_dt)
+    now = now or datetime.now()
+    rows = []
+    for stage, hours in REMINDER_STAGES.items():
+        when = start - timedelta(hours=hours)
+        if when > now:
+            rows.extend(
+                (appointment_id, when.isoformat(timespec="seconds"), channel, stage) for channel in channels
+            )
+    cur = conn.executemany("""
+    INSERT OR IGNORE INTO reminders (appointment_id, when_dt, channel, stage)
+    VALUES (?, ?, ?, ?)
+    """, rows)
+    return cur.rowcount
+
+
+def cancel_reminders(conn, appointment_ids) -> int:
+    """Drop the pending reminders of cancelled appointments."""
+    cur = conn.execute("""
+    UPDATE reminders SET status='cancelled'
+    WHERE status='pending' AND appointment_id IN (SELECT value FROM json_each(?))
+    """, (json.dumps(list(appointment_ids)),))
+    return cur.rowcount
+
+
+def reminder_message(stage: int, name: str, start_time: str) -> tuple[str, str, str]:
+    """
+    (email subject, email body, sms text) for one stage.
+    stage 1 → normal reminder
+    stage 2 → check if forms are filled
+    stage 3 → confirm attendance / ask cancellation reason
+    """
+    if stage not in REMINDER_STAGES:
+        raise ValueError("Stage must be 1, 2, or 3.")
+    message = render(f"reminder_stage_{stage}", patient_name=name, start_time=start_time)
+    return message.subject, message.text, message.sms
 
-DB_PATH = "db/appointments.db"
 
 class ReminderTool:
-    def __init__(self, use_twilio: bool = False):
-        self.email_tool = EmailTool()
-        self.sms_tool = SMSTool(use_twilio=use_twilio)
+    """
+    Sends the reminders materialized in the `reminders` table.
+
+    Each run claims the due rows (pending, when_dt <= now) in one
+    conditional UPDATE, so concurrent runs never pick the same reminder,
+    sends them, and marks each one sent. A run therefore touches only due
+    reminders, and repeating it sends nothing twice. Rows left claimed by a
+    crashed run are retried after CLAIM_TIMEOUT.
+
+    Claimed batches are sent by a pool of `workers` threads. Each provider
+    has its own token bucket (`rates`, messages/second), identical messages
+    to the same recipient go out once, and transient failures are retried
+    with exponential backoff before a reminder is marked failed.
+    """
+
+    def __init__(
+        self,
+        use_twilio: bool = False,
+        email_tool=None,
+        sms_tool=None,
+        workers: int = REMINDER_WORKERS,
+        rates: dict | None = None,
+        max_attempts: int = 3,
+        backoff_max: float = 10.0,
+    ):
+        from tools.calendar_tool import CalendarTool  # owns the appointments schema
+        CalendarTool(use_fallback=True).init_fallback_db()
+        self.use_twilio = use_twilio
+        self._email_tool = email_tool
+        self._sms_tool = sms_tool
+        self.workers = workers
+        rates = {"email": EMAIL_RATE, "sms": SMS_RATE, **(rates or {})}
+        self.buckets = {channel: TokenBucket(rate) for channel, rate in rates.items()}
+        self._retry_kwargs = dict(
+            retry=retry_if_exception(_is_transient),
+            stop=stop_after_attempt(max_attempts),
+            wait=wait_exponential(multiplier=0.5, max=backoff_max),
+            reraise=True,
+        )
+
+    @property
+    def email_tool(self):
+        if self._email_tool is None:
+            self._email_tool = get_tool(EmailTool)
+        return self._email_tool
+
+    @property
+    def sms_tool(self):
+        if self._sms_tool is None:
+            self._sms_tool = get_tool(SMSTool, self.use_twilio)
+        return self._sms_tool
 
     def get_upcoming_appointments(self, within_hours: int = 48):
         """
-        Fetch appointments scheduled within the next `within_hours`.
+        Fetch confirmed appointments starting within the next `within_hours`.
         """
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cutoff = (datetime.utcnow() + timedelta(hours=within_hours)).isoformat()
-
-        cur.execute("""
-        SELECT id, patient_name, email, start_time
-        FROM appointments
-        WHERE start_time IS NOT NULL AND start_time < ?
-        """, (cutoff,))
-        rows = cur.fetchall()
-        conn.close()
-
-        return [
-            {"id": r[0], "patient_name": r[1], "email": r[2], "start_time": r[3]}
-            for r in rows
-        ]
-
-    def send_reminder(self, appointment: dict, stage: int = 1):
+        now = datetime.now()
+        with database.connection(DB_PATH) as conn:
+            rows = conn.execute("""
+            SELECT id, patient_mrn, doctor_id, clinic_location, start_dt
+            FROM appointments
+            WHERE status='confirmed' AND start_dt >= ? AND start_dt < ?
+            ORDER BY start_dt
+            """, (now.isoformat(timespec="seconds"),
+                  (now + timedelta(hours=within_hours)).isoformat(timespec="seconds"))).fetchall()
+        return [dict(r) for r in rows]
+
+    def claim_due(self, now: datetime | None = None, limit: int = 100) -> list[dict]:
         """
-        Send a reminder for an appointment.
-        stage 1 → normal reminder
-        stage 2 → check if forms are filled
-        stage 3 → confirm attendance / ask cancellation reason
+        Atomically mark up to `limit` due reminders as 'sending' and return
+        them with the patient's name and address. Reminders that can no
+        longer be sent (cancelled or past appointment, no contact) are
+        closed here and not returned.
         """
-        name = appointment["patient_name"]
-        email = appointment["email"]
-        start_time = appointment["start_time"]
-
-        if stage == 1:
-            subject = f"Reminder: Appointment on {start_time}"
-            body = f"Hello {name}, this is a reminder for your upcoming appointment on {start_time}."
-            sms = f"Reminder: Your appointment is on {start_time}."
-        elif stage == 2:
-            subject = f"Action Needed: Forms for your appointment on {start_time}"
-            body = (
-                f"Hello {name}, please complete your intake forms before your appointment on {start_time}. "
-                f"Click here to access your forms: [link]"
-            )
-            sms = f"Reminder: Please complete your intake forms before {start_time}."
-        elif stage == 3:
-            subject = f"Confirm Your Appointment on {start_time}"
-            body = (
-                f"Hello {name}, please confirm if you will attend your appointment on {start_time}. "
-                f"If not, reply with the reason for cancellation."
+        return self._claim(now, limit)[1]
+
+    def _claim(self, now: datetime | None, limit: int) -> tuple[int, list[dict]]:
+        now = now or datetime.now()
+        now_iso = now.isoformat(timespec="seconds")
+        with database.transaction(DB_PATH) as conn:
+            conn.execute("""
+            UPDATE reminders SET status='pending', claimed_at=NULL
+            WHERE status='sending' AND when_dt <= ? AND claimed_at < ?
+            """, (now_iso, (now - CLAIM_TIMEOUT).isoformat(timespec="seconds")))
+            claimed = conn.execute("""
+            UPDATE reminders SET status='sending', claimed_at=?
+            WHERE id IN (
+                SELECT id FROM reminders
+                WHERE status='pending' AND when_dt <= ?
+                ORDER BY when_dt LIMIT ?
             )
-            sms = f"Confirm your appointment on {start_time}. Reply YES to confirm or NO to cancel."
+            RETURNING id, appointment_id, stage, channel
+            """, (now_iso, now_iso, limit)).fetchall()
+            appointments = {
+                r["id"]: r for r in conn.execute("""
+                SELECT id, patient_mrn, start_dt, status, patient_name, email, phone FROM appointments
+                WHERE id IN (SELECT value FROM json_each(?))
+                """, (json.dumps(sorted({r["appointment_id"] for r in claimed})),))
+            }
+
+        due, closed = [], []
+        for r in claimed:
+            appt = appointments.get(r["appointment_id"])
+            if appt is None or appt["status"] != "confirmed":
+                closed.append(("cancelled", "Appointment cancelled", r["id"]))
+                continue
+            if appt["start_dt"] <= now_iso:
+                closed.append(("expired", "Appointment already started", r["id"]))
+                continue
+            # the contact given at booking; appointments booked without one
+            # fall back to the patient record
+            field = "email" if r["channel"] == "email" else "phone"
+            address, name = appt[field], appt["patient_name"]
+            if not address:
+                patient = patient_lookup.lookup_patient(mrn=appt["patient_mrn"])
+                address, name = patient.get(field), name or patient.get("name")
+            if not address:
+                closed.append(("skipped", f"No {r['channel']} contact on file", r["id"]))
+                continue
+            due.append({
+                "id": r["id"], "stage": r["stage"], "channel": r["channel"], "address": address,
+                "name": name or "patient", "start_time": appt["start_dt"],
+            })
+        if closed:
+            with database.transaction(DB_PATH) as conn:
+                conn.executemany("""
+                UPDATE reminders SET status=?, response=? WHERE id=? AND status='sending'
+                """, closed)
+        return len(claimed), due
 
+    def send_reminder(self, reminder: dict):
+        """Send one claimed reminder on its channel."""
+        subject, body, sms = reminder_message(reminder["stage"], reminder["name"], reminder["start_time"])
+        if reminder["channel"] == "email":
+            self.email_tool.send_email(to_email=reminder["address"], subject=subject, body=body)
         else:
-            raise ValueError("Stage must be 1, 2, or 3.")
+            self.sms_tool.send_sms(to_number=reminder["address"], message=sms)
+        print(f"✅ Reminder (stage {reminder['stage']}) sent to {reminder['name']} by {reminder['channel']}.")
+
+    def _deliver(self, reminder: dict) -> tuple[str, str | None]:
+        """Rate-limited, retried send of one reminder; (status, response)."""
+        bucket = self.buckets[reminder["channel"]]
 
-        # Send email
-        self.email_tool.send_email(to_email=email, subject=subject, body=body)
+        def attempt():
+            bucket.acquire()
+            self.send_reminder(reminder)
 
-        # Send SMS
-        self.sms_tool.send_sms(to_number="+911234567890", message=sms)  # Replace with real phone if in DB
+        try:
+            Retrying(**self._retry_kwargs)(attempt)
+        except Exception as e:
+            print(f"❌ Reminder {reminder['id']} failed: {e}")
+            return "failed", str(e)
+        return "sent", None
 
-        print(f"✅ Reminder (stage {stage}) sent to {name} at {email}.")
+    def _dispatch(self, pool: ThreadPoolExecutor, due: list[dict]) -> list[tuple]:
+        """Send one claimed batch; returns (status, response, id) rows for the DB."""
+        finished, unique = [], {}
+        for reminder in due:
+            key = (reminder["channel"], reminder["address"].casefold(), reminder["stage"], reminder["start_time"])
+            first = unique.setdefault(key, reminder)
+            if first is not reminder:
+                finished.append(("skipped", f"Duplicate of reminder {first['id']}", reminder["id"]))
+        outcomes = pool.map(self._deliver, unique.values())
+        finished.extend((*outcome, r["id"]) for r, outcome in zip(unique.values(), outcomes))
+        return finished
 
-    def run_reminders(self):
+    def run_reminders(self, now: datetime | None = None, batch_size: int = 100) -> dict:
         """
-        Run all reminders (for demo: sends all 3 sequentially).
-        In production, you'd schedule them at different intervals.
+        Send every reminder that is due, batch by batch. Safe to run from
+        cron as often as needed. Returns sent / failed / skipped counts and
+        throughput in messages per second.
         """
-        appointments = self.get_upcoming_appointments(within_hours=48)
-        for appt in appointments:
-            for stage in [1, 2, 3]:
-                self.send_reminder(appt, stage=stage)
+        counts = {"sent": 0, "failed": 0, "skipped": 0}
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reminders") as pool:
+            while True:
+                claimed, due = self._claim(now, batch_size)
+                finished = self._dispatch(pool, due)
+                sent_at = datetime.now().isoformat(timespec="seconds")
+                with database.transaction(DB_PATH) as conn:
+                    conn.executemany("""
+                    UPDATE reminders SET status=?, response=?, sent_at=?
+                    WHERE id=? AND status='sending'
+                    """, [(status, response, sent_at, rid) for status, response, rid in finished])
+                for status, _, _ in finished:
+                    counts[status] += 1
+                if claimed < batch_size:
+                    break
+        elapsed = time.perf_counter() - t0
+        counts["elapsed_s"] = round(elapsed, 3)
+        counts["per_sec"] = round(counts["sent"] / elapsed, 1) if elapsed else 0.0
+        print(f"✅ Reminders: {counts['sent']} sent, {counts['failed']} failed, "
+              f"{counts['skipped']} duplicates in {elapsed:.2f}s ({counts['per_sec']}/s)")
+        return counts
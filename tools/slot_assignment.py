@@ -0,0 +1,221 @@
+# tools/slot_assignment.py
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from tools.availability import to_minutes
+
+# preference tiers, best first
+TIER_DOCTOR, TIER_LOCATION, TIER_ANY = 0, 1, 2
+
+
+@dataclass(frozen=True)
+class SlotRequest:
+    """One visit to place. Lower `priority` values are served first."""
+    id: object
+    duration_minutes: int = 30
+    doctor_id: Optional[str] = None
+    location: Optional[str] = None
+    earliest: Optional[str] = None
+    priority: int = 0
+    fallback: bool = True  # may go to another doctor / clinic if the preferred one is full
+
+
+class _Calendar:
+    """Free slots of one doctor/location in start order; `used` marks assigned ones."""
+
+    __slots__ = ("doctor_id", "location", "ids", "starts", "ends", "isos", "used")
+
+    def __init__(self, doctor_id: str, location: str):
+        self.doctor_id = doctor_id
+        self.location = location
+        self.ids, self.starts, self.ends, self.isos, self.used = [], [], [], [], None
+
+    def windows(self, minutes: int):
+        """(first, last) index of every back-to-back run starting at a slot and covering `minutes`."""
+        starts, ends, n = self.starts, self.ends, len(self.starts)
+        j = 0
+        for i in range(n):
+            j = max(j, i)
+            while ends[j] - starts[i] < minutes and j + 1 < n and starts[j + 1] == ends[j]:
+                j += 1
+            if ends[j] - starts[i] >= minutes:
+                yield i, j
+
+    def take(self, i: int, j: int) -> bool:
+        used = self.used
+        if any(used[i:j + 1]):
+            return False
+        used[i:j + 1] = b"\x01" * (j - i + 1)
+        return True
+
+
+class _Queue:
+    """
+    Candidate windows of one (tier, duration, value) in start order. `skip`
+    is a union-find over positions: each taken window is linked past once,
+    so later searches jump over it instead of rescanning it.
+    """
+
+    __slots__ = ("entries", "starts", "skip")
+
+    def __init__(self, entries: list):
+        entries.sort()
+        self.entries = entries
+        self.starts = [e[0] for e in entries]
+        self.skip = list(range(len(entries) + 1))
+
+    def find(self, p: int) -> int:
+        """First position at or after `p` not yet known to be taken."""
+        skip = self.skip
+        root = p
+        while skip[root] != root:
+            root = skip[root]
+        while skip[p] != root:
+            skip[p], p = root, skip[p]
+        return root
+
+
+class SlotAssigner:
+    """
+    Greedy slot assignment with priority queues.
+
+    For every requested duration, each candidate window (a run of back-to-back
+    free slots of one doctor/location) is put in start-ordered queues: one per
+    doctor and location pair, one per doctor, one per location and one for
+    everything. Requests are served most-constrained first (priority, then
+    longer visits, then doctor- and location-bound ones, then input order).
+    A first pass gives each the earliest window at its doctor in its clinic,
+    else at its doctor, else at its clinic; a second pass places the rest
+    from the shared queue.
+    A request's `earliest` cutoff is a bisect into the queue, and taken
+    windows are skipped for good the first time a queue meets them, so W
+    candidate windows and R requests cost O(W log W + R log W) time and O(W)
+    memory, and the output is fully deterministic.
+    """
+
+    def __init__(self, slots: Iterable):
+        """`slots`: (id, doctor_id, location, start_dt, end_dt) rows of free slots."""
+        calendars: dict[tuple, _Calendar] = {}
+        for slot_id, doctor_id, location, start_dt, end_dt in sorted(
+            slots, key=lambda s: (s[1], s[2], s[3], s[0])
+        ):
+            cal = calendars.get((doctor_id, location))
+            if cal is None:
+                cal = calendars[(doctor_id, location)] = _Calendar(doctor_id, location)
+            cal.ids.append(slot_id)
+            cal.starts.append(to_minutes(start_dt))
+            cal.ends.append(to_minutes(end_dt))
+            cal.isos.append((start_dt, end_dt))
+        for cal in calendars.values():
+            cal.used = bytearray(len(cal.ids))
+        self.calendars = list(calendars.values())
+        self._queues: dict[tuple, _Queue] = {}
+        self._built: set[int] = set()
+
+    def _build(self, minutes: int):
+        """Queues of candidate windows for one visit length (built on first use)."""
+        if minutes in self._built:
+            return
+        by_pair, by_doctor, by_location, everything = {}, {}, {}, []
+        for c, cal in enumerate(self.calendars):
+            for i, j in cal.windows(minutes):
+                # calendars are sorted by doctor/location, so `c` breaks start-time ties
+                entry = (cal.starts[i], c, i, j)
+                by_pair.setdefault((cal.doctor_id, cal.location), []).append(entry)
+                by_doctor.setdefault(cal.doctor_id, []).append(entry)
+                by_location.setdefault(cal.location, []).append(entry)
+                everything.append(entry)
+        for key, entries in (
+            *(((TIER_DOCTOR, minutes, p), e) for p, e in by_pair.items()),
+            *(((TIER_DOCTOR, minutes, d), e) for d, e in by_doctor.items()),
+            *(((TIER_LOCATION, minutes, loc), e) for loc, e in by_location.items()),
+            ((TIER_ANY, minutes, None), everything),
+        ):
+            self._queues[key] = _Queue(entries)
+        self._built.add(minutes)
+
+    def _pop(self, key: tuple, earliest: int | None):
+        """Earliest untaken window in one queue at or after `earliest`."""
+        queue = self._queues.get(key)
+        if not queue:
+            return None
+        p = bisect_left(queue.starts, earliest) if earliest is not None else 0
+        while True:
+            p = queue.find(p)
+            if p == len(queue.entries):
+                return None
+            entry = queue.entries[p]
+            queue.skip[p] = p + 1  # taken now, or earlier through another queue
+            cal = self.calendars[entry[1]]
+            if not any(cal.used[entry[2]:entry[3] + 1]):
+                return entry
+
+    def assign_one(self, request: SlotRequest, preferred_only: bool = False):
+        self._build(request.duration_minutes)
+        earliest = to_minutes(request.earliest) if request.earliest else None
+        tiers = []
+        if request.doctor_id:
+            if request.location:
+                tiers.append((TIER_DOCTOR, (request.doctor_id, request.location)))
+            tiers.append((TIER_DOCTOR, request.doctor_id))
+        if request.location:
+            tiers.append((TIER_LOCATION, request.location))
+        if not preferred_only and (request.fallback or not tiers):
+            tiers.append((TIER_ANY, None))
+
+        for tier, value in tiers:
+            entry = self._pop((tier, request.duration_minutes, value), earliest)
+            if entry is None:
+                continue
+            _, c, i, j = entry
+            cal = self.calendars[c]
+            cal.take(i, j)
+            return {
+                "request_id": request.id,
+                "slot_ids": cal.ids[i:j + 1],
+                "doctor_id": cal.doctor_id,
+                "location": cal.location,
+                "start": cal.isos[i][0],
+                "end": cal.isos[j][1],
+                "tier": tier,
+            }
+        return None
+
+    def assign(self, requests: list[SlotRequest]) -> dict:
+        """
+        Place as many requests as possible. Returns {"assigned": {request_id:
+        assignment}, "unassigned": [request_id, ...]} (unassigned in input order).
+        """
+        order = sorted(
+            range(len(requests)),
+            key=lambda n: (
+                requests[n].priority,
+                -requests[n].duration_minutes,
+                requests[n].doctor_id is None,
+                requests[n].location is None,
+                n,
+            ),
+        )
+        assigned, pending = {}, []
+        # pass 1: preferred doctor / clinic only, so a flexible request can
+        # not take the slot someone else asked for; pass 2: anything left
+        for preferred_only in (True, False):
+            pending = []
+            for n in order:
+                if n in assigned:
+                    continue
+                result = self.assign_one(requests[n], preferred_only)
+                if result is None:
+                    pending.append(n)
+                else:
+                    assigned[n] = result
+        return {
+            "assigned": {requests[n].id: a for n, a in assigned.items()},
+            "unassigned": [requests[n].id for n in sorted(pending)],
+        }
+
+
+def assign_slots(requests: list[SlotRequest], slots: Iterable) -> dict:
+    """One-shot helper: build the solver over `slots` and place `requests`."""
+    return SlotAssigner(slots).assign(requests)
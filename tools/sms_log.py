@@ -0,0 +1,147 @@
+# tools/sms_log.py
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from typing import Iterator
+
+SMS_LOG_PATH = os.getenv("SMS_LOG_PATH", "sms_log.jsonl")
+SMS_LOG_FLUSH_INTERVAL = float(os.getenv("SMS_LOG_FLUSH_INTERVAL", 1.0))  # seconds
+SMS_LOG_MAX_BYTES = int(os.getenv("SMS_LOG_MAX_BYTES", 10 * 1024 * 1024))
+SMS_LOG_BACKUPS = int(os.getenv("SMS_LOG_BACKUPS", 5))
+MAX_BATCH = 1000  # records written per write() call
+
+
+class SMSLog:
+    """
+    Append-only JSONL log written by a background thread. `write` only
+    queues the record, so callers never touch the file; the writer batches
+    records, flushes every `flush_interval` seconds and rotates the file to
+    `path.1` ... `path.<backups>` once it would grow past `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = SMS_LOG_FLUSH_INTERVAL,
+        max_bytes: int = SMS_LOG_MAX_BYTES,
+        backups: int = SMS_LOG_BACKUPS,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sms-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record: dict):
+        self._queue.put(record)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Block until everything written so far is on disk. Once the writer
+        has stopped (closed or crashed) nothing drains the queue any more:
+        returns at once, True only if no records were left behind.
+        """
+        if self._closed or not self._thread.is_alive():
+            self._thread.join(timeout)
+            return not self._thread.is_alive() and self._queue.empty()
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        with _logs_lock:
+            if _logs.get(self.path) is self:
+                del _logs[self.path]  # the next get_sms_log opens a fresh writer
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        f = open(self.path, "a", encoding="utf-8")
+        buffer: list[str] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = False  # flush interval elapsed
+            if isinstance(item, dict):
+                buffer.append(json.dumps(item, ensure_ascii=False) + "\n")
+                if len(buffer) < MAX_BATCH and time.monotonic() < deadline:
+                    continue
+            if buffer:
+                f = self._write(f, buffer)
+                buffer = []
+            f.flush()
+            deadline = time.monotonic() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                f.close()
+                return
+
+    def _write(self, f, lines: list[str]):
+        """Write a batch in as few calls as possible, rotating wherever the size limit falls."""
+        size, start = f.tell(), 0
+        for i, line in enumerate(lines):
+            n = len(line.encode("utf-8"))
+            if self.max_bytes and size and size + n > self.max_bytes:
+                f.write("".join(lines[start:i]))
+                f.close()
+                self._rotate()
+                f = open(self.path, "a", encoding="utf-8")
+                size, start = 0, i
+            size += n
+        f.write("".join(lines[start:]))
+        return f
+
+    def _rotate(self):
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+_logs: dict[str, SMSLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_sms_log(path: str) -> SMSLog:
+    """One open writer per (absolute) log path, shared by every SMSTool."""
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None:
+            log = _logs[path] = SMSLog(path)
+        return log
+
+
+def replay(path: str = SMS_LOG_PATH) -> Iterator[dict]:
+    """
+    Every logged record, oldest first, across rotated files; e.g. to
+    resend a recorded run in a load test:
+
+        for r in replay("sms_log.jsonl"):
+            tool.send_sms(r["to"], r["message"])
+    """
+    backups = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        backups.append(f"{path}.{i}")
+        i += 1
+    for p in [*reversed(backups), path]:
+        if os.path.exists(p):
+            with open(p, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
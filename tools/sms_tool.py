@@ -1,42 +1,116 @@
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from dotenv import load_dotenv
+from functools import lru_cache
+from tools.config import load_env
+from tools.rate_limit import TokenBucket
+from tools.sms_log import SMS_LOG_PATH, get_sms_log
 
-load_dotenv()
+load_env()
+
+# Twilio queues anything above the sender's throughput (1 msg/s for a long
+# code, more for toll-free / short codes), so throttle to it instead
+TWILIO_SMS_RATE = float(os.getenv("TWILIO_SMS_RATE", 10))
+TWILIO_SMS_WORKERS = int(os.getenv("TWILIO_SMS_WORKERS", 8))
+
+
+@lru_cache(maxsize=None)
+def twilio_client(account_sid: str, auth_token: str, base_url: str | None = None):
+    """
+    One long-lived Twilio Client per account, over a pooled HTTP session,
+    so every send reuses warm keep-alive connections. `base_url` points the
+    API at another host (a local fake in tests).
+    """
+    from twilio.http.http_client import TwilioHttpClient
+    from twilio.rest import Client
+
+    client = Client(account_sid, auth_token, http_client=TwilioHttpClient(pool_connections=True, timeout=10))
+    if base_url:
+        client.api.base_url = base_url.rstrip("/")
+    return client
+
+
+@lru_cache(maxsize=None)
+def sender_bucket(from_number: str, rate: float) -> TokenBucket:
+    """Shared per sending number, so concurrent callers stay under its limit together."""
+    return TokenBucket(rate)
 
 
 class SMSTool:
-    def __init__(self, use_twilio: bool = False):
+    def __init__(self, use_twilio: bool = False, log_path: str | None = None, rate: float = TWILIO_SMS_RATE):
         self.use_twilio = use_twilio
+        self.echo = os.getenv("SMS_SIMULATION_ECHO", "1") != "0"
         if use_twilio:
             try:
-                from twilio.rest import Client
-                self.twilio_client = Client(
+                self.twilio_client = twilio_client(
                     os.getenv("TWILIO_SID"),
-                    os.getenv("TWILIO_AUTH_TOKEN")
+                    os.getenv("TWILIO_AUTH_TOKEN"),
+                    os.getenv("TWILIO_BASE_URL"),
                 )
                 self.from_number = os.getenv("TWILIO_PHONE_NUMBER")
                 if not self.from_number:
                     raise ValueError("❌ Missing TWILIO_PHONE_NUMBER in .env")
+                self.bucket = sender_bucket(self.from_number, rate)
             except ImportError:
                 raise ImportError("Install twilio with `pip install twilio` to use SMS")
+        else:
+            # simulated sends go to a buffered JSONL log (tools/sms_log.py)
+            self.log_path = os.path.abspath(log_path or SMS_LOG_PATH)
+
+    @property
+    def log(self):
+        """The path's shared writer, looked up per use so a closed one is replaced."""
+        return get_sms_log(self.log_path)
 
     def send_sms(self, to_number: str, message: str):
         """
         Send SMS via Twilio (if enabled) or simulate by printing/logging.
         """
         if self.use_twilio:
-            msg = self.twilio_client.messages.create(
-                body=message,
-                from_=self.from_number,
-                to=to_number
-            )
-            print(f"✅ SMS sent via Twilio to {to_number}: SID={msg.sid}")
-            return {"status": "sent", "sid": msg.sid}
+            sid = self._twilio_send(to_number, message)
+            print(f"✅ SMS sent via Twilio to {to_number}: SID={sid}")
+            return {"status": "sent", "sid": sid}
 
         # --- Simulation mode ---
-        log_entry = f"[{datetime.now().isoformat()}] To: {to_number} | Msg: {message}\n"
-        print("📱 Simulated SMS:", log_entry.strip())
-        with open("sms_log.txt", "a") as f:
-            f.write(log_entry)
+        self.log.write({"ts": datetime.now().isoformat(), "to": to_number, "message": message})
+        if self.echo:
+            print(f"📱 Simulated SMS to {to_number}: {message}")
         return {"status": "simulated", "to": to_number, "message": message}
+
+    def _twilio_send(self, to_number: str, message: str) -> str:
+        self.bucket.acquire()
+        return self.twilio_client.messages.create(body=message, from_=self.from_number, to=to_number).sid
+
+    def send_many(self, messages, workers: int = TWILIO_SMS_WORKERS) -> dict:
+        """
+        Send a batch of SMS (dicts with to_number / message) concurrently on
+        `workers` threads over the shared client, throttled to the sending
+        number's rate. Rejected numbers are recorded and skipped. Returns
+        sent / failed counts and messages per second.
+        """
+        messages = list(messages)
+        t0 = time.perf_counter()
+        if self.use_twilio:
+            def send(m):
+                try:
+                    self._twilio_send(m["to_number"], m["message"])
+                except Exception as e:
+                    return m["to_number"], str(e)
+
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(messages))), thread_name_prefix="sms") as pool:
+                failed = [f for f in pool.map(send, messages) if f]
+        else:
+            for m in messages:
+                self.log.write({"ts": datetime.now().isoformat(), "to": m["to_number"], "message": m["message"]})
+            failed = []
+        sent = len(messages) - len(failed)
+        elapsed = time.perf_counter() - t0
+        per_sec = round(sent / elapsed, 1) if elapsed else 0.0
+        print(f"✅ Sent {sent}/{len(messages)} SMS in {elapsed:.2f}s ({per_sec}/s)")
+        return {"sent": sent, "failed": failed, "elapsed_s": round(elapsed, 3), "per_sec": per_sec}
+
+    async def asend_sms(self, to_number: str, message: str):
+        """`send_sms` run in a worker thread, for async callers."""
+        return await asyncio.to_thread(self.send_sms, to_number, message)
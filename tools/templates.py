@@ -0,0 +1,208 @@
+# tools/templates.py
+import html
+import quopri
+import uuid
+from dataclasses import dataclass
+from email.header import Header
+from functools import lru_cache
+from string import Template
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class RenderedMessage:
+    subject: str
+    text: str
+    html: Optional[str] = None
+    sms: Optional[str] = None
+
+
+class NotificationTemplate:
+    """
+    One notification in up to three forms (email text + HTML, SMS), compiled
+    to `string.Template`s once. Values are HTML-escaped for the HTML part and
+    stripped of line breaks for the subject; a missing value raises KeyError.
+    """
+
+    def __init__(self, name: str, subject: str, text: str, html: str | None = None, sms: str | None = None):
+        self.name = name
+        self.subject = Template(subject)
+        self.text = Template(text)
+        self.html = Template(html) if html else None
+        self.sms = Template(sms) if sms else None
+
+    def render(self, context: dict) -> RenderedMessage:
+        values = {k: "" if v is None else str(v) for k, v in context.items()}
+        return RenderedMessage(
+            subject=" ".join(self.subject.substitute(values).split()),
+            text=self.text.substitute(values),
+            html=self.html.substitute({k: html.escape(v) for k, v in values.items()}) if self.html else None,
+            sms=self.sms.substitute(values) if self.sms else None,
+        )
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+TEMPLATES: dict[str, NotificationTemplate] = {}
+
+
+def register(name: str, **parts) -> NotificationTemplate:
+    TEMPLATES[name] = NotificationTemplate(name, **parts)
+    return TEMPLATES[name]
+
+
+def render(name: str, **context) -> RenderedMessage:
+    return TEMPLATES[name].render(context)
+
+
+register(
+    "booking_link",
+    subject="Book Your Appointment with ${doctor}",
+    text=(
+        "Hello ${patient_name},\n\n"
+        "Please book your ${duration_minutes}-minute appointment with ${doctor} "
+        "at ${clinic_location} using the link below:\n\n"
+        "${booking_url}\n\n"
+        "Thank you,\nAI Scheduler Team"
+    ),
+    html="""
+        <html>
+          <body style="font-family: Arial, sans-serif; line-height: 1.6;">
+            <p>Hello <b>${patient_name}</b>,</p>
+            <p>Please use the link below to book your <b>${duration_minutes}-minute</b> appointment with <b>${doctor}</b> at <b>${clinic_location}</b>:</p>
+            <p><a href="${booking_url}" style="color: #007bff; text-decoration: none;">Click here to book your appointment</a></p>
+            <p style="color: gray; font-size: 12px;">
+              Thank you,<br>
+              AI Scheduler Team
+            </p>
+          </body>
+        </html>
+        """,
+    sms=(
+        "Hello ${patient_name}, please book your ${duration_minutes}-minute "
+        "appointment using this link: ${booking_url}"
+    ),
+)
+
+register(
+    "appointment_reminder",
+    subject="Reminder: Your Appointment on ${appointment_dt}",
+    text=(
+        "Hello ${patient_name},\n\n"
+        "This is a reminder for your upcoming appointment on ${appointment_dt}.\n"
+        "Location: ${clinic_location}\n\n"
+        "Please arrive 10 minutes early.\n\n"
+        "Thank you,\nAI Scheduler Team"
+    ),
+    html="""
+        <html>
+          <body style="font-family: Arial, sans-serif; line-height: 1.6;">
+            <p>Hello <b>${patient_name}</b>,</p>
+            <p>This is a reminder for your upcoming appointment on:</p>
+            <p><b>${appointment_dt}</b></p>
+            <p>Location: ${clinic_location}</p>
+            <p>Please arrive 10 minutes early.</p>
+            <p style="color: gray; font-size: 12px;">
+              Thank you,<br>
+              AI Scheduler Team
+            </p>
+          </body>
+        </html>
+        """,
+)
+
+register(
+    "booking_confirmation",
+    subject="Appointment confirmed: ${start_time}",
+    text=(
+        "Hello ${patient_name}, your ${duration_minutes}-minute appointment "
+        "is booked for ${start_time} at ${clinic_location}."
+    ),
+    sms=(
+        "Hello ${patient_name}, your ${duration_minutes}-minute appointment "
+        "is booked for ${start_time} at ${clinic_location}."
+    ),
+)
+
+# reminder stages (tools/reminder_tool.py)
+register(
+    "reminder_stage_1",
+    subject="Reminder: Appointment on ${start_time}",
+    text="Hello ${patient_name}, this is a reminder for your upcoming appointment on ${start_time}.",
+    sms="Reminder: Your appointment is on ${start_time}.",
+)
+register(
+    "reminder_stage_2",
+    subject="Action Needed: Forms for your appointment on ${start_time}",
+    text=(
+        "Hello ${patient_name}, please complete your intake forms before your appointment on ${start_time}. "
+        "Click here to access your forms: [link]"
+    ),
+    sms="Reminder: Please complete your intake forms before ${start_time}.",
+)
+register(
+    "reminder_stage_3",
+    subject="Confirm Your Appointment on ${start_time}",
+    text=(
+        "Hello ${patient_name}, please confirm if you will attend your appointment on ${start_time}. "
+        "If not, reply with the reason for cancellation."
+    ),
+    sms="Confirm your appointment on ${start_time}. Reply YES to confirm or NO to cancel.",
+)
+
+
+# -----------------------------
+# MIME
+# -----------------------------
+# "=_" never occurs in a quoted-printable body, so the boundary can be fixed
+BOUNDARY = "=_scheduler_" + uuid.uuid4().hex
+
+
+@lru_cache(maxsize=64)
+def _mime_parts(from_email: str) -> dict:
+    """The static lines of a multipart/alternative message, built once per sender."""
+    part = (
+        f"--{BOUNDARY}\n"
+        'Content-Type: text/{subtype}; charset="utf-8"\n'
+        "MIME-Version: 1.0\n"
+        "Content-Transfer-Encoding: {encoding}\n\n"
+    )
+    return {
+        "head": (
+            f'Content-Type: multipart/alternative; boundary="{BOUNDARY}"\n'
+            "MIME-Version: 1.0\n"
+            f"From: {_header_value(from_email)}\n"
+        ),
+        ("plain", "7bit"): part.format(subtype="plain", encoding="7bit"),
+        ("plain", "quoted-printable"): part.format(subtype="plain", encoding="quoted-printable"),
+        ("html", "7bit"): part.format(subtype="html", encoding="7bit"),
+        ("html", "quoted-printable"): part.format(subtype="html", encoding="quoted-printable"),
+        "tail": f"--{BOUNDARY}--\n",
+    }
+
+
+def _header_value(value: str) -> str:
+    value = " ".join(value.split())  # no header injection through CR/LF
+    return value if value.isascii() else Header(value, "utf-8").encode()
+
+
+def _body(text: str) -> tuple[str, str]:
+    """(transfer encoding, encoded body): plain 7bit when possible, else quoted-printable."""
+    if text.isascii() and all(len(line) <= 998 for line in text.split("\n")):
+        return "7bit", text if text.endswith("\n") else text + "\n"
+    return "quoted-printable", quopri.encodestring(text.encode("utf-8")).decode("ascii") + "\n"
+
+
+def mime_message(from_email: str, to_email: str, subject: str, text: str, html: str | None = None) -> str:
+    """multipart/alternative message as a string; only the per-recipient parts are encoded per call."""
+    parts = _mime_parts(from_email)
+    out = [parts["head"], f"To: {_header_value(to_email)}\n", f"Subject: {_header_value(subject)}\n\n"]
+    for subtype, content in (("plain", text), ("html", html)):
+        if subtype == "html" and not content:
+            continue
+        encoding, body = _body(content)
+        out.append(parts[(subtype, encoding)])
+        out.append(body)
+    out.append(parts["tail"])
+    return "".join(out)